@@ -1,12 +1,15 @@
 """
 API router for device status operations.
 """
-from fastapi import APIRouter, HTTPException
-from app.models.schemas import DeviceInfo, StatusSubscription
-from app.services import device
-from typing import Optional
+from fastapi import APIRouter, Body, Header, HTTPException
+from fastapi.responses import StreamingResponse
+from app.models.schemas import DeviceBatchRequest, DeviceBatchResponse, DeviceInfo, StatusSubscription
+from app.services import batch, device
+from typing import Any, Dict, List, Optional, Union
+from ..core.config import settings
 from ..models.device import DeviceStatus, DeviceBase
-from ..core.nokia_client import nokia_client
+from ..core.nac_async import nac_async
+import hmac
 import logging
 
 logger = logging.getLogger(__name__)
@@ -17,7 +20,7 @@ router = APIRouter(prefix="/device", tags=["Device Status"])
 async def get_device_status(device_id: str):
     """Get device status (online/offline)"""
     try:
-        device = nokia_client.get_device(phone_number=device_id)
+        device = await nac_async.get_device(phone_number=device_id)
         return DeviceStatus(
             phone_number=device_id,
             status="online",  # Assuming device is online if no error
@@ -28,11 +31,27 @@ async def get_device_status(device_id: str):
         raise HTTPException(status_code=500, detail=str(e))
 
 
+@router.post("/status/batch", response_model=DeviceBatchResponse)
+async def get_devices_status(request: DeviceBatchRequest, accept: Optional[str] = Header(None)):
+    """
+    Get the status of several devices, resolved concurrently through the
+    device cache. Every device gets its status or its error. Large lists
+    (or Accept: application/x-ndjson) are streamed as NDJSON, one line per
+    device as soon as it is resolved.
+    """
+    if batch.should_stream(request.device_ids, accept):
+        return StreamingResponse(
+            batch.batch_results_ndjson(request.device_ids, device.get_device_status),
+            media_type=batch.NDJSON_MEDIA_TYPE
+        )
+    return await batch.batch_results(request.device_ids, device.get_device_status)
+
+
 @router.get("/info/{device_id}", response_model=DeviceBase)
 async def get_device_info(device_id: str):
     """Get detailed device information"""
     try:
-        device = nokia_client.get_device(phone_number=device_id)
+        device = await nac_async.get_device(phone_number=device_id)
         return DeviceBase(
             phone_number=device_id,
             ipv4_address=getattr(device, "ipv4_address", {}).get("public_address")
@@ -60,7 +79,32 @@ async def subscribe_to_device_status(subscription: StatusSubscription):
 async def unsubscribe_from_device_status(subscription_id: str):
     """Cancelar una suscripción a cambios de estado"""
     try:
-        return await device.unsubscribe_from_status(subscription_id)
+        result = await device.unsubscribe_from_status(subscription_id)
+        if result is None:
+            raise HTTPException(status_code=404, detail="Suscripción no encontrada")
+        return result
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(
             status_code=500, detail=f"Error al cancelar la suscripción: {str(e)}")
+
+
+@router.post("/status/callback", status_code=204)
+async def device_status_callback(
+    events: Union[List[Dict[str, Any]], Dict[str, Any]] = Body(...),
+    authorization: Optional[str] = Header(None)
+):
+    """
+    Receive the status notifications of Nokia NAC (CloudEvents, single or
+    batched) and forward them to the subscribers of the devices. Refused
+    unless they carry the STATUS_CALLBACK_TOKEN bearer token.
+    """
+    if not settings.STATUS_CALLBACK_TOKEN:
+        raise HTTPException(status_code=503, detail="Status callbacks are not configured")
+    expected = f"Bearer {settings.STATUS_CALLBACK_TOKEN}".encode()
+    if not hmac.compare_digest((authorization or "").encode(), expected):
+        raise HTTPException(status_code=401, detail="Invalid callback token")
+    if isinstance(events, dict):
+        events = [events]
+    device.handle_status_callback(events)
@@ -1,10 +1,12 @@
 """
 API router for location operations.
 """
-from fastapi import APIRouter, HTTPException, Query
+from fastapi import APIRouter, Header, HTTPException, Query
+from fastapi.responses import StreamingResponse
 from typing import Optional
 from ..models.device import DeviceLocation
-from ..core.nokia_client import nokia_client
+from ..models.schemas import DeviceBatchResponse, LocationBatchRequest, LocationRequest
+from ..services import batch, location
 from ..core.config import settings
 import logging
 
@@ -17,22 +19,48 @@ async def get_device_location(
     device_id: str,
     max_age: Optional[int] = Query(settings.DEFAULT_MAX_AGE, description="Maximum age of location data in seconds")
 ):
-    """Get device location"""
+    """Get device location, from the cache if younger than max_age"""
     try:
-        device = nokia_client.get_device(phone_number=device_id)
-        location = device.location(max_age=max_age)
-        
+        device_location = await location.get_device_location(device_id, max_age=max_age)
+
         return DeviceLocation(
-            latitude=location.latitude,
-            longitude=location.longitude,
-            elevation=getattr(location, "elevation", None),
-            accuracy=getattr(location, "accuracy", None)
+            latitude=device_location["latitude"],
+            longitude=device_location["longitude"],
+            elevation=device_location["elevation"],
+            accuracy=device_location["accuracy"],
+            timestamp=device_location["timestamp"]
         )
     except Exception as e:
         logger.error(f"Error getting device location: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
 
 
+@router.post("/batch", response_model=DeviceBatchResponse)
+async def get_devices_location(request: LocationBatchRequest, accept: Optional[str] = Header(None)):
+    """
+    Get the location of several devices, resolved concurrently through the
+    location cache. Every device gets its location or its error. Large
+    lists (or Accept: application/x-ndjson) are streamed as NDJSON, one
+    line per device as soon as it is resolved.
+    """
+    async def resolve(device_id: str) -> DeviceLocation:
+        device_location = await location.get_device_location(device_id, max_age=request.max_age)
+        return DeviceLocation(
+            latitude=device_location["latitude"],
+            longitude=device_location["longitude"],
+            elevation=device_location["elevation"],
+            accuracy=device_location["accuracy"],
+            timestamp=device_location["timestamp"]
+        )
+
+    if batch.should_stream(request.device_ids, accept):
+        return StreamingResponse(
+            batch.batch_results_ndjson(request.device_ids, resolve),
+            media_type=batch.NDJSON_MEDIA_TYPE
+        )
+    return await batch.batch_results(request.device_ids, resolve)
+
+
 @router.post("/verify")
 async def verify_device_location(verification: LocationRequest):
     """Verificar la ubicación de un dispositivo con un radio opcional"""
@@ -3,9 +3,10 @@ API router for Quality of Service on Demand (QoD) operations.
 """
 from fastapi import APIRouter, HTTPException, Query
 from typing import List, Optional
-from app.models.schemas import QoDSessionCreate, QoDSession, QoDSessionList, EmergencyQoDRequest
-from app.services import qod_service
+from app.models.qod import QoDSessionCreate, QoDSession, QoDSessionList, EmergencyQoDRequest, EmergencyQoDResult
+from app.services.qod_service import qod_service
 from app.core.config import settings
+from app.core.concurrency import bounded_gather
 
 router = APIRouter(prefix="/qod", tags=["Quality of Service"])
 
@@ -21,11 +22,12 @@ async def create_qod_session(session: QoDSessionCreate):
 
 @router.get("/sessions", response_model=QoDSessionList)
 async def list_qod_sessions(
-    device_id: Optional[str] = Query(None, description="Filter sessions by device ID")
+    device_id: Optional[str] = Query(None, description="Filter sessions by device ID"),
+    emergency_id: Optional[str] = Query(None, description="Filter sessions by emergency ID")
 ):
     """List all active QoD sessions"""
     try:
-        sessions = await qod_service.list_sessions(device_id)
+        sessions = await qod_service.list_sessions(device_id, emergency_id)
         return QoDSessionList(sessions=sessions, total=len(sessions))
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
@@ -58,23 +60,43 @@ async def delete_qod_session(session_id: str):
         raise HTTPException(status_code=500, detail=str(e))
 
 
-@router.post("/emergency", response_model=List[QoDSession])
+@router.post("/emergency", response_model=EmergencyQoDResult)
 async def create_emergency_qod(emergency: EmergencyQoDRequest):
-    """Create QoD sessions for multiple devices in emergency situation"""
-    try:
-        sessions = []
-        for device_id in emergency.devices:
-            session_data = QoDSessionCreate(
-                device_id=device_id,
-                profile=emergency.profile,
-                duration=emergency.duration,
-                service_ipv4=settings.DEFAULT_IPV4
-            )
-            session = await qod_service.create_session(session_data)
-            sessions.append(session)
-        return sessions
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
+    """
+    Create QoD sessions for multiple devices in emergency situation.
+
+    Devices are processed concurrently, at most QOD_FANOUT_CONCURRENCY at a
+    time and QOD_DEVICE_TIMEOUT seconds each. The sessions created are
+    returned with the devices that failed or timed out, a session created
+    after its device timed out is deleted. Fails only if no session could
+    be created.
+    """
+    async def create(device_id: str) -> QoDSession:
+        session_data = QoDSessionCreate(
+            device_id=device_id,
+            profile=emergency.profile,
+            duration=emergency.duration,
+            service_ipv4=settings.DEFAULT_IPV4,
+            emergency_id=emergency.emergency_id
+        )
+        return await qod_service.create_session_or_release(session_data)
+
+    results = await bounded_gather(
+        emergency.devices,
+        create,
+        limit=settings.QOD_FANOUT_CONCURRENCY,
+        timeout=settings.QOD_DEVICE_TIMEOUT
+    )
+    sessions = [session for _, session, error in results if error is None]
+    failed_devices = [
+        {"device_id": device_id, "error": str(error)}
+        for device_id, _, error in results
+        if error is not None
+    ]
+    if failed_devices and not sessions:
+        raise HTTPException(
+            status_code=500, detail={"failed_devices": failed_devices})
+    return EmergencyQoDResult(sessions=sessions, failed_devices=failed_devices)
 
 
 @router.get("/profiles")
@@ -12,7 +12,8 @@ def create_nac_client():
     """Create and return a Nokia Network as Code client instance."""
     try:
         client = nac.NetworkAsCodeClient(
-            token=settings.NOKIA_NAC_API_KEY
+            token=settings.NOKIA_NAC_API_KEY,
+            **settings.nac_base_urls()
         )
         logger.info("Nokia NAC client initialized successfully")
         return client
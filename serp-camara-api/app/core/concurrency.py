@@ -0,0 +1,90 @@
+"""
+Bounded concurrent fan-out of per-device operations.
+"""
+import asyncio
+import logging
+from typing import (Any, AsyncIterator, Awaitable, Callable, List, Optional,
+                    Sequence, Tuple)
+
+logger = logging.getLogger(__name__)
+
+
+async def bounded_gather(
+    items: Sequence[Any],
+    worker: Callable[[Any], Awaitable[Any]],
+    limit: int,
+    timeout: Optional[float] = None,
+) -> List[Tuple[Any, Any, Optional[Exception]]]:
+    """
+    Run worker for every item concurrently, at most limit at a time.
+
+    A failure or timeout of one item does not cancel the others: every
+    item gets its result or its error.
+
+    Args:
+        items: The items to process (e.g. device phone numbers).
+        worker: Coroutine function processing one item.
+        limit: Maximum number of workers running at the same time.
+        timeout: Maximum seconds per item, None for no timeout.
+
+    Returns:
+        A list of (item, result, error) in the order of items, where error
+        is None on success and result is None on failure.
+    """
+    run = _bounded_worker(worker, limit, timeout)
+    return list(await asyncio.gather(*(run(item) for item in items)))
+
+
+async def bounded_as_completed(
+    items: Sequence[Any],
+    worker: Callable[[Any], Awaitable[Any]],
+    limit: int,
+    timeout: Optional[float] = None,
+) -> AsyncIterator[Tuple[Any, Any, Optional[Exception]]]:
+    """
+    Same as bounded_gather, yielding every (item, result, error) as soon as
+    it is done instead of waiting for all of them.
+
+    Args:
+        items: The items to process (e.g. device phone numbers).
+        worker: Coroutine function processing one item.
+        limit: Maximum number of workers running at the same time.
+        timeout: Maximum seconds per item, None for no timeout.
+
+    Yields:
+        (item, result, error) in completion order.
+    """
+    run = _bounded_worker(worker, limit, timeout)
+    tasks = [asyncio.ensure_future(run(item)) for item in items]
+    try:
+        for next_done in asyncio.as_completed(tasks):
+            yield await next_done
+    finally:
+        # Client gone: stop the pending work
+        for task in tasks:
+            task.cancel()
+
+
+def _bounded_worker(
+    worker: Callable[[Any], Awaitable[Any]],
+    limit: int,
+    timeout: Optional[float],
+) -> Callable[[Any], Awaitable[Tuple[Any, Any, Optional[Exception]]]]:
+    """Wrap worker with the concurrency limit, timeout and error capture."""
+    semaphore = asyncio.Semaphore(max(1, limit))
+
+    async def run(item: Any) -> Tuple[Any, Any, Optional[Exception]]:
+        async with semaphore:
+            try:
+                if timeout is None:
+                    result = await worker(item)
+                else:
+                    result = await asyncio.wait_for(worker(item), timeout)
+                return item, result, None
+            except asyncio.TimeoutError:
+                logger.error(f"Timed out after {timeout}s processing {item}")
+                return item, None, TimeoutError(f"Timed out after {timeout}s")
+            except Exception as e:
+                return item, None, e
+
+    return run
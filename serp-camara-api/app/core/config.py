@@ -2,6 +2,7 @@
 Configuration settings for the Nokia NAC microservice.
 """
 import os
+from typing import Dict
 from pydantic import BaseSettings
 from dotenv import load_dotenv
 
@@ -19,14 +20,124 @@ class Settings(BaseSettings):
     # Nokia NAC API key
     NOKIA_NAC_API_KEY: str = os.getenv("NOKIA_NAC_API_KEY", "")
 
+    # QoD API of the direct HTTP calls (fallback of the SDK)
+    NOKIA_NAC_API_URL: str = os.getenv(
+        "NOKIA_NAC_API_URL", "https://quality-of-service-on-demand.p-eu.rapidapi.com")
+
+    # Base URL of a mock upstream (python -m mock_nac). When set, both the
+    # SDK and the direct HTTP calls go to the mock instead of Nokia NAC
+    NOKIA_NAC_MOCK_URL: str = os.getenv("NOKIA_NAC_MOCK_URL", "")
+
     # Default device for testing
     DEFAULT_PHONE_NUMBER: str = "+34696453332"
     DEFAULT_IPV4: str = "0.0.0.0"
 
+    # Default QoD session profile and duration in seconds
+    DEFAULT_QOD_PROFILE: str = "QOS_E"
+    DEFAULT_QOD_DURATION: int = 3600
+
+    # Persistence of the active QoD sessions: memory://, sqlite:///<path>
+    # or postgresql://<dsn>
+    QOD_SESSION_STORE_URL: str = os.getenv("QOD_SESSION_STORE_URL", "sqlite:///data/qod_sessions.db")
+
+    # Emergency-wide QoD operations: devices processed at the same time,
+    # and maximum seconds per device before it is reported as failed
+    QOD_FANOUT_CONCURRENCY: int = 10
+    QOD_DEVICE_TIMEOUT: float = 15.0
+
+    # Blocking SDK calls run on a dedicated thread pool: threads, and calls
+    # waiting for a thread before new ones are rejected
+    NAC_SDK_MAX_WORKERS: int = 32
+    NAC_SDK_MAX_QUEUE: int = 1000
+
+    # Shared HTTP client of the direct calls to the Nokia NAC API: pool
+    # size, kept-alive connections and their idle expiry, timeouts in
+    # seconds, and retries of failed connection attempts
+    HTTP_CLIENT_HTTP2: bool = True
+    HTTP_CLIENT_MAX_CONNECTIONS: int = 100
+    HTTP_CLIENT_MAX_KEEPALIVE: int = 20
+    HTTP_CLIENT_KEEPALIVE_EXPIRY: float = 30.0
+    HTTP_CLIENT_TIMEOUT: float = 10.0
+    HTTP_CLIENT_CONNECT_TIMEOUT: float = 5.0
+    HTTP_CLIENT_POOL_TIMEOUT: float = 5.0
+    HTTP_CLIENT_RETRIES: int = 2
+
+    # Resilience of the upstream calls: consecutive failures opening the
+    # breaker of an endpoint, seconds it stays open and probe calls when
+    # half open; retries of the idempotent calls, retry budget as a ratio
+    # of the requests of the window in seconds plus a minimum, backoff base
+    # and cap in seconds; delay before hedging a read, 0 to disable
+    UPSTREAM_BREAKER_FAILURES: int = 5
+    UPSTREAM_BREAKER_RESET: float = 30.0
+    UPSTREAM_BREAKER_HALF_OPEN_CALLS: int = 1
+    UPSTREAM_RETRIES: int = 2
+    UPSTREAM_RETRY_BUDGET_RATIO: float = 0.1
+    UPSTREAM_RETRY_BUDGET_MIN: int = 10
+    UPSTREAM_RETRY_BUDGET_WINDOW: float = 10.0
+    UPSTREAM_BACKOFF_BASE: float = 0.1
+    UPSTREAM_BACKOFF_MAX: float = 2.0
+    UPSTREAM_HEDGE_DELAY: float = 0.0
+
+    # Device handles cache: seconds a handle is reused, and handles kept
+    DEVICE_CACHE_TTL: float = 300.0
+    DEVICE_CACHE_MAX_SIZE: int = 10000
+
+    # Device locations: default max_age in seconds of the location
+    # requests, and devices kept in the location cache
+    DEFAULT_MAX_AGE: int = 60
+    LOCATION_CACHE_MAX_SIZE: int = 10000
+
+    # Multi-device endpoints: devices per request, devices resolved at the
+    # same time and seconds per device, and list size from which the
+    # results are streamed as NDJSON
+    BATCH_MAX_DEVICES: int = 1000
+    BATCH_CONCURRENCY: int = 20
+    BATCH_DEVICE_TIMEOUT: float = 10.0
+    BATCH_STREAM_THRESHOLD: int = 100
+
+    # Device status subscriptions: where they are stored, the URL of this
+    # service the upstream status callbacks are sent to and their bearer
+    # token (callbacks are refused while it is not set), the upstream event
+    # subscribed to and the reports after which the upstream subscription
+    # ends
+    STATUS_SUBSCRIPTION_STORE_URL: str = os.getenv("STATUS_SUBSCRIPTION_STORE_URL", "sqlite:///data/status_subscriptions.db")
+    STATUS_CALLBACK_URL: str = os.getenv("STATUS_CALLBACK_URL", "")
+    STATUS_CALLBACK_TOKEN: str = os.getenv("STATUS_CALLBACK_TOKEN", "")
+    STATUS_EVENT_TYPE: str = "org.camaraproject.device-status.v0.connectivity-data"
+    STATUS_MAX_NUM_OF_REPORTS: int = int(os.getenv("STATUS_MAX_NUM_OF_REPORTS", "1000"))
+
+    # Notification dispatch: notifications per POST to a destination and
+    # seconds they wait for a batch, deliveries running at the same time,
+    # retries with exponential backoff from NOTIFICATION_BACKOFF seconds,
+    # and notifications queued before the oldest ones are dropped
+    NOTIFICATION_BATCH_SIZE: int = 50
+    NOTIFICATION_BATCH_SECONDS: float = 0.5
+    NOTIFICATION_MAX_IN_FLIGHT: int = 20
+    NOTIFICATION_MAX_RETRIES: int = 5
+    NOTIFICATION_BACKOFF: float = 0.5
+    NOTIFICATION_MAX_PENDING: int = 10000
+
     # Server configuration
     HOST: str = "0.0.0.0"
     PORT: int = 5002
 
+    def nac_base_urls(self) -> Dict[str, str]:
+        """Base URL overrides of the SDK APIs, empty unless mocked."""
+        if not self.NOKIA_NAC_MOCK_URL:
+            return {}
+        mock_url = self.NOKIA_NAC_MOCK_URL.rstrip("/")
+        return {
+            "qos_base_url": f"{mock_url}/qod/v0",
+            "location_retrieve_base_url": f"{mock_url}/location-retrieval/v0",
+            "location_verify_base_url": f"{mock_url}/location-verification/v0",
+            "device_status_base_url": f"{mock_url}/device-status/v0",
+        }
+
+    @property
+    def qod_api_url(self) -> str:
+        """QoD API of the direct HTTP calls, the mock one if set."""
+        return self.nac_base_urls().get("qos_base_url", self.NOKIA_NAC_API_URL)
+
     class Config:
         env_file = ".env"
         case_sensitive = True
@@ -0,0 +1,107 @@
+"""
+TTL + LRU cache of the Nokia NAC device handles.
+
+Gateway requests for the same ambulance (status, location, QoD) arrive
+several times a second, each one used to resolve the device upstream again.
+Handles are kept DEVICE_CACHE_TTL seconds, at most DEVICE_CACHE_MAX_SIZE of
+them, least recently used evicted first. Concurrent misses of the same
+device share a single upstream lookup (single-flight).
+"""
+import asyncio
+import logging
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Tuple
+
+from .config import settings
+
+logger = logging.getLogger(__name__)
+
+
+class DeviceHandleCache:
+    """Device handles by normalized identifier (see identifiers.device_key)."""
+
+    def __init__(self, ttl: float = settings.DEVICE_CACHE_TTL,
+                 max_size: int = settings.DEVICE_CACHE_MAX_SIZE):
+        self.ttl = ttl
+        self.max_size = max_size
+        self._entries: "OrderedDict[str, Tuple[float, Any]]" = OrderedDict()
+        self._inflight: Dict[str, asyncio.Future] = {}
+
+        # Metrics
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self.evictions = 0
+        self.errors = 0
+
+    async def get(self, key: str, loader: Callable[[], Awaitable[Any]]) -> Any:
+        """
+        Get the handle of a device, loading it on a miss.
+
+        Args:
+            key: The normalized device key.
+            loader: Coroutine function fetching the handle upstream.
+
+        Returns:
+            The device handle.
+        """
+        entry = self._entries.get(key)
+        if entry is not None:
+            expires_at, device = entry
+            if expires_at > time.monotonic():
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return device
+            del self._entries[key]
+
+        inflight = self._inflight.get(key)
+        if inflight is not None:
+            self.coalesced += 1
+            return await asyncio.shield(inflight)
+
+        self.misses += 1
+        # The lookup is a task of its own: a caller timing out does not
+        # cancel it for the others waiting on it
+        task = asyncio.ensure_future(self._load(key, loader))
+        self._inflight[key] = task
+        return await asyncio.shield(task)
+
+    async def _load(self, key: str, loader: Callable[[], Awaitable[Any]]) -> Any:
+        try:
+            device = await loader()
+        except Exception:
+            # Errors are not cached
+            self.errors += 1
+            raise
+        finally:
+            self._inflight.pop(key, None)
+        self._entries[key] = (time.monotonic() + self.ttl, device)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+        return device
+
+    def invalidate(self, key: str):
+        """Drop the handle of a device, e.g. after an upstream error."""
+        self._entries.pop(key, None)
+
+    def clear(self):
+        """Drop every handle."""
+        self._entries.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        """Hit/miss counters and size of the cache."""
+        lookups = self.hits + self.misses + self.coalesced
+        return {
+            "size": len(self._entries),
+            "max_size": self.max_size,
+            "ttl_seconds": self.ttl,
+            "hits": self.hits,
+            "misses": self.misses,
+            "coalesced": self.coalesced,
+            "evictions": self.evictions,
+            "errors": self.errors,
+            "hit_ratio": (self.hits + self.coalesced) / lookups if lookups else 0.0,
+        }
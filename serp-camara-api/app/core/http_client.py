@@ -0,0 +1,85 @@
+"""
+Shared, pooled HTTP client for the direct calls to the Nokia NAC API.
+
+One httpx.AsyncClient lives for the whole app: connections are kept alive
+and reused (HTTP/2 multiplexed when the upstream supports it) instead of
+paying a TCP+TLS handshake per request. It is created on startup and closed
+on shutdown, its limits, timeouts and retries come from Settings.
+"""
+import logging
+from typing import Optional
+
+import httpx
+
+from .config import settings
+
+logger = logging.getLogger(__name__)
+
+_http_client: Optional[httpx.AsyncClient] = None
+
+
+def _http2_available() -> bool:
+    """HTTP/2 needs the h2 package (httpx[http2])."""
+    try:
+        import h2  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+def create_http_client() -> httpx.AsyncClient:
+    """Create a pooled HTTP client configured from Settings."""
+    http2 = settings.HTTP_CLIENT_HTTP2 and _http2_available()
+    if settings.HTTP_CLIENT_HTTP2 and not http2:
+        logger.warning("h2 is not installed, the HTTP client uses HTTP/1.1")
+
+    limits = httpx.Limits(
+        max_connections=settings.HTTP_CLIENT_MAX_CONNECTIONS,
+        max_keepalive_connections=settings.HTTP_CLIENT_MAX_KEEPALIVE,
+        keepalive_expiry=settings.HTTP_CLIENT_KEEPALIVE_EXPIRY,
+    )
+    timeout = httpx.Timeout(
+        settings.HTTP_CLIENT_TIMEOUT,
+        connect=settings.HTTP_CLIENT_CONNECT_TIMEOUT,
+        pool=settings.HTTP_CLIENT_POOL_TIMEOUT,
+    )
+    # Retries only cover failed connection attempts, so they are safe for
+    # non idempotent requests such as the session creation. The pool limits
+    # and HTTP/2 belong to the transport, the client ignores its own when
+    # given a transport
+    transport = httpx.AsyncHTTPTransport(
+        http2=http2,
+        limits=limits,
+        retries=settings.HTTP_CLIENT_RETRIES,
+    )
+    return httpx.AsyncClient(transport=transport, timeout=timeout)
+
+
+async def start_http_client():
+    """Create the shared HTTP client (app startup)."""
+    global _http_client
+    if _http_client is None:
+        _http_client = create_http_client()
+        logger.info("Shared HTTP client started")
+
+
+async def close_http_client():
+    """Close the shared HTTP client and its connections (app shutdown)."""
+    global _http_client
+    if _http_client is not None:
+        await _http_client.aclose()
+        _http_client = None
+        logger.info("Shared HTTP client closed")
+
+
+def get_http_client() -> httpx.AsyncClient:
+    """
+    Get the shared HTTP client.
+
+    Returns:
+        The app HTTP client, created on first use outside the app lifespan.
+    """
+    global _http_client
+    if _http_client is None:
+        _http_client = create_http_client()
+    return _http_client
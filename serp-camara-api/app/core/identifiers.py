@@ -0,0 +1,43 @@
+"""
+Normalization of the device identifiers sent to the Nokia NAC API.
+"""
+from typing import Optional
+
+
+def normalize_phone_number(phone_number: str) -> str:
+    """
+    Normalize a phone number to the international format (+XX...).
+
+    Args:
+        phone_number: Phone number, with or without "+" or "00" prefix,
+            spaces, dashes, dots or parentheses.
+
+    Returns:
+        The phone number as "+" followed by its digits.
+    """
+    number = phone_number.strip()
+    for separator in (" ", "-", ".", "(", ")"):
+        number = number.replace(separator, "")
+    if number.startswith("00"):
+        number = "+" + number[2:]
+    if not number.startswith("+"):
+        number = "+" + number
+    return number
+
+
+def device_key(phone_number: Optional[str] = None, ipv4_address: Optional[str] = None) -> str:
+    """
+    Cache key of a device.
+
+    Args:
+        phone_number: The phone number of the device.
+        ipv4_address: The public IPv4 address of the device.
+
+    Returns:
+        "tel:<normalized phone number>" or "ipv4:<address>".
+    """
+    if phone_number:
+        return f"tel:{normalize_phone_number(phone_number)}"
+    if ipv4_address:
+        return f"ipv4:{ipv4_address.strip()}"
+    raise ValueError("Either phone_number or ipv4_address must be provided")
@@ -0,0 +1,110 @@
+"""
+Cache of the device locations that honours the max_age of the callers.
+
+A cached fix younger than the max_age of a request is returned without any
+upstream call. Concurrent requests for the same device wait for the lookup
+already in progress when it is fresh enough for them, so a dashboard
+refreshing the whole fleet costs at most one upstream location query per
+vehicle per freshness window.
+"""
+import asyncio
+import logging
+import time
+from collections import OrderedDict
+from datetime import datetime, timezone
+from typing import Any, Awaitable, Callable, Dict, Tuple
+
+from .config import settings
+
+logger = logging.getLogger(__name__)
+
+
+def _fix_time(location: Dict[str, Any], fetched_at: float) -> float:
+    """Wall clock time of a fix: its upstream timestamp, else when fetched."""
+    timestamp = location.get("timestamp")
+    if isinstance(timestamp, datetime):
+        if timestamp.tzinfo is None:
+            timestamp = timestamp.replace(tzinfo=timezone.utc)
+        return min(timestamp.timestamp(), fetched_at)
+    return fetched_at
+
+
+class LocationCache:
+    """Last location of every device, by normalized device key."""
+
+    def __init__(self, max_size: int = settings.LOCATION_CACHE_MAX_SIZE):
+        self.max_size = max_size
+        self._entries: "OrderedDict[str, Tuple[float, Dict[str, Any]]]" = OrderedDict()
+        self._inflight: Dict[str, Tuple[int, asyncio.Future]] = {}
+
+        # Metrics
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self.errors = 0
+
+    async def get(self, key: str, max_age: int,
+                  loader: Callable[[], Awaitable[Dict[str, Any]]]) -> Dict[str, Any]:
+        """
+        Get the location of a device, at most max_age seconds old.
+
+        Args:
+            key: The normalized device key.
+            max_age: Maximum age of the location in seconds.
+            loader: Coroutine function querying the location upstream.
+
+        Returns:
+            The location dictionary.
+        """
+        entry = self._entries.get(key)
+        if entry is not None:
+            fix_time, location = entry
+            if time.time() - fix_time <= max_age:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return location
+
+        # A lookup asked with a max_age not above ours is fresh enough
+        inflight = self._inflight.get(key)
+        if inflight is not None and inflight[0] <= max_age:
+            self.coalesced += 1
+            return await asyncio.shield(inflight[1])
+
+        self.misses += 1
+        task = asyncio.ensure_future(self._load(key, loader))
+        self._inflight[key] = (max_age, task)
+        return await asyncio.shield(task)
+
+    async def _load(self, key: str,
+                    loader: Callable[[], Awaitable[Dict[str, Any]]]) -> Dict[str, Any]:
+        try:
+            location = await loader()
+        except Exception:
+            self.errors += 1
+            raise
+        finally:
+            if key in self._inflight and self._inflight[key][1] is asyncio.current_task():
+                del self._inflight[key]
+
+        fix_time = _fix_time(location, time.time())
+        cached = self._entries.get(key)
+        # A slower lookup must not replace a newer fix
+        if cached is None or cached[0] <= fix_time:
+            self._entries[key] = (fix_time, location)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+        return location
+
+    def stats(self) -> Dict[str, Any]:
+        """Hit/miss counters and size of the cache."""
+        lookups = self.hits + self.misses + self.coalesced
+        return {
+            "size": len(self._entries),
+            "max_size": self.max_size,
+            "hits": self.hits,
+            "misses": self.misses,
+            "coalesced": self.coalesced,
+            "errors": self.errors,
+            "hit_ratio": (self.hits + self.coalesced) / lookups if lookups else 0.0,
+        }
@@ -0,0 +1,187 @@
+"""
+Async facade over the blocking Network as Code SDK.
+
+Every SDK call does a synchronous upstream round-trip. Running it directly
+inside an async handler blocks the event loop, and with it every other
+request, for the whole round-trip. The facade runs the calls on a dedicated
+thread pool of NAC_SDK_MAX_WORKERS threads and keeps queue metrics.
+
+The helpers go through the upstream guard (see core.resilience): reads are
+retried and optionally hedged, writes only go through the breakers.
+"""
+import asyncio
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, Optional
+
+from .config import settings
+from .identifiers import device_key
+from .nokia_client import nokia_client
+from .resilience import SDKOverloadedError, upstream
+
+logger = logging.getLogger(__name__)
+
+
+class AsyncNACClient:
+    """Runs the Nokia NAC SDK calls on a dedicated executor."""
+
+    def __init__(self, max_workers: int = settings.NAC_SDK_MAX_WORKERS,
+                 max_queue: int = settings.NAC_SDK_MAX_QUEUE):
+        self.max_workers = max_workers
+        self.max_queue = max_queue
+        self._executor = ThreadPoolExecutor(
+            max_workers=max_workers, thread_name_prefix="nac-sdk")
+        self._lock = threading.Lock()
+
+        # Metrics
+        self.queued = 0
+        self.active = 0
+        self.completed = 0
+        self.failed = 0
+        self.rejected = 0
+        self.total_wait = 0.0
+        self.max_wait = 0.0
+        self.total_run = 0.0
+
+    async def run(self, fn: Callable[..., Any], *args, **kwargs) -> Any:
+        """
+        Run a blocking SDK call on the executor.
+
+        Args:
+            fn: The blocking function to call.
+            *args: Positional arguments of fn.
+            **kwargs: Keyword arguments of fn.
+
+        Returns:
+            The result of fn.
+
+        Raises:
+            SDKOverloadedError: If NAC_SDK_MAX_QUEUE calls are already waiting.
+        """
+        with self._lock:
+            if self.queued >= self.max_queue:
+                self.rejected += 1
+                raise SDKOverloadedError(
+                    f"{self.queued} Nokia NAC SDK calls already queued")
+            self.queued += 1
+        submitted = time.monotonic()
+
+        def call():
+            started = time.monotonic()
+            with self._lock:
+                self.queued -= 1
+                self.active += 1
+                wait = started - submitted
+                self.total_wait += wait
+                self.max_wait = max(self.max_wait, wait)
+            try:
+                result = fn(*args, **kwargs)
+            except Exception:
+                with self._lock:
+                    self.failed += 1
+                raise
+            finally:
+                with self._lock:
+                    self.active -= 1
+                    self.completed += 1
+                    self.total_run += time.monotonic() - started
+            return result
+
+        future = self._executor.submit(call)
+        try:
+            return await asyncio.wrap_future(future)
+        except asyncio.CancelledError:
+            # Timed out or cancelled before a thread picked it up
+            if future.cancel():
+                with self._lock:
+                    self.queued -= 1
+            raise
+
+    async def get_device(self, phone_number: Optional[str] = None,
+                         ipv4_address: Optional[str] = None) -> Any:
+        """
+        Get a device by phone number or IPv4 address.
+
+        Handles come from the device cache of the client, a miss runs one
+        lookup on the executor, shared by the concurrent callers.
+        """
+        return await nokia_client.device_cache.get(
+            device_key(phone_number, ipv4_address),
+            lambda: upstream.call(
+                "device",
+                lambda: self.run(nokia_client.get_device,
+                                 phone_number=phone_number,
+                                 ipv4_address=ipv4_address),
+                retries=settings.UPSTREAM_RETRIES,
+                hedge=True))
+
+    async def location(self, device: Any, max_age: Optional[int] = None) -> Any:
+        """Get the network location of a device."""
+        return await upstream.call(
+            "location",
+            lambda: self.run(device.location, max_age=max_age),
+            retries=settings.UPSTREAM_RETRIES,
+            hedge=True)
+
+    async def create_qod_session(self, device: Any, **kwargs) -> Any:
+        """Create a QoD session for a device."""
+        return await upstream.call(
+            "qod", lambda: self.run(device.create_qod_session, **kwargs))
+
+    async def delete_qod_session(self, session_id: str):
+        """Delete a QoD session by id."""
+        def delete():
+            nokia_client.client.sessions.get(session_id).delete()
+        await upstream.call(
+            "qod",
+            lambda: self.run(delete),
+            retries=settings.UPSTREAM_RETRIES)
+
+    async def sessions(self, device: Any) -> Any:
+        """List the QoD sessions of a device."""
+        return await upstream.call(
+            "qod",
+            lambda: self.run(device.sessions),
+            retries=settings.UPSTREAM_RETRIES,
+            hedge=True)
+
+    async def subscribe_connectivity(self, device: Any, **kwargs) -> Any:
+        """Subscribe to the connectivity status changes of a device."""
+        return await upstream.call(
+            "device-status",
+            lambda: self.run(nokia_client.client.connectivity.subscribe,
+                             device=device, **kwargs))
+
+    async def delete_connectivity_subscription(self, subscription_id: str):
+        """Delete a connectivity status subscription by id."""
+        def delete():
+            nokia_client.client.connectivity.get_subscription(subscription_id).delete()
+        await upstream.call(
+            "device-status",
+            lambda: self.run(delete),
+            retries=settings.UPSTREAM_RETRIES)
+
+    def metrics(self) -> Dict[str, Any]:
+        """Executor usage and queue depth."""
+        with self._lock:
+            return {
+                "max_workers": self.max_workers,
+                "max_queue": self.max_queue,
+                "queue_depth": self.queued,
+                "active": self.active,
+                "completed": self.completed,
+                "failed": self.failed,
+                "rejected": self.rejected,
+                "avg_wait_seconds": self.total_wait / self.completed if self.completed else 0.0,
+                "max_wait_seconds": self.max_wait,
+                "avg_run_seconds": self.total_run / self.completed if self.completed else 0.0,
+            }
+
+    def shutdown(self):
+        """Stop the executor, waiting for the calls in progress."""
+        self._executor.shutdown(wait=True)
+
+
+nac_async = AsyncNACClient()
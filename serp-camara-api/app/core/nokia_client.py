@@ -1,5 +1,7 @@
 import network_as_code as nac
 from .config import settings
+from .device_cache import DeviceHandleCache
+from .identifiers import normalize_phone_number
 import logging
 
 logger = logging.getLogger(__name__)
@@ -7,14 +9,17 @@ logger = logging.getLogger(__name__)
 class NokiaNACClient:
     _instance = None
     _client = None
+    _device_cache = None
 
     def __new__(cls):
         if cls._instance is None:
             cls._instance = super(NokiaNACClient, cls).__new__(cls)
             try:
                 cls._client = nac.NetworkAsCodeClient(
-                    token=settings.NOKIA_NAC_API_KEY
+                    token=settings.NOKIA_NAC_API_KEY,
+                    **settings.nac_base_urls()
                 )
+                cls._device_cache = DeviceHandleCache()
                 logger.info("Nokia NAC client initialized successfully")
             except Exception as e:
                 logger.error(f"Error initializing Nokia NAC client: {str(e)}")
@@ -25,13 +30,20 @@ class NokiaNACClient:
     def client(self):
         return self._client
 
+    @property
+    def device_cache(self) -> DeviceHandleCache:
+        """Cache of the device handles, used by the async facade"""
+        return self._device_cache
+
     def get_device(self, phone_number: str = None, ipv4_address: str = None):
         """
         Get a device by phone number or IPv4 address
         """
         try:
             if phone_number:
-                return self.client.devices.get(phone_number=phone_number)
+                return self.client.devices.get(
+                    phone_number=normalize_phone_number(phone_number)
+                )
             elif ipv4_address:
                 return self.client.devices.get(
                     ipv4_address=nac.models.device.DeviceIpv4Addr(
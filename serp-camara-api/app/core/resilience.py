@@ -0,0 +1,370 @@
+"""
+Resilience of the calls to the Nokia NAC upstream.
+
+Every upstream call goes through UpstreamGuard.call, which applies:
+
+- a circuit breaker per endpoint: after UPSTREAM_BREAKER_FAILURES
+  consecutive failures the endpoint is open and calls fail at once for
+  UPSTREAM_BREAKER_RESET seconds, then UPSTREAM_BREAKER_HALF_OPEN_CALLS
+  probe calls decide whether it closes again;
+- a retry budget shared by all the endpoints: retries, hedges and
+  fallbacks together are at most UPSTREAM_RETRY_BUDGET_RATIO of the
+  requests of the last UPSTREAM_RETRY_BUDGET_WINDOW seconds (plus
+  UPSTREAM_RETRY_BUDGET_MIN), so a carrier incident does not multiply the
+  load on the carrier;
+- exponential backoff with full jitter between retries;
+- optional hedging of the idempotent reads: when the first attempt has not
+  answered after UPSTREAM_HEDGE_DELAY seconds, a second one is started and
+  the first answer wins.
+
+Client errors (4xx other than 429) are not retried and do not count as
+failures of the endpoint. The SDK errors carry no status code, they are
+told by their type or by the HTTP error they are raised from. A full local
+executor (SDKOverloadedError) is neither retried nor a failure of the
+endpoint.
+"""
+import asyncio
+import logging
+import random
+import time
+from collections import deque
+from typing import Any, Awaitable, Callable, Deque, Dict, Optional
+
+from network_as_code.errors import APIError, AuthenticationException, InvalidParameter, NotFound
+
+from .config import settings
+
+logger = logging.getLogger(__name__)
+
+
+class CircuitOpenError(Exception):
+    """Raised when an upstream endpoint is open and the call is not tried."""
+
+    def __init__(self, endpoint: str, retry_after: float):
+        super().__init__(
+            f"Upstream endpoint {endpoint} unavailable, retry in {retry_after:.0f}s")
+        self.endpoint = endpoint
+        self.retry_after = retry_after
+
+
+class RetryBudgetExhaustedError(Exception):
+    """Raised when a fallback call finds the retry budget spent."""
+
+
+class UpstreamHTTPError(Exception):
+    """Error answer of the upstream to a direct HTTP call."""
+
+    def __init__(self, status_code: int, text: str):
+        super().__init__(f"HTTP {status_code}: {text}")
+        self.status_code = status_code
+
+
+class SDKOverloadedError(Exception):
+    """Raised when too many SDK calls are already waiting for a thread."""
+
+
+# SDK errors of a request refused by the upstream, whatever the status code
+SDK_CLIENT_ERRORS = (NotFound, AuthenticationException, InvalidParameter)
+
+
+def _status_code(error: Optional[BaseException]) -> Optional[int]:
+    """
+    Status code of an upstream error, if any: of a direct HTTP call, or of
+    the HTTP error an SDK error is raised from.
+    """
+    while error is not None:
+        status_code = getattr(error, "status_code", None)
+        if status_code is None:
+            status_code = getattr(getattr(error, "response", None), "status_code", None)
+        if isinstance(status_code, int):
+            return status_code
+        error = error.__cause__
+    return None
+
+
+def is_client_error(error: Exception) -> bool:
+    """Whether the request itself is wrong, retrying it cannot help."""
+    if isinstance(error, (ValueError, TypeError, KeyError) + SDK_CLIENT_ERRORS):
+        return True
+    status_code = _status_code(error)
+    if status_code is None:
+        # The SDK raises APIError for the 4xx answers
+        return isinstance(error, APIError)
+    return 400 <= status_code < 500 and status_code != 429
+
+
+class CircuitBreaker:
+    """Consecutive failures breaker of an upstream endpoint."""
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(self, endpoint: str,
+                 failure_threshold: int = settings.UPSTREAM_BREAKER_FAILURES,
+                 reset_timeout: float = settings.UPSTREAM_BREAKER_RESET,
+                 half_open_calls: int = settings.UPSTREAM_BREAKER_HALF_OPEN_CALLS):
+        self.endpoint = endpoint
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.half_open_calls = half_open_calls
+        self.state = self.CLOSED
+        self.consecutive_failures = 0
+        self.opened_at = 0.0
+        self._probes = 0
+
+        # Metrics
+        self.calls = 0
+        self.successes = 0
+        self.failures = 0
+        self.rejected = 0
+        self.opened = 0
+
+    def acquire(self):
+        """
+        Let a call through.
+
+        Raises:
+            CircuitOpenError: If the endpoint is open, or already probed.
+        """
+        if self.state == self.OPEN:
+            remaining = self.opened_at + self.reset_timeout - time.monotonic()
+            if remaining > 0:
+                self.rejected += 1
+                raise CircuitOpenError(self.endpoint, remaining)
+            self.state = self.HALF_OPEN
+            self._probes = 0
+            logger.info(f"Upstream endpoint {self.endpoint} half open")
+        if self.state == self.HALF_OPEN:
+            if self._probes >= self.half_open_calls:
+                self.rejected += 1
+                raise CircuitOpenError(self.endpoint, self.reset_timeout)
+            self._probes += 1
+        self.calls += 1
+
+    def release(self, success: Optional[bool]):
+        """
+        Record the outcome of a call let through.
+
+        Args:
+            success: True or False, None when it says nothing about the
+                endpoint (client error, cancelled).
+        """
+        if self.state == self.HALF_OPEN:
+            self._probes = max(0, self._probes - 1)
+        if success is None:
+            return
+        if success:
+            self.successes += 1
+            self.consecutive_failures = 0
+            if self.state == self.HALF_OPEN:
+                self.state = self.CLOSED
+                logger.info(f"Upstream endpoint {self.endpoint} closed")
+            return
+        self.failures += 1
+        self.consecutive_failures += 1
+        if self.state == self.HALF_OPEN or (
+                self.state == self.CLOSED
+                and self.consecutive_failures >= self.failure_threshold):
+            self.state = self.OPEN
+            self.opened_at = time.monotonic()
+            self.opened += 1
+            logger.error(
+                f"Upstream endpoint {self.endpoint} open after "
+                f"{self.consecutive_failures} consecutive failures")
+
+    def stats(self) -> Dict[str, Any]:
+        """State and counters."""
+        return {
+            "state": self.state,
+            "consecutive_failures": self.consecutive_failures,
+            "calls": self.calls,
+            "successes": self.successes,
+            "failures": self.failures,
+            "rejected": self.rejected,
+            "opened": self.opened,
+        }
+
+
+class RetryBudget:
+    """Retries allowed as a ratio of the recent requests."""
+
+    def __init__(self, ratio: float = settings.UPSTREAM_RETRY_BUDGET_RATIO,
+                 min_retries: int = settings.UPSTREAM_RETRY_BUDGET_MIN,
+                 window: float = settings.UPSTREAM_RETRY_BUDGET_WINDOW):
+        self.ratio = ratio
+        self.min_retries = min_retries
+        self.window = window
+        self._requests: Deque[float] = deque()
+        self._retries: Deque[float] = deque()
+
+        # Metrics
+        self.granted = 0
+        self.exhausted = 0
+
+    def _prune(self, now: float):
+        for timestamps in (self._requests, self._retries):
+            while timestamps and timestamps[0] <= now - self.window:
+                timestamps.popleft()
+
+    def record_request(self):
+        """Count a first attempt."""
+        now = time.monotonic()
+        self._prune(now)
+        self._requests.append(now)
+
+    def try_retry(self) -> bool:
+        """Withdraw a retry, False if the budget is spent."""
+        now = time.monotonic()
+        self._prune(now)
+        if len(self._retries) >= self.min_retries + self.ratio * len(self._requests):
+            self.exhausted += 1
+            return False
+        self._retries.append(now)
+        self.granted += 1
+        return True
+
+    def stats(self) -> Dict[str, Any]:
+        """Window usage and counters."""
+        self._prune(time.monotonic())
+        return {
+            "window_requests": len(self._requests),
+            "window_retries": len(self._retries),
+            "available": max(0, int(self.min_retries + self.ratio * len(self._requests))
+                             - len(self._retries)),
+            "granted": self.granted,
+            "exhausted": self.exhausted,
+        }
+
+
+def backoff_delay(attempt: int, base: float = settings.UPSTREAM_BACKOFF_BASE,
+                  cap: float = settings.UPSTREAM_BACKOFF_MAX) -> float:
+    """Full jitter exponential backoff before retry number attempt (from 1)."""
+    return random.uniform(0, min(cap, base * 2 ** (attempt - 1)))
+
+
+class UpstreamGuard:
+    """Breakers per endpoint, the shared retry budget, retries and hedging."""
+
+    def __init__(self, budget: Optional[RetryBudget] = None,
+                 hedge_delay: float = settings.UPSTREAM_HEDGE_DELAY):
+        self.budget = budget or RetryBudget()
+        self.hedge_delay = hedge_delay
+        self._breakers: Dict[str, CircuitBreaker] = {}
+
+        # Metrics
+        self.retries = 0
+        self.fallbacks = 0
+        self.hedges = 0
+        self.hedge_wins = 0
+
+    def breaker(self, endpoint: str) -> CircuitBreaker:
+        """Breaker of an endpoint, created on first use."""
+        breaker = self._breakers.get(endpoint)
+        if breaker is None:
+            breaker = self._breakers[endpoint] = CircuitBreaker(endpoint)
+        return breaker
+
+    async def call(self, endpoint: str, fn: Callable[[], Awaitable[Any]],
+                   retries: int = 0, hedge: bool = False, fallback: bool = False) -> Any:
+        """
+        Call the upstream through the breaker of endpoint.
+
+        Args:
+            endpoint: Name of the upstream endpoint (e.g. "location").
+            fn: Coroutine function doing the call, called once per attempt.
+            retries: Retries after a failure, only for idempotent calls.
+            hedge: Hedge the attempts, only for idempotent reads.
+            fallback: The call replaces a failed one (e.g. direct HTTP after
+                the SDK): it needs the retry budget instead of counting as
+                a request.
+
+        Returns:
+            The result of fn.
+
+        Raises:
+            CircuitOpenError: If the endpoint is open.
+        """
+        breaker = self.breaker(endpoint)
+        if fallback:
+            if not self.budget.try_retry():
+                raise RetryBudgetExhaustedError(
+                    f"No retry budget left for a fallback call to {endpoint}")
+            self.fallbacks += 1
+        else:
+            self.budget.record_request()
+
+        attempt = 0
+        while True:
+            breaker.acquire()
+            success = None
+            try:
+                if hedge and self.hedge_delay > 0:
+                    result = await self._hedged(fn)
+                else:
+                    result = await fn()
+                success = True
+                return result
+            except SDKOverloadedError:
+                # Not even sent, says nothing about the endpoint
+                raise
+            except Exception as e:
+                if is_client_error(e):
+                    raise
+                success = False
+                if attempt >= retries or not self.budget.try_retry():
+                    raise
+                error = e
+            finally:
+                breaker.release(success)
+
+            attempt += 1
+            self.retries += 1
+            delay = backoff_delay(attempt)
+            logger.warning(
+                f"Retrying {endpoint} in {delay:.2f}s after: {str(error)}")
+            await asyncio.sleep(delay)
+
+    async def _hedged(self, fn: Callable[[], Awaitable[Any]]) -> Any:
+        """Start a second attempt if the first one is slow, first answer wins."""
+        first = asyncio.ensure_future(fn())
+        pending = {first}
+        try:
+            done, pending = await asyncio.wait(pending, timeout=self.hedge_delay)
+            if done or not self.budget.try_retry():
+                return await first
+            self.hedges += 1
+            second = asyncio.ensure_future(fn())
+            pending = {first, second}
+            error = None
+            while pending:
+                done, pending = await asyncio.wait(
+                    pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        if task is second:
+                            self.hedge_wins += 1
+                        return task.result()
+                    error = task.exception()
+            raise error
+        finally:
+            for task in pending:
+                task.cancel()
+
+    def stats(self) -> Dict[str, Any]:
+        """Breakers, retry budget and counters."""
+        return {
+            "breakers": {
+                endpoint: breaker.stats()
+                for endpoint, breaker in self._breakers.items()
+            },
+            "retry_budget": self.budget.stats(),
+            "retries": self.retries,
+            "fallbacks": self.fallbacks,
+            "hedge_delay": self.hedge_delay,
+            "hedges": self.hedges,
+            "hedge_wins": self.hedge_wins,
+        }
+
+
+upstream = UpstreamGuard()
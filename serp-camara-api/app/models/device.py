@@ -18,6 +18,14 @@ class DeviceLocation(BaseModel):
     accuracy: Optional[float] = None
     timestamp: datetime = Field(default_factory=datetime.now)
 
+class DeviceStatusSubscription(BaseModel):
+    subscription_id: str = Field(..., description="ID of the subscription")
+    device_id: str = Field(..., description="Phone number with international format (+XX...)")
+    notification_url: str = Field(..., description="URL the status notifications are sent to")
+    notification_token: Optional[str] = Field(None, description="Bearer token of the notifications")
+    upstream_subscription_id: Optional[str] = Field(None, description="Nokia NAC subscription of the device")
+    created_at: datetime = Field(default_factory=datetime.now)
+
 class DeviceCreate(DeviceBase):
     name: str = Field(..., description="Device name or identifier")
     type: str = Field(..., description="Device type (e.g., ambulance, police car)")
@@ -8,6 +8,7 @@ class QoDSessionCreate(BaseModel):
     profile: str = Field(default=settings.DEFAULT_QOD_PROFILE, description="QoS profile")
     duration: int = Field(default=settings.DEFAULT_QOD_DURATION, description="Session duration in seconds")
     service_ipv4: str = Field(default=settings.DEFAULT_IPV4, description="Service IPv4 address")
+    emergency_id: Optional[str] = Field(default=None, description="Emergency the session is for")
 
 class QoDSession(QoDSessionCreate):
     session_id: str
@@ -20,6 +21,15 @@ class QoDSessionList(BaseModel):
     total: int
 
 class EmergencyQoDRequest(BaseModel):
+    emergency_id: Optional[str] = Field(default=None, description="Emergency the sessions are for")
     devices: List[str] = Field(..., description="List of device phone numbers")
     profile: str = Field(default=settings.DEFAULT_QOD_PROFILE, description="QoS profile")
-    duration: int = Field(default=settings.DEFAULT_QOD_DURATION, description="Session duration in seconds") 
\ No newline at end of file
+    duration: int = Field(default=settings.DEFAULT_QOD_DURATION, description="Session duration in seconds")
+
+class FailedDevice(BaseModel):
+    device_id: str = Field(..., description="Device phone number or identifier")
+    error: str = Field(..., description="Why no session was created")
+
+class EmergencyQoDResult(BaseModel):
+    sessions: List[QoDSession] = Field(..., description="Sessions created")
+    failed_devices: List[FailedDevice] = Field(default=[], description="Devices without a session")
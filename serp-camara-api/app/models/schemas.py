@@ -2,8 +2,9 @@
 Pydantic models/schemas for the Nokia NAC API.
 """
 from typing import Optional, List, Dict, Any
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
 from datetime import datetime
+from app.core.config import settings
 
 # Device Status Models
 
@@ -20,6 +21,31 @@ class StatusSubscription(BaseModel):
     notification_token: Optional[str] = None
 
 
+# Multi-device Models
+class DeviceBatchRequest(BaseModel):
+    """Request for several devices at once."""
+    device_ids: List[str] = Field(..., min_items=1, max_items=settings.BATCH_MAX_DEVICES)
+
+
+class LocationBatchRequest(DeviceBatchRequest):
+    """Request for the location of several devices."""
+    max_age: Optional[int] = None
+
+
+class DeviceBatchResult(BaseModel):
+    """Result of one device: its result or its error."""
+    device_id: str
+    result: Optional[Dict[str, Any]] = None
+    error: Optional[str] = None
+
+
+class DeviceBatchResponse(BaseModel):
+    """Results of several devices, in the order requested."""
+    results: List[DeviceBatchResult]
+    succeeded: int
+    failed: int
+
+
 # Location Models
 class LocationRequest(BaseModel):
     """Request for device location."""
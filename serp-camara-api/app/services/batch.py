@@ -0,0 +1,88 @@
+"""
+Service for the operations over several devices at once.
+"""
+import json
+import logging
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, List, Optional
+
+from fastapi.encoders import jsonable_encoder
+
+from app.core.concurrency import bounded_as_completed, bounded_gather
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+NDJSON_MEDIA_TYPE = "application/x-ndjson"
+
+
+def should_stream(device_ids: List[str], accept: Optional[str] = None) -> bool:
+    """
+    Whether the results are streamed as NDJSON.
+
+    Args:
+        device_ids: The devices requested.
+        accept: The Accept header of the request.
+
+    Returns:
+        True for large lists or if the client asked for NDJSON.
+    """
+    return (len(device_ids) >= settings.BATCH_STREAM_THRESHOLD
+            or NDJSON_MEDIA_TYPE in (accept or ""))
+
+
+def _result(device_id: str, result: Any, error: Optional[Exception]) -> Dict[str, Any]:
+    if error is not None:
+        logger.error(f"Error processing device {device_id}: {str(error)}")
+        return {"device_id": device_id, "result": None, "error": str(error)}
+    return {"device_id": device_id, "result": jsonable_encoder(result), "error": None}
+
+
+async def batch_results(device_ids: List[str],
+                        worker: Callable[[str], Awaitable[Any]]) -> Dict[str, Any]:
+    """
+    Run worker for every device concurrently.
+
+    Args:
+        device_ids: The devices to process.
+        worker: Coroutine function processing one device.
+
+    Returns:
+        The results of every device in the order requested, and the
+        number of devices succeeded and failed.
+    """
+    results = [
+        _result(device_id, result, error)
+        for device_id, result, error in await bounded_gather(
+            device_ids,
+            worker,
+            limit=settings.BATCH_CONCURRENCY,
+            timeout=settings.BATCH_DEVICE_TIMEOUT
+        )
+    ]
+    failed = sum(1 for result in results if result["error"] is not None)
+    return {
+        "results": results,
+        "succeeded": len(results) - failed,
+        "failed": failed
+    }
+
+
+async def batch_results_ndjson(device_ids: List[str],
+                               worker: Callable[[str], Awaitable[Any]]) -> AsyncIterator[str]:
+    """
+    Run worker for every device concurrently, streaming the results.
+
+    Args:
+        device_ids: The devices to process.
+        worker: Coroutine function processing one device.
+
+    Yields:
+        One JSON line per device, as soon as it is done.
+    """
+    async for device_id, result, error in bounded_as_completed(
+        device_ids,
+        worker,
+        limit=settings.BATCH_CONCURRENCY,
+        timeout=settings.BATCH_DEVICE_TIMEOUT
+    ):
+        yield json.dumps(_result(device_id, result, error)) + "\n"
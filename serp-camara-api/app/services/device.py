@@ -2,11 +2,12 @@
 Service for device status operations with Nokia NAC.
 """
 import logging
-from typing import Dict, Any, Optional
+from typing import Dict, Any, List, Optional
 import httpx
-from network_as_code.models.device import DeviceIpv4Addr
-from app.core.client import nokia_nac_client
+from app.core.nac_async import nac_async
+from app.core.identifiers import normalize_phone_number
 from app.core.config import settings
+from app.services.subscriptions import subscription_registry
 
 logger = logging.getLogger(__name__)
 
@@ -23,17 +24,10 @@ async def get_device(device_id: str) -> Any:
     """
     try:
         # Aseguramos que el número de teléfono tenga el formato correcto
-        if not device_id.startswith("+"):
-            device_id = "+" + device_id.strip()
+        device_id = normalize_phone_number(device_id)
 
-        # Obtenemos el dispositivo usando el cliente Nokia NAC
-        device = nokia_nac_client.devices.get(
-            phone_number=device_id,
-            ipv4_address=DeviceIpv4Addr(
-                public_address=settings.DEFAULT_IPV4
-            )
-        )
-        return device
+        # Obtenemos el dispositivo de la caché o del cliente Nokia NAC
+        return await nac_async.get_device(phone_number=device_id)
     except Exception as e:
         logger.error(f"Error getting device {device_id}: {str(e)}")
         raise
@@ -79,11 +73,21 @@ async def subscribe_to_status(device_id: str, notification_url: str, notificatio
     Returns:
         Subscription information.
     """
-    # This is a placeholder as actual implementation would depend on Nokia NAC SDK capabilities
-    return {"subscription_id": "not_implemented_yet"}
+    try:
+        subscription = await subscription_registry.subscribe(
+            device_id, notification_url, notification_token)
+        return {
+            "subscription_id": subscription.subscription_id,
+            "device_id": subscription.device_id,
+            "notification_url": subscription.notification_url,
+            "created_at": subscription.created_at.isoformat()
+        }
+    except Exception as e:
+        logger.error(f"Error subscribing to status of {device_id}: {str(e)}")
+        raise
 
 
-async def unsubscribe_from_status(subscription_id: str) -> Dict[str, Any]:
+async def unsubscribe_from_status(subscription_id: str) -> Optional[Dict[str, Any]]:
     """
     Cancel a subscription to device status changes.
     
@@ -91,7 +95,21 @@ async def unsubscribe_from_status(subscription_id: str) -> Dict[str, Any]:
         subscription_id: The ID of the subscription to cancel.
         
     Returns:
-        Success message.
+        Success message, None if the subscription does not exist.
     """
-    # This is a placeholder as actual implementation would depend on Nokia NAC SDK capabilities
+    if not await subscription_registry.unsubscribe(subscription_id):
+        return None
     return {"message": "Suscripción cancelada correctamente"}
+
+
+def handle_status_callback(events: List[Dict[str, Any]]) -> int:
+    """
+    Forward upstream status notifications to the subscribers of the devices.
+    
+    Args:
+        events: The CloudEvents received from Nokia NAC.
+        
+    Returns:
+        The number of notifications queued for delivery.
+    """
+    return sum(subscription_registry.notify(event) for event in events)
@@ -2,40 +2,71 @@
 Service for location operations with Nokia NAC.
 """
 import logging
+from datetime import datetime, timezone
 from typing import Dict, Any, Optional
 from app.services.device import get_device
+from app.core.nac_async import nac_async
 from app.core.config import settings
+from app.core.identifiers import device_key
+from app.core.location_cache import LocationCache
 
 logger = logging.getLogger(__name__)
 
+# Last location of the devices, see LocationCache
+location_cache = LocationCache()
 
-async def get_device_location(device_id: str, max_age: Optional[int] = 3600) -> Dict[str, Any]:
+
+async def _query_device_location(device_id: str, max_age: int) -> Dict[str, Any]:
     """
-    Get the location of a device.
-    
+    Query the location of a device upstream.
+
     Args:
         device_id: The phone number of the device.
         max_age: Maximum age of the location information in seconds.
-        
+
     Returns:
         A dictionary with location information.
     """
-    try:
-        device = await get_device(device_id)
+    device = await get_device(device_id)
 
-        # Get location information
-        location = device.location(max_age=max_age)
+    # Get location information
+    location = await nac_async.location(device, max_age=max_age)
 
-        # Convert to dictionary for API response
-        location_dict = {
-            "device_id": device_id,
-            "latitude": location.latitude if hasattr(location, "latitude") else None,
-            "longitude": location.longitude if hasattr(location, "longitude") else None,
-            "elevation": location.elevation if hasattr(location, "elevation") else None,
-            "accuracy": getattr(location, "accuracy", None),
-            "timestamp": getattr(location, "timestamp", None)
-        }
-        return location_dict
+    # Convert to dictionary for API response
+    return {
+        "device_id": device_id,
+        "latitude": location.latitude if hasattr(location, "latitude") else None,
+        "longitude": location.longitude if hasattr(location, "longitude") else None,
+        "elevation": location.elevation if hasattr(location, "elevation") else None,
+        "accuracy": getattr(location, "accuracy", None),
+        # When the upstream does not date the fix, the time it was fetched
+        "timestamp": getattr(location, "timestamp", None) or datetime.now(timezone.utc)
+    }
+
+
+async def get_device_location(device_id: str, max_age: Optional[int] = None) -> Dict[str, Any]:
+    """
+    Get the location of a device.
+
+    A cached location younger than max_age is returned right away, and
+    concurrent requests for the same device share one upstream query.
+
+    Args:
+        device_id: The phone number of the device.
+        max_age: Maximum age of the location information in seconds,
+            DEFAULT_MAX_AGE if not given.
+
+    Returns:
+        A dictionary with location information.
+    """
+    if max_age is None:
+        max_age = settings.DEFAULT_MAX_AGE
+    try:
+        return await location_cache.get(
+            device_key(device_id),
+            max_age,
+            lambda: _query_device_location(device_id, max_age)
+        )
     except Exception as e:
         logger.error(
             f"Error getting location for device {device_id}: {str(e)}")
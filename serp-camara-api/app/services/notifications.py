@@ -0,0 +1,199 @@
+"""
+Batched delivery of the device status notifications to the subscribers.
+
+Notifications are queued per destination (notification URL and token) and
+sent as CloudEvents batches: one POST per destination carries up to
+NOTIFICATION_BATCH_SIZE notifications, waiting at most
+NOTIFICATION_BATCH_SECONDS for them. A destination has at most one delivery
+in progress, so its notifications are delivered in order, and at most
+NOTIFICATION_MAX_IN_FLIGHT deliveries run at the same time over the shared
+HTTP client. Failed deliveries are retried with exponential backoff and
+jitter, NOTIFICATION_MAX_RETRIES times.
+"""
+import asyncio
+import logging
+import random
+from collections import deque
+from typing import Any, Deque, Dict, List, Optional, Set, Tuple
+
+from ..core.config import settings
+from ..core.http_client import get_http_client
+
+logger = logging.getLogger(__name__)
+
+BATCH_MEDIA_TYPE = "application/cloudevents-batch+json"
+
+Destination = Tuple[str, Optional[str]]
+
+
+class DeliveryError(Exception):
+    """Raised when a destination rejects a batch for good."""
+
+
+class NotificationDispatcher:
+    """Queues the notifications per destination and delivers them in batches."""
+
+    def __init__(self, batch_size: int = settings.NOTIFICATION_BATCH_SIZE,
+                 batch_seconds: float = settings.NOTIFICATION_BATCH_SECONDS,
+                 max_in_flight: int = settings.NOTIFICATION_MAX_IN_FLIGHT,
+                 max_retries: int = settings.NOTIFICATION_MAX_RETRIES,
+                 backoff: float = settings.NOTIFICATION_BACKOFF,
+                 max_pending: int = settings.NOTIFICATION_MAX_PENDING):
+        self.batch_size = batch_size
+        self.batch_seconds = batch_seconds
+        self.max_in_flight = max_in_flight
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.max_pending = max_pending
+        self._queues: Dict[Destination, Deque[Dict[str, Any]]] = {}
+        self._busy: Set[Destination] = set()
+        self._deliveries: Set[asyncio.Task] = set()
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        self._wakeup: Optional[asyncio.Event] = None
+        self._task: Optional[asyncio.Task] = None
+
+        # Metrics
+        self.queued = 0
+        self.delivered = 0
+        self.batches = 0
+        self.retries = 0
+        self.failed = 0
+        self.dropped = 0
+
+    @property
+    def pending(self) -> int:
+        """Notifications waiting for a delivery."""
+        return sum(len(queue) for queue in self._queues.values())
+
+    def enqueue(self, notification_url: str, notification_token: Optional[str],
+                notification: Dict[str, Any]):
+        """
+        Queue a notification for a destination.
+
+        Args:
+            notification_url: The URL of the subscriber.
+            notification_token: The bearer token of the subscriber.
+            notification: The CloudEvent to deliver.
+        """
+        destination = (notification_url, notification_token)
+        queue = self._queues.setdefault(destination, deque())
+        if self.pending >= self.max_pending:
+            # Keep the freshest statuses
+            victim = queue if queue else max(self._queues.values(), key=len)
+            victim.popleft()
+            self.dropped += 1
+        queue.append(notification)
+        self.queued += 1
+        if len(queue) >= self.batch_size and self._wakeup is not None:
+            self._wakeup.set()
+
+    async def start(self):
+        """Start dispatching (app startup)."""
+        self._semaphore = asyncio.Semaphore(self.max_in_flight)
+        self._wakeup = asyncio.Event()
+        self._task = asyncio.ensure_future(self._run())
+
+    async def stop(self, timeout: float = 5.0):
+        """Deliver what is queued, for at most timeout seconds, and stop."""
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+        deadline = asyncio.get_running_loop().time() + timeout
+        self._dispatch()
+        while self._deliveries:
+            remaining = deadline - asyncio.get_running_loop().time()
+            if remaining <= 0:
+                break
+            await asyncio.wait(set(self._deliveries), timeout=remaining,
+                               return_when=asyncio.FIRST_COMPLETED)
+            # Next batches of the destinations done
+            self._dispatch()
+        for task in list(self._deliveries):
+            task.cancel()
+        if self.pending:
+            logger.error(f"{self.pending} status notifications not delivered on shutdown")
+
+    def stats(self) -> Dict[str, Any]:
+        """Queue depth and delivery counters."""
+        return {
+            "pending": self.pending,
+            "destinations": len(self._queues),
+            "in_flight": len(self._deliveries),
+            "queued": self.queued,
+            "delivered": self.delivered,
+            "batches": self.batches,
+            "retries": self.retries,
+            "failed": self.failed,
+            "dropped": self.dropped,
+        }
+
+    async def _run(self):
+        while True:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), self.batch_seconds)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            self._dispatch()
+
+    def _dispatch(self):
+        """Start a delivery for every idle destination with notifications."""
+        for destination, queue in list(self._queues.items()):
+            if destination in self._busy:
+                continue
+            if not queue:
+                del self._queues[destination]
+                continue
+            batch = [queue.popleft() for _ in range(min(self.batch_size, len(queue)))]
+            self._busy.add(destination)
+            task = asyncio.ensure_future(self._deliver(destination, batch))
+            self._deliveries.add(task)
+            task.add_done_callback(self._deliveries.discard)
+
+    async def _deliver(self, destination: Destination, batch: List[Dict[str, Any]]):
+        notification_url, notification_token = destination
+        headers = {"Content-Type": BATCH_MEDIA_TYPE}
+        if notification_token:
+            headers["Authorization"] = f"Bearer {notification_token}"
+        try:
+            async with self._semaphore:
+                for attempt in range(self.max_retries + 1):
+                    if attempt:
+                        self.retries += 1
+                        await asyncio.sleep(
+                            self.backoff * 2 ** (attempt - 1) * random.uniform(0.5, 1.5))
+                    try:
+                        await self._post(notification_url, headers, batch)
+                    except DeliveryError as e:
+                        logger.error(f"Notifications rejected by {notification_url}: {str(e)}")
+                        break
+                    except Exception as e:
+                        logger.error(f"Error delivering notifications to {notification_url}: {str(e)}")
+                        continue
+                    self.batches += 1
+                    self.delivered += len(batch)
+                    return
+                self.failed += len(batch)
+        finally:
+            self._busy.discard(destination)
+            queue = self._queues.get(destination)
+            if queue and self._wakeup is not None:
+                self._wakeup.set()
+
+    async def _post(self, notification_url: str, headers: Dict[str, str],
+                    batch: List[Dict[str, Any]]):
+        response = await get_http_client().post(
+            notification_url, json=batch, headers=headers)
+        if response.status_code == 429 or response.status_code >= 500:
+            raise Exception(f"HTTP {response.status_code}")
+        if response.status_code >= 400:
+            # Retrying will not change the answer
+            raise DeliveryError(f"HTTP {response.status_code}: {response.text}")
+
+
+notification_dispatcher = NotificationDispatcher()
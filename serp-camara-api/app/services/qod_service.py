@@ -1,28 +1,37 @@
+import asyncio
 from datetime import datetime, timedelta
 import logging
-from typing import List, Optional
+from typing import List, Optional, Set
 from ..core.nokia_client import nokia_client
+from ..core.nac_async import nac_async
 from ..models.qod import QoDSessionCreate, QoDSession
 from ..core.config import settings
-import httpx
+from ..core.http_client import get_http_client
+from ..core.identifiers import normalize_phone_number
+from ..core.resilience import CircuitOpenError, UpstreamHTTPError, is_client_error, upstream
+from .session_registry import session_registry
 
 logger = logging.getLogger(__name__)
 
 class QoDService:
     def __init__(self):
         self.client = nokia_client.client
-        self._active_sessions = {}
+        self.sessions = session_registry
+        # Creations that outlived their caller and deletions of the sessions
+        # they created, referenced until done
+        self._late_tasks: Set[asyncio.Future] = set()
 
     async def create_session(self, session_data: QoDSessionCreate) -> QoDSession:
         try:
             # Normalize phone number
-            phone_number = session_data.device_id if session_data.device_id.startswith("+") else f"+{session_data.device_id}"
+            phone_number = normalize_phone_number(session_data.device_id)
             
             # Get device
-            device = nokia_client.get_device(phone_number=phone_number)
+            device = await nac_async.get_device(phone_number=phone_number)
             
             # Create QoD session
-            qod_session = device.create_qod_session(
+            qod_session = await nac_async.create_qod_session(
+                device,
                 service_ipv4=session_data.service_ipv4,
                 profile=session_data.profile,
                 duration=session_data.duration
@@ -35,70 +44,117 @@ class QoDService:
                 profile=session_data.profile,
                 duration=session_data.duration,
                 service_ipv4=session_data.service_ipv4,
+                emergency_id=session_data.emergency_id,
                 created_at=datetime.now(),
                 expires_at=datetime.now() + timedelta(seconds=session_data.duration)
             )
             
             # Store session
-            self._active_sessions[session.session_id] = session
+            await self.sessions.add(session)
             
             return session
             
         except Exception as e:
             logger.error(f"Error creating QoD session: {str(e)}")
-            # Fallback to direct HTTP request if SDK fails
+            # The direct request hits the same upstream: not when it is
+            # known down or the request itself is wrong
+            if isinstance(e, CircuitOpenError) or is_client_error(e):
+                raise
+            # Fallback to direct HTTP request if SDK fails, within the
+            # retry budget
             try:
-                return await self._create_session_direct(session_data)
+                return await upstream.call(
+                    "qod",
+                    lambda: self._create_session_direct(session_data),
+                    fallback=True
+                )
             except Exception as direct_err:
                 logger.error(f"Direct request also failed: {str(direct_err)}")
                 raise
 
+    async def create_session_or_release(self, session_data: QoDSessionCreate) -> QoDSession:
+        """
+        Create a session, deleting it if the caller stops waiting for it.
+
+        The SDK call runs on an executor thread that a timeout of the caller
+        cannot stop, so the creation is shielded from the cancellation. A
+        session it still creates afterwards is unregistered and deleted
+        upstream: the caller reported the device as failed and may retry it.
+        """
+        creation = asyncio.ensure_future(self.create_session(session_data))
+        try:
+            return await asyncio.shield(creation)
+        except asyncio.CancelledError:
+            self._late_tasks.add(creation)
+            creation.add_done_callback(self._release_late_session)
+            raise
+
+    def _release_late_session(self, creation: asyncio.Future):
+        self._late_tasks.discard(creation)
+        if creation.cancelled() or creation.exception() is not None:
+            return
+        deletion = asyncio.ensure_future(self._delete_late_session(creation.result()))
+        self._late_tasks.add(deletion)
+        deletion.add_done_callback(self._late_tasks.discard)
+
+    async def _delete_late_session(self, session: QoDSession):
+        logger.warning(
+            f"QoD session {session.session_id} of device {session.device_id} created after its timeout, deleting it")
+        await self.sessions.remove(session.session_id)
+        try:
+            await nac_async.delete_qod_session(session.session_id)
+        except Exception as e:
+            logger.error(f"Error deleting late QoD session {session.session_id}: {str(e)}")
+
     async def _create_session_direct(self, session_data: QoDSessionCreate) -> QoDSession:
         """Fallback method using direct HTTP request"""
-        async with httpx.AsyncClient() as client:
-            headers = {
-                "Authorization": f"Bearer {settings.NOKIA_NAC_API_KEY}",
-                "Content-Type": "application/json"
-            }
-            
-            payload = {
-                "qosProfile": session_data.profile,
-                "device": {
-                    "phoneNumber": session_data.device_id
-                },
-                "applicationServer": {
-                    "ipv4Address": session_data.service_ipv4
-                },
-                "duration": session_data.duration
-            }
-            
-            response = await client.post(
-                f"{settings.NOKIA_NAC_API_URL}/sessions",
-                json=payload,
-                headers=headers
+        client = get_http_client()
+        headers = {
+            "Content-Type": "application/json"
+        }
+        # No key against the local mock
+        if settings.NOKIA_NAC_API_KEY:
+            headers["Authorization"] = f"Bearer {settings.NOKIA_NAC_API_KEY}"
+        
+        payload = {
+            "qosProfile": session_data.profile,
+            "device": {
+                "phoneNumber": session_data.device_id
+            },
+            "applicationServer": {
+                "ipv4Address": session_data.service_ipv4
+            },
+            "duration": session_data.duration
+        }
+        
+        response = await client.post(
+            f"{settings.qod_api_url}/sessions",
+            json=payload,
+            headers=headers
+        )
+        
+        if response.status_code in [200, 201, 202]:
+            response_data = response.json()
+            session = QoDSession(
+                session_id=response_data.get("id", f"session-{int(datetime.now().timestamp())}"),
+                expires_at=datetime.now() + timedelta(seconds=session_data.duration),
+                **session_data.dict()
             )
-            
-            if response.status_code in [200, 201, 202]:
-                response_data = response.json()
-                return QoDSession(
-                    session_id=response_data.get("id", f"session-{int(datetime.now().timestamp())}"),
-                    **session_data.dict()
-                )
-            else:
-                raise Exception(f"HTTP {response.status_code}: {response.text}")
+            await self.sessions.add(session)
+            return session
+        else:
+            raise UpstreamHTTPError(response.status_code, response.text)
 
     async def get_session(self, session_id: str) -> Optional[QoDSession]:
-        return self._active_sessions.get(session_id)
+        return self.sessions.get(session_id)
 
-    async def list_sessions(self, device_id: Optional[str] = None) -> List[QoDSession]:
+    async def list_sessions(self, device_id: Optional[str] = None,
+                            emergency_id: Optional[str] = None) -> List[QoDSession]:
         if device_id:
-            return [s for s in self._active_sessions.values() if s.device_id == device_id]
-        return list(self._active_sessions.values())
+            device_id = normalize_phone_number(device_id)
+        return self.sessions.list(device_id=device_id, emergency_id=emergency_id)
 
     async def delete_session(self, session_id: str) -> bool:
-        if session_id in self._active_sessions:
-            del self._active_sessions[session_id]
-            return True
-        return False
+        return await self.sessions.remove(session_id)
 
 qod_service = QoDService() 
\ No newline at end of file
@@ -0,0 +1,214 @@
+"""
+Registry of the active QoD sessions.
+
+Sessions are indexed by id, by device and by emergency, so listing the
+sessions of a device or an emergency does not scan them all. Expiry times
+are kept in a min-heap: a background task sleeps until the earliest one and
+evicts the sessions expired at that time, without scanning the others.
+
+Every change is written through a RecordStore (see core.store), and
+the sessions still running are loaded again on startup.
+"""
+import asyncio
+import heapq
+import logging
+from collections import defaultdict
+from datetime import datetime
+from typing import Dict, List, Optional, Set, Tuple
+
+from ..core.config import settings
+from ..core.store import RecordStore, create_store
+from ..models.qod import QoDSession
+
+logger = logging.getLogger(__name__)
+
+
+class QoDSessionRegistry:
+    """Active QoD sessions with secondary indexes and expiry scheduling."""
+
+    def __init__(self, store: RecordStore):
+        self.store = store
+        self._sessions: Dict[str, QoDSession] = {}
+        self._by_device: Dict[str, Set[str]] = defaultdict(set)
+        self._by_emergency: Dict[str, Set[str]] = defaultdict(set)
+        # (expires_at, session_id), entries of removed or replaced sessions
+        # are skipped when popped
+        self._expiry: List[Tuple[datetime, str]] = []
+        self._wakeup: Optional[asyncio.Event] = None
+        self._task: Optional[asyncio.Task] = None
+
+        # Metrics
+        self.added = 0
+        self.removed = 0
+        self.expired = 0
+        self.store_errors = 0
+
+    def __len__(self) -> int:
+        return len(self._sessions)
+
+    async def start(self):
+        """Open the store, load the sessions still running and start the expiry task."""
+        await self.store.open()
+        for session in await self.store.load():
+            self._index(session)
+        expired = self._evict_expired(datetime.now())
+        await self._delete_stored(expired)
+        logger.info(
+            f"Loaded {len(self._sessions)} QoD sessions, {len(expired)} expired while stopped")
+
+        self._wakeup = asyncio.Event()
+        self._task = asyncio.ensure_future(self._expire_loop())
+
+    async def stop(self):
+        """Stop the expiry task and close the store."""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        await self.store.close()
+
+    async def add(self, session: QoDSession):
+        """
+        Register a session, replacing the one with the same id.
+
+        Args:
+            session: The session created upstream.
+        """
+        self._unindex(session.session_id)
+        self._index(session)
+        self.added += 1
+        try:
+            await self.store.save(session)
+        except Exception as e:
+            # The session runs upstream anyway, keep serving it from memory
+            self.store_errors += 1
+            logger.error(f"Error storing QoD session {session.session_id}: {str(e)}")
+
+        if (self._wakeup is not None and session.expires_at is not None
+                and self._expiry[0][1] == session.session_id):
+            # Expires before the time the expiry task is sleeping until
+            self._wakeup.set()
+
+    def get(self, session_id: str) -> Optional[QoDSession]:
+        """Get a session by id."""
+        return self._sessions.get(session_id)
+
+    def list(self, device_id: Optional[str] = None,
+             emergency_id: Optional[str] = None) -> List[QoDSession]:
+        """
+        List the sessions, of a device and/or an emergency if given.
+
+        Args:
+            device_id: The normalized phone number of the device.
+            emergency_id: The ID of the emergency.
+
+        Returns:
+            The matching sessions.
+        """
+        if device_id is None and emergency_id is None:
+            return list(self._sessions.values())
+        session_ids = None
+        if device_id is not None:
+            session_ids = self._by_device.get(device_id, set())
+        if emergency_id is not None:
+            by_emergency = self._by_emergency.get(emergency_id, set())
+            session_ids = by_emergency if session_ids is None else session_ids & by_emergency
+        return [self._sessions[session_id] for session_id in session_ids]
+
+    async def remove(self, session_id: str) -> bool:
+        """
+        Remove a session.
+
+        Args:
+            session_id: The ID of the session.
+
+        Returns:
+            True if the session was registered.
+        """
+        if self._unindex(session_id) is None:
+            return False
+        self.removed += 1
+        await self._delete_stored([session_id])
+        return True
+
+    def stats(self):
+        """Registry size and counters."""
+        return {
+            "sessions": len(self._sessions),
+            "devices": len(self._by_device),
+            "emergencies": len(self._by_emergency),
+            "scheduled_expiries": len(self._expiry),
+            "next_expiry": self._expiry[0][0].isoformat() if self._expiry else None,
+            "added": self.added,
+            "removed": self.removed,
+            "expired": self.expired,
+            "store_errors": self.store_errors,
+        }
+
+    def _index(self, session: QoDSession):
+        self._sessions[session.session_id] = session
+        self._by_device[session.device_id].add(session.session_id)
+        if session.emergency_id is not None:
+            self._by_emergency[session.emergency_id].add(session.session_id)
+        if session.expires_at is not None:
+            heapq.heappush(self._expiry, (session.expires_at, session.session_id))
+
+    def _unindex(self, session_id: str) -> Optional[QoDSession]:
+        session = self._sessions.pop(session_id, None)
+        if session is None:
+            return None
+        _discard(self._by_device, session.device_id, session_id)
+        if session.emergency_id is not None:
+            _discard(self._by_emergency, session.emergency_id, session_id)
+        # Its heap entry is left behind, skipped when popped
+        return session
+
+    def _evict_expired(self, now: datetime) -> List[str]:
+        """Unindex the sessions expired at now, returning their ids."""
+        expired = []
+        while self._expiry and self._expiry[0][0] <= now:
+            expires_at, session_id = heapq.heappop(self._expiry)
+            session = self._sessions.get(session_id)
+            if session is None or session.expires_at != expires_at:
+                continue
+            self._unindex(session_id)
+            expired.append(session_id)
+        self.expired += len(expired)
+        return expired
+
+    async def _delete_stored(self, session_ids: List[str]):
+        try:
+            await self.store.delete(session_ids)
+        except Exception as e:
+            self.store_errors += 1
+            logger.error(f"Error deleting stored QoD sessions: {str(e)}")
+
+    async def _expire_loop(self):
+        while True:
+            self._wakeup.clear()
+            timeout = None
+            if self._expiry:
+                timeout = max(0.0, (self._expiry[0][0] - datetime.now()).total_seconds())
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout)
+            except asyncio.TimeoutError:
+                pass
+            expired = self._evict_expired(datetime.now())
+            if expired:
+                logger.info(f"Expired {len(expired)} QoD sessions")
+                await self._delete_stored(expired)
+
+
+def _discard(index: Dict[str, Set[str]], key: str, session_id: str):
+    session_ids = index.get(key)
+    if session_ids is not None:
+        session_ids.discard(session_id)
+        if not session_ids:
+            del index[key]
+
+
+session_registry = QoDSessionRegistry(
+    create_store(settings.QOD_SESSION_STORE_URL, "qod_sessions", QoDSession, "session_id"))
@@ -0,0 +1,215 @@
+"""
+Device status subscriptions.
+
+The backend subscribes to the status of a device with a notification URL
+instead of polling it. The gateway holds one upstream Nokia NAC
+subscription per device, whatever the number of subscribers, with this
+service as notification URL (STATUS_CALLBACK_URL). The upstream callbacks
+are fanned out to the subscribers of the device through the notification
+dispatcher.
+
+Subscriptions are indexed by id and by device, and written through a
+RecordStore (see core.store) so they survive a restart.
+"""
+import asyncio
+import logging
+import uuid
+from typing import Any, Dict, List, Optional, Set
+
+from ..core.config import settings
+from ..core.identifiers import normalize_phone_number
+from ..core.nac_async import nac_async
+from ..core.store import RecordStore, create_store
+from ..models.device import DeviceStatusSubscription
+from .notifications import NotificationDispatcher, notification_dispatcher
+
+logger = logging.getLogger(__name__)
+
+
+class StatusSubscriptionRegistry:
+    """Status subscriptions by id and by device."""
+
+    def __init__(self, store: RecordStore, dispatcher: NotificationDispatcher):
+        self.store = store
+        self.dispatcher = dispatcher
+        self._subscriptions: Dict[str, DeviceStatusSubscription] = {}
+        self._by_device: Dict[str, Set[str]] = {}
+        # Device of every upstream subscription, to route the callbacks
+        self._upstream: Dict[str, str] = {}
+        self._device_locks: Dict[str, asyncio.Lock] = {}
+
+        # Metrics
+        self.callbacks = 0
+        self.unrouted = 0
+
+    async def start(self):
+        """Open the store and load the subscriptions."""
+        await self.store.open()
+        for subscription in await self.store.load():
+            self._index(subscription)
+        logger.info(f"Loaded {len(self._subscriptions)} status subscriptions")
+
+    async def stop(self):
+        """Close the store."""
+        await self.store.close()
+
+    async def subscribe(self, device_id: str, notification_url: str,
+                        notification_token: Optional[str] = None) -> DeviceStatusSubscription:
+        """
+        Subscribe to the status changes of a device.
+
+        Args:
+            device_id: The phone number of the device.
+            notification_url: The URL to send notifications to.
+            notification_token: Optional bearer token of the notifications.
+
+        Returns:
+            The subscription.
+        """
+        device_id = normalize_phone_number(device_id)
+        async with self._device_lock(device_id):
+            upstream_subscription_id = self._device_upstream(device_id)
+            if upstream_subscription_id is None:
+                upstream_subscription_id = await self._subscribe_upstream(device_id)
+
+            subscription = DeviceStatusSubscription(
+                subscription_id=str(uuid.uuid4()),
+                device_id=device_id,
+                notification_url=notification_url,
+                notification_token=notification_token,
+                upstream_subscription_id=upstream_subscription_id
+            )
+            await self.store.save(subscription)
+            self._index(subscription)
+        return subscription
+
+    async def unsubscribe(self, subscription_id: str) -> bool:
+        """
+        Cancel a subscription, and the upstream one with its last subscriber.
+
+        Args:
+            subscription_id: The ID of the subscription.
+
+        Returns:
+            True if the subscription existed.
+        """
+        subscription = self._subscriptions.get(subscription_id)
+        if subscription is None:
+            return False
+        async with self._device_lock(subscription.device_id):
+            if subscription_id not in self._subscriptions:
+                return False
+            await self.store.delete([subscription_id])
+            self._unindex(subscription)
+            upstream_subscription_id = subscription.upstream_subscription_id
+            if (upstream_subscription_id is not None
+                    and self._device_upstream(subscription.device_id) is None):
+                self._upstream.pop(upstream_subscription_id, None)
+                try:
+                    await nac_async.delete_connectivity_subscription(upstream_subscription_id)
+                except Exception as e:
+                    # Expires upstream anyway, its callbacks are not routed
+                    logger.error(
+                        f"Error deleting upstream subscription {upstream_subscription_id}: {str(e)}")
+        return True
+
+    def get(self, subscription_id: str) -> Optional[DeviceStatusSubscription]:
+        """Get a subscription by id."""
+        return self._subscriptions.get(subscription_id)
+
+    def list(self, device_id: Optional[str] = None) -> List[DeviceStatusSubscription]:
+        """List the subscriptions, of a device if given."""
+        if device_id is None:
+            return list(self._subscriptions.values())
+        device_id = normalize_phone_number(device_id)
+        return [self._subscriptions[subscription_id]
+                for subscription_id in self._by_device.get(device_id, ())]
+
+    def notify(self, event: Dict[str, Any]) -> int:
+        """
+        Fan an upstream status CloudEvent out to the subscribers of its device.
+
+        Args:
+            event: The CloudEvent received on the callback endpoint.
+
+        Returns:
+            The number of notifications queued.
+        """
+        self.callbacks += 1
+        data = event.get("data") or {}
+        device_id = self._upstream.get(str(data.get("subscriptionId")))
+        if device_id is None:
+            phone_number = (data.get("device") or {}).get("phoneNumber")
+            if phone_number:
+                device_id = normalize_phone_number(phone_number)
+        subscription_ids = self._by_device.get(device_id, ()) if device_id else ()
+        if not subscription_ids:
+            self.unrouted += 1
+            logger.warning(f"Status callback for unknown subscription or device: {event.get('id')}")
+            return 0
+
+        for subscription_id in subscription_ids:
+            subscription = self._subscriptions[subscription_id]
+            self.dispatcher.enqueue(
+                subscription.notification_url,
+                subscription.notification_token,
+                {**event, "data": {**data, "subscriptionId": subscription_id}}
+            )
+        return len(subscription_ids)
+
+    def stats(self) -> Dict[str, Any]:
+        """Registry size, callback counters and dispatcher counters."""
+        return {
+            "subscriptions": len(self._subscriptions),
+            "devices": len(self._by_device),
+            "callbacks": self.callbacks,
+            "unrouted": self.unrouted,
+            "dispatcher": self.dispatcher.stats(),
+        }
+
+    def _device_lock(self, device_id: str) -> asyncio.Lock:
+        return self._device_locks.setdefault(device_id, asyncio.Lock())
+
+    def _device_upstream(self, device_id: str) -> Optional[str]:
+        """Upstream subscription of a device, None if it has no subscriber."""
+        for subscription_id in self._by_device.get(device_id, ()):
+            return self._subscriptions[subscription_id].upstream_subscription_id
+        return None
+
+    async def _subscribe_upstream(self, device_id: str) -> str:
+        if not settings.STATUS_CALLBACK_URL:
+            raise ValueError("STATUS_CALLBACK_URL is not configured")
+        if not settings.STATUS_CALLBACK_TOKEN:
+            # The callbacks would be refused
+            raise ValueError("STATUS_CALLBACK_TOKEN is not configured")
+        device = await nac_async.get_device(phone_number=device_id)
+        subscription = await nac_async.subscribe_connectivity(
+            device,
+            event_type=settings.STATUS_EVENT_TYPE,
+            max_num_of_reports=settings.STATUS_MAX_NUM_OF_REPORTS,
+            notification_url=settings.STATUS_CALLBACK_URL,
+            notification_auth_token=settings.STATUS_CALLBACK_TOKEN
+        )
+        logger.info(f"Subscribed to the status of {device_id}: {subscription.id}")
+        return str(subscription.id)
+
+    def _index(self, subscription: DeviceStatusSubscription):
+        self._subscriptions[subscription.subscription_id] = subscription
+        self._by_device.setdefault(subscription.device_id, set()).add(subscription.subscription_id)
+        if subscription.upstream_subscription_id is not None:
+            self._upstream[subscription.upstream_subscription_id] = subscription.device_id
+
+    def _unindex(self, subscription: DeviceStatusSubscription):
+        self._subscriptions.pop(subscription.subscription_id, None)
+        subscription_ids = self._by_device.get(subscription.device_id)
+        if subscription_ids is not None:
+            subscription_ids.discard(subscription.subscription_id)
+            if not subscription_ids:
+                del self._by_device[subscription.device_id]
+
+
+subscription_registry = StatusSubscriptionRegistry(
+    create_store(settings.STATUS_SUBSCRIPTION_STORE_URL, "status_subscriptions",
+                 DeviceStatusSubscription, "subscription_id"),
+    notification_dispatcher
+)
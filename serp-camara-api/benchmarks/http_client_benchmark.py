@@ -0,0 +1,100 @@
+"""
+Benchmark of the direct QoD session calls: a new httpx.AsyncClient per
+request (before) against the shared pooled client (after).
+
+Runs a local mock upstream on 127.0.0.1, so no network access is needed.
+Plain HTTP is used: against the real API every new client also pays a TLS
+handshake, the gap is larger than measured here.
+
+Usage:
+    python -m benchmarks.http_client_benchmark --requests 2000 --concurrency 50
+"""
+import argparse
+import asyncio
+import socket
+import threading
+import time
+import uuid
+
+import httpx
+import uvicorn
+
+from app.core.http_client import create_http_client
+
+
+async def mock_upstream(scope, receive, send):
+    """Minimal ASGI upstream answering every request as a created session."""
+    if scope["type"] != "http":
+        return
+    while (await receive()).get("more_body"):
+        pass
+    body = ('{"id": "%s"}' % uuid.uuid4()).encode()
+    await send({
+        "type": "http.response.start",
+        "status": 201,
+        "headers": [(b"content-type", b"application/json")],
+    })
+    await send({"type": "http.response.body", "body": body})
+
+
+def start_upstream() -> str:
+    """Start the mock upstream in a thread and return its base URL."""
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        port = sock.getsockname()[1]
+    server = uvicorn.Server(uvicorn.Config(
+        mock_upstream, host="127.0.0.1", port=port,
+        log_level="error", lifespan="off"))
+    threading.Thread(target=server.run, daemon=True).start()
+    while not server.started:
+        time.sleep(0.05)
+    return f"http://127.0.0.1:{port}"
+
+
+PAYLOAD = {
+    "qosProfile": "QOS_E",
+    "device": {"phoneNumber": "+34696453332"},
+    "applicationServer": {"ipv4Address": "0.0.0.0"},
+    "duration": 3600,
+}
+
+
+async def run(url: str, requests: int, concurrency: int, shared: bool) -> float:
+    """Send the requests and return the requests per second."""
+    semaphore = asyncio.Semaphore(concurrency)
+    client = create_http_client() if shared else None
+
+    async def one():
+        async with semaphore:
+            if shared:
+                response = await client.post(f"{url}/sessions", json=PAYLOAD)
+            else:
+                # Previous behaviour: a client (and connection) per request
+                async with httpx.AsyncClient() as direct_client:
+                    response = await direct_client.post(
+                        f"{url}/sessions", json=PAYLOAD)
+            response.raise_for_status()
+
+    started = time.perf_counter()
+    await asyncio.gather(*(one() for _ in range(requests)))
+    elapsed = time.perf_counter() - started
+    if client is not None:
+        await client.aclose()
+    return requests / elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, default=50)
+    args = parser.parse_args()
+
+    url = start_upstream()
+    before = asyncio.run(run(url, args.requests, args.concurrency, False))
+    after = asyncio.run(run(url, args.requests, args.concurrency, True))
+    print(f"client per request: {before:8.0f} req/s")
+    print(f"shared client:      {after:8.0f} req/s  (x{after / before:.1f})")
+
+
+if __name__ == "__main__":
+    main()
@@ -4,6 +4,14 @@ import uvicorn
 import logging
 from app.api import qod, device_status, location
 from app.core.config import settings
+from app.core.nac_async import nac_async
+from app.core.nokia_client import nokia_client
+from app.core.resilience import upstream
+from app.services.location import location_cache
+from app.services.session_registry import session_registry
+from app.services.notifications import notification_dispatcher
+from app.services.subscriptions import subscription_registry
+from app.core.http_client import start_http_client, close_http_client
 
 # Configure logging
 logging.basicConfig(
@@ -40,17 +48,54 @@ app.include_router(location.router)
 @app.on_event("startup")
 async def startup_event():
     logger.info("Starting Nokia NAC microservice")
-    # Here you could add initialization code if needed
+    await start_http_client()
+    await session_registry.start()
+    await subscription_registry.start()
+    await notification_dispatcher.start()
 
 @app.on_event("shutdown")
 async def shutdown_event():
     logger.info("Shutting down Nokia NAC microservice")
-    # Here you could add cleanup code if needed
+    await notification_dispatcher.stop()
+    await subscription_registry.stop()
+    await session_registry.stop()
+    await close_http_client()
+    nac_async.shutdown()
 
 @app.get("/health")
 async def health_check():
     return {"status": "healthy"}
 
+@app.get("/metrics/sdk")
+async def sdk_metrics():
+    """Queue depth and timings of the Nokia NAC SDK executor"""
+    return nac_async.metrics()
+
+@app.get("/metrics/device-cache")
+async def device_cache_metrics():
+    """Hit/miss counters of the device handles cache"""
+    return nokia_client.device_cache.stats()
+
+@app.get("/metrics/location-cache")
+async def location_cache_metrics():
+    """Hit/miss counters of the device locations cache"""
+    return location_cache.stats()
+
+@app.get("/metrics/qod-sessions")
+async def qod_session_metrics():
+    """Size and counters of the QoD session registry"""
+    return session_registry.stats()
+
+@app.get("/metrics/status-subscriptions")
+async def status_subscription_metrics():
+    """Status subscriptions and notification delivery counters"""
+    return subscription_registry.stats()
+
+@app.get("/metrics/upstream")
+async def upstream_metrics():
+    """Circuit breakers, retry budget and hedging of the upstream calls"""
+    return upstream.stats()
+
 if __name__ == "__main__":
     uvicorn.run(
         "main:app",
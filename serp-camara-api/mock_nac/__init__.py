@@ -0,0 +1,4 @@
+"""
+Local mock of the Nokia Network as Code upstream, for offline runs and load
+tests of the gateway. See mock_nac.server and mock_nac.faults.
+"""
@@ -0,0 +1,53 @@
+"""
+Run the mock Nokia NAC upstream.
+
+Usage:
+    python -m mock_nac --port 6000 --latency uniform:20:200 \
+        --error-rate 0.02 --rate-limit 50 --seed 1
+
+Then start the gateway with NOKIA_NAC_MOCK_URL=http://localhost:6000. The
+faults can be changed while running with PUT /_mock/config.
+"""
+import argparse
+import os
+
+import uvicorn
+
+from .faults import FaultProfile, MockConfig
+from .server import create_app
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Mock Nokia NAC upstream")
+    parser.add_argument("--host", default=os.getenv("MOCK_NAC_HOST", "0.0.0.0"))
+    parser.add_argument("--port", type=int, default=int(os.getenv("MOCK_NAC_PORT", "6000")))
+    parser.add_argument("--latency", default=os.getenv("MOCK_NAC_LATENCY", "fixed:0"),
+                        help="latency distribution in ms, e.g. uniform:20:200")
+    parser.add_argument("--error-rate", type=float,
+                        default=float(os.getenv("MOCK_NAC_ERROR_RATE", "0")))
+    parser.add_argument("--error-codes", default=os.getenv("MOCK_NAC_ERROR_CODES", "500,503"),
+                        help="comma separated status codes of the injected errors")
+    parser.add_argument("--rate-limit", type=float,
+                        default=float(os.getenv("MOCK_NAC_RATE_LIMIT", "0")),
+                        help="requests per second per API, 0 for no limit")
+    parser.add_argument("--rate-burst", type=int,
+                        default=int(os.getenv("MOCK_NAC_RATE_BURST", "10")))
+    parser.add_argument("--config", help="JSON file of a MockConfig, overrides the options above")
+    parser.add_argument("--seed", type=int, default=None)
+    args = parser.parse_args()
+
+    if args.config:
+        config = MockConfig.parse_file(args.config)
+    else:
+        config = MockConfig(default=FaultProfile(
+            latency=args.latency,
+            error_rate=args.error_rate,
+            error_codes=[int(code) for code in args.error_codes.split(",")],
+            rate_limit=args.rate_limit,
+            rate_burst=args.rate_burst,
+        ))
+    uvicorn.run(create_app(config, args.seed), host=args.host, port=args.port)
+
+
+if __name__ == "__main__":
+    main()
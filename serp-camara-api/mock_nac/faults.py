@@ -0,0 +1,154 @@
+"""
+Latency, error and rate limit injection of the mock upstream.
+
+Every API of the mock (qod, location-retrieval, location-verification,
+device-status) has a fault profile, the default one unless overridden:
+
+    latency     distribution of the added latency, in milliseconds:
+                "fixed:50", "uniform:20:200", "normal:100:30",
+                "lognormal:4.5:0.5" (mu and sigma of the log) or
+                "exponential:80" (mean)
+    error_rate  fraction of the requests answered with an error
+    error_codes status codes of the injected errors, picked at random
+    rate_limit  requests per second accepted before answering 429, with
+                bursts of rate_burst requests (0 for no limit)
+"""
+import asyncio
+import random
+import time
+from typing import Callable, Dict, List, Optional
+
+from fastapi import HTTPException
+from pydantic import BaseModel, Field, validator
+
+APIS = ("qod", "location-retrieval", "location-verification", "device-status")
+
+
+def parse_latency(spec: str) -> Callable[[random.Random], float]:
+    """
+    Parse a latency distribution.
+
+    Args:
+        spec: The distribution, e.g. "uniform:20:200" (see module doc).
+
+    Returns:
+        A function drawing a latency in seconds.
+    """
+    name, *params = spec.split(":")
+    try:
+        values = [float(param) for param in params]
+    except ValueError:
+        raise ValueError(f"Invalid latency parameters: {spec}")
+    draws = {
+        "fixed": (1, lambda rng, ms: ms),
+        "uniform": (2, lambda rng, low, high: rng.uniform(low, high)),
+        "normal": (2, lambda rng, mean, stddev: rng.gauss(mean, stddev)),
+        "lognormal": (2, lambda rng, mu, sigma: rng.lognormvariate(mu, sigma)),
+        "exponential": (1, lambda rng, mean: rng.expovariate(1 / mean) if mean else 0.0),
+    }
+    if name not in draws or len(values) != draws[name][0]:
+        raise ValueError(f"Invalid latency distribution: {spec}")
+    draw = draws[name][1]
+    return lambda rng: max(0.0, draw(rng, *values)) / 1000
+
+
+class FaultProfile(BaseModel):
+    """Faults injected in the requests of an API."""
+    latency: str = "fixed:0"
+    error_rate: float = Field(0.0, ge=0.0, le=1.0)
+    error_codes: List[int] = [500, 503]
+    rate_limit: float = Field(0.0, ge=0.0)
+    rate_burst: int = Field(10, ge=1)
+
+    @validator("latency")
+    def latency_is_valid(cls, latency):
+        parse_latency(latency)
+        return latency
+
+
+class MockConfig(BaseModel):
+    """Default fault profile, and the overrides by API."""
+    default: FaultProfile = FaultProfile()
+    apis: Dict[str, FaultProfile] = {}
+
+    @validator("apis")
+    def apis_are_known(cls, apis):
+        unknown = set(apis) - set(APIS)
+        if unknown:
+            raise ValueError(f"Unknown APIs: {', '.join(sorted(unknown))}")
+        return apis
+
+
+class _TokenBucket:
+    def __init__(self, rate: float, burst: int):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = float(burst)
+        self.updated = time.monotonic()
+
+    def take(self) -> Optional[float]:
+        """Take a token, or return the seconds until the next one."""
+        now = time.monotonic()
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return None
+        return (1 - self.tokens) / self.rate
+
+
+class FaultInjector:
+    """Applies the fault profiles and counts what was injected."""
+
+    def __init__(self, config: Optional[MockConfig] = None, seed: Optional[int] = None):
+        self.rng = random.Random(seed)
+        self.configure(config or MockConfig())
+
+    def configure(self, config: MockConfig):
+        """Replace the fault profiles, resetting the rate limits."""
+        self.config = config
+        self._latency = {api: parse_latency(self.profile(api).latency) for api in APIS}
+        self._buckets = {
+            api: _TokenBucket(self.profile(api).rate_limit, self.profile(api).rate_burst)
+            for api in APIS
+            if self.profile(api).rate_limit
+        }
+        self.stats = {
+            api: {"requests": 0, "errors": 0, "rate_limited": 0, "latency_seconds": 0.0}
+            for api in APIS
+        }
+
+    def profile(self, api: str) -> FaultProfile:
+        """Fault profile of an API."""
+        return self.config.apis.get(api, self.config.default)
+
+    async def apply(self, api: str):
+        """
+        Inject the faults of an API in the current request.
+
+        Raises:
+            HTTPException: 429 over the rate limit, or the injected error.
+        """
+        stats = self.stats[api]
+        stats["requests"] += 1
+        bucket = self._buckets.get(api)
+        if bucket is not None:
+            retry_after = bucket.take()
+            if retry_after is not None:
+                stats["rate_limited"] += 1
+                raise HTTPException(
+                    status_code=429,
+                    detail="Too Many Requests",
+                    headers={"Retry-After": str(max(1, round(retry_after)))})
+
+        latency = self._latency[api](self.rng)
+        stats["latency_seconds"] += latency
+        if latency:
+            await asyncio.sleep(latency)
+
+        profile = self.profile(api)
+        if profile.error_rate and self.rng.random() < profile.error_rate:
+            stats["errors"] += 1
+            raise HTTPException(
+                status_code=self.rng.choice(profile.error_codes),
+                detail="Injected error")
@@ -0,0 +1,286 @@
+"""
+Mock of the Nokia Network as Code APIs used by the gateway.
+
+Each API is served under its own prefix, the base URLs the gateway uses when
+NOKIA_NAC_MOCK_URL points at this server:
+
+    /qod/v0                    QoD sessions
+    /location-retrieval/v0     device location
+    /location-verification/v0  device location verification
+    /device-status/v0          connectivity status and its event subscriptions
+
+Devices do not need to be registered: an unknown device is at a position
+derived from its identifier. Positions and statuses can be set with the
+admin endpoints, a status change is notified to the status subscriptions of
+the device. Faults are configured on startup or at runtime on /_mock/config.
+"""
+import asyncio
+import hashlib
+import logging
+import uuid
+from datetime import datetime, timezone
+from typing import Any, Dict, Optional, Tuple
+
+import httpx
+from fastapi import APIRouter, Body, Depends, FastAPI, HTTPException, Query, Response
+
+from .faults import FaultInjector, MockConfig
+
+logger = logging.getLogger(__name__)
+
+# Area around which the unknown devices are placed (Barcelona)
+CENTER = (41.3851, 2.1734)
+
+
+class MockState:
+    """Devices, sessions and subscriptions of the mock."""
+
+    def __init__(self):
+        self.locations: Dict[str, Tuple[float, float]] = {}
+        self.statuses: Dict[str, str] = {}
+        self.sessions: Dict[str, Dict[str, Any]] = {}
+        self.subscriptions: Dict[str, Dict[str, Any]] = {}
+
+    def location(self, device_id: str) -> Tuple[float, float]:
+        """Position of a device, derived from its id if never set."""
+        if device_id not in self.locations:
+            digest = hashlib.sha256(device_id.encode()).digest()
+            self.locations[device_id] = (
+                CENTER[0] + (digest[0] - 128) / 2560,
+                CENTER[1] + (digest[1] - 128) / 2560,
+            )
+        return self.locations[device_id]
+
+
+def _device_id(device: Optional[Dict[str, Any]]) -> str:
+    """Identifier of a CAMARA device object."""
+    device = device or {}
+    ipv4_address = device.get("ipv4Address") or {}
+    device_id = (device.get("phoneNumber")
+                 or device.get("networkAccessIdentifier")
+                 or ipv4_address.get("publicAddress"))
+    if not device_id:
+        raise HTTPException(status_code=400, detail="Missing device identifier")
+    return device_id
+
+
+def _now() -> datetime:
+    return datetime.now(timezone.utc)
+
+
+def create_app(config: Optional[MockConfig] = None, seed: Optional[int] = None) -> FastAPI:
+    """
+    Create the mock upstream.
+
+    Args:
+        config: The fault profiles, none by default.
+        seed: Seed of the latency and error draws, for reproducible runs.
+
+    Returns:
+        The ASGI app.
+    """
+    app = FastAPI(title="Mock Nokia Network as Code")
+    faults = FaultInjector(config, seed)
+    state = MockState()
+    app.state.faults = faults
+    app.state.mock = state
+
+    def inject(api: str):
+        async def dependency():
+            await faults.apply(api)
+        return Depends(dependency)
+
+    qod = APIRouter(prefix="/qod/v0", dependencies=[inject("qod")])
+    retrieval = APIRouter(prefix="/location-retrieval/v0", dependencies=[inject("location-retrieval")])
+    verification = APIRouter(prefix="/location-verification/v0", dependencies=[inject("location-verification")])
+    status = APIRouter(prefix="/device-status/v0", dependencies=[inject("device-status")])
+    admin = APIRouter(tags=["Mock admin"])
+
+    # QoD sessions
+
+    @qod.post("/sessions", status_code=201)
+    async def create_session(body: Dict[str, Any] = Body(...)):
+        # Unix times, as the SDK reads them
+        started_at = int(_now().timestamp())
+        duration = int(body.get("duration") or 3600)
+        session_id = str(uuid.uuid4())
+        session = {
+            "sessionId": session_id,
+            "id": session_id,
+            "device": body.get("device"),
+            "applicationServer": body.get("applicationServer"),
+            "qosProfile": body.get("qosProfile"),
+            "duration": duration,
+            "startedAt": started_at,
+            "expiresAt": started_at + duration,
+            "qosStatus": "AVAILABLE",
+        }
+        _device_id(session["device"])
+        state.sessions[session_id] = session
+        return session
+
+    @qod.get("/sessions/{session_id}")
+    async def get_session(session_id: str):
+        if session_id not in state.sessions:
+            raise HTTPException(status_code=404, detail="Session not found")
+        return state.sessions[session_id]
+
+    @qod.delete("/sessions/{session_id}", status_code=204)
+    async def delete_session(session_id: str):
+        if state.sessions.pop(session_id, None) is None:
+            raise HTTPException(status_code=404, detail="Session not found")
+        return Response(status_code=204)
+
+    @qod.get("/sessions")
+    async def list_sessions(phoneNumber: Optional[str] = Query(None),
+                            networkAccessIdentifier: Optional[str] = Query(None)):
+        # The SDK does not encode the query, the + of the number reads as a space
+        device_id = (phoneNumber or "").replace(" ", "+") or networkAccessIdentifier
+        return [session for session in state.sessions.values()
+                if device_id is None or _device_id(session["device"]) == device_id]
+
+    @qod.post("/retrieve-sessions")
+    async def retrieve_sessions(body: Dict[str, Any] = Body(...)):
+        device_id = _device_id(body.get("device"))
+        return [session for session in state.sessions.values()
+                if _device_id(session["device"]) == device_id]
+
+    # Location
+
+    @retrieval.post("/retrieve")
+    async def retrieve_location(body: Dict[str, Any] = Body(...)):
+        latitude, longitude = state.location(_device_id(body.get("device")))
+        return {
+            "lastLocationTime": _now().isoformat(),
+            "area": {
+                "areaType": "CIRCLE",
+                "center": {"latitude": latitude, "longitude": longitude},
+                "radius": 50,
+            },
+        }
+
+    @verification.post("/verify")
+    async def verify_location(body: Dict[str, Any] = Body(...)):
+        latitude, longitude = state.location(_device_id(body.get("device")))
+        area = body.get("area") or {}
+        center = area.get("center") or {}
+        radius = float(area.get("radius", 0))
+        # Equirectangular distance, enough at city scale
+        dlat = (latitude - float(center.get("latitude", 0))) * 111_320
+        dlon = (longitude - float(center.get("longitude", 0))) * 111_320 * 0.75
+        inside = (dlat ** 2 + dlon ** 2) ** 0.5 <= radius
+        return {
+            "verificationResult": "TRUE" if inside else "FALSE",
+            "lastLocationTime": _now().isoformat(),
+        }
+
+    # Device status
+
+    @status.post("/connectivity")
+    async def connectivity(body: Dict[str, Any] = Body(...)):
+        device_id = _device_id(body.get("device"))
+        return {"connectivityStatus": state.statuses.get(device_id, "CONNECTED_DATA")}
+
+    @status.post("/event-subscriptions", status_code=201)
+    async def create_subscription(body: Dict[str, Any] = Body(...)):
+        detail = body.get("subscriptionDetail") or {}
+        webhook = body.get("webhook") or {}
+        subscription = {
+            "eventSubscriptionId": str(uuid.uuid4()),
+            "subscriptionDetail": {
+                "device": detail.get("device"),
+                "eventType": detail.get("eventType"),
+            },
+            "maxNumberOfReports": body.get("maxNumberOfReports"),
+            "subscriptionExpireTime": body.get("subscriptionExpireTime"),
+            "webhook": {
+                "notificationUrl": webhook.get("notificationUrl"),
+                "notificationAuthToken": webhook.get("notificationAuthToken"),
+            },
+            "startsAt": _now().isoformat(),
+        }
+        _device_id(detail.get("device"))
+        state.subscriptions[subscription["eventSubscriptionId"]] = subscription
+        return subscription
+
+    @status.get("/event-subscriptions/{subscription_id}")
+    async def get_subscription(subscription_id: str):
+        if subscription_id not in state.subscriptions:
+            raise HTTPException(status_code=404, detail="Subscription not found")
+        return state.subscriptions[subscription_id]
+
+    @status.delete("/event-subscriptions/{subscription_id}", status_code=204)
+    async def delete_subscription(subscription_id: str):
+        if state.subscriptions.pop(subscription_id, None) is None:
+            raise HTTPException(status_code=404, detail="Subscription not found")
+        return Response(status_code=204)
+
+    # Admin, no faults
+
+    @admin.get("/_mock/config", response_model=MockConfig)
+    async def get_config():
+        return faults.config
+
+    @admin.put("/_mock/config", response_model=MockConfig)
+    async def set_config(config: MockConfig):
+        faults.configure(config)
+        return faults.config
+
+    @admin.get("/_mock/stats")
+    async def get_stats():
+        return {
+            "apis": faults.stats,
+            "devices": len(state.locations),
+            "sessions": len(state.sessions),
+            "subscriptions": len(state.subscriptions),
+        }
+
+    @admin.post("/_mock/reset", status_code=204)
+    async def reset():
+        faults.configure(faults.config)
+        state.__init__()
+        return Response(status_code=204)
+
+    @admin.post("/api/v1/mock/location")
+    async def set_location(device_id: str, latitude: float, longitude: float):
+        state.locations[device_id] = (latitude, longitude)
+        return {"device_id": device_id, "latitude": latitude, "longitude": longitude}
+
+    @admin.post("/api/v1/mock/status")
+    async def set_status(device_id: str, status: str = "NOT_CONNECTED"):
+        state.statuses[device_id] = status
+        subscriptions = [subscription for subscription in state.subscriptions.values()
+                         if _device_id(subscription["subscriptionDetail"]["device"]) == device_id
+                         and subscription["webhook"]["notificationUrl"]]
+        await asyncio.gather(*(_notify(subscription, status) for subscription in subscriptions))
+        return {"device_id": device_id, "status": status, "notified": len(subscriptions)}
+
+    for router in (qod, retrieval, verification, status, admin):
+        app.include_router(router)
+    return app
+
+
+async def _notify(subscription: Dict[str, Any], status: str):
+    """Send a connectivity status CloudEvent to a subscription."""
+    webhook = subscription["webhook"]
+    headers = {"Content-Type": "application/cloudevents+json"}
+    if webhook["notificationAuthToken"]:
+        headers["Authorization"] = f"Bearer {webhook['notificationAuthToken']}"
+    event = {
+        "id": str(uuid.uuid4()),
+        "source": "mock-nac",
+        "specversion": "1.0",
+        "type": subscription["subscriptionDetail"]["eventType"],
+        "time": _now().isoformat(),
+        "data": {
+            "subscriptionId": subscription["eventSubscriptionId"],
+            "device": subscription["subscriptionDetail"]["device"],
+            "connectivityStatus": status,
+        },
+    }
+    try:
+        async with httpx.AsyncClient(timeout=5) as client:
+            await client.post(webhook["notificationUrl"], json=event, headers=headers)
+    except httpx.HTTPError as e:
+        logger.error(f"Error notifying {webhook['notificationUrl']}: {str(e)}")
+
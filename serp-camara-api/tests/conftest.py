@@ -0,0 +1,41 @@
+"""
+Configuration file for testing the SERP Nokia NAC microservice.
+"""
+import socket
+import threading
+import time
+
+import pytest
+import uvicorn
+
+from app.core.config import settings
+from mock_nac.server import create_app
+
+
+@pytest.fixture
+def mock_nac(monkeypatch):
+    """
+    Run the mock Nokia NAC upstream on a free local port.
+
+    Yields:
+        The base URL of the mock, also set as NOKIA_NAC_MOCK_URL.
+    """
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        port = sock.getsockname()[1]
+    server = uvicorn.Server(uvicorn.Config(
+        create_app(), host="127.0.0.1", port=port, log_level="warning"))
+    thread = threading.Thread(target=server.run, daemon=True)
+    thread.start()
+    deadline = time.monotonic() + 10
+    while not server.started:
+        if time.monotonic() > deadline:
+            raise RuntimeError("Mock Nokia NAC did not start")
+        time.sleep(0.01)
+
+    url = f"http://127.0.0.1:{port}"
+    monkeypatch.setattr(settings, "NOKIA_NAC_MOCK_URL", url)
+    yield url
+
+    server.should_exit = True
+    thread.join(timeout=10)
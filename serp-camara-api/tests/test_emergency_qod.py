@@ -0,0 +1,99 @@
+"""
+Tests of the emergency-wide QoD session creation.
+"""
+import asyncio
+import time
+from types import SimpleNamespace
+
+import httpx
+import pytest
+from fastapi import FastAPI
+
+from app.api import qod
+from app.core.config import settings
+from app.core.nac_async import nac_async
+from app.core.store import MemoryStore
+from app.models.qod import QoDSession
+from app.services.qod_service import qod_service
+from app.services.session_registry import QoDSessionRegistry
+
+pytestmark = pytest.mark.asyncio
+
+FAST_DEVICE = "+34600000001"
+SLOW_DEVICE = "+34600000002"
+
+
+class FakeUpstream:
+    """QoD sessions of the Nokia NAC SDK, the slow device answering late."""
+
+    def __init__(self):
+        self.created = []
+        self.deleted = []
+
+    async def get_device(self, phone_number=None, ipv4_address=None):
+        return SimpleNamespace(phone_number=phone_number)
+
+    async def create_qod_session(self, device, **kwargs):
+        def create():
+            # Blocking SDK call, on the executor thread
+            if device.phone_number == SLOW_DEVICE:
+                time.sleep(0.3)
+            session_id = f"session-{device.phone_number}"
+            self.created.append(session_id)
+            return SimpleNamespace(id=session_id)
+        return await nac_async.run(create)
+
+    async def delete_qod_session(self, session_id):
+        self.deleted.append(session_id)
+
+
+@pytest.fixture
+def upstream(monkeypatch):
+    """Fake upstream, in-memory sessions and a short device timeout."""
+    fake = FakeUpstream()
+    for name in ("get_device", "create_qod_session", "delete_qod_session"):
+        monkeypatch.setattr(nac_async, name, getattr(fake, name))
+    monkeypatch.setattr(qod_service, "sessions", QoDSessionRegistry(
+        MemoryStore("qod_sessions", QoDSession, "session_id")))
+    monkeypatch.setattr(settings, "QOD_DEVICE_TIMEOUT", 0.1)
+    return fake
+
+
+def post_emergency(json):
+    """POST /qod/emergency on an app with the QoD router."""
+    app = FastAPI()
+    app.include_router(qod.router)
+
+    async def post():
+        async with httpx.AsyncClient(app=app, base_url="http://test") as client:
+            return await client.post("/qod/emergency", json=json)
+    return post()
+
+
+async def test_late_session_deleted(upstream):
+    """A session created after its device timed out is deleted upstream."""
+    response = await post_emergency(
+        {"emergency_id": "e1", "devices": [FAST_DEVICE, SLOW_DEVICE]})
+    assert response.status_code == 200
+    body = response.json()
+    assert [s["session_id"] for s in body["sessions"]] == [f"session-{FAST_DEVICE}"]
+    assert [f["device_id"] for f in body["failed_devices"]] == [SLOW_DEVICE]
+    assert "Timed out" in body["failed_devices"][0]["error"]
+    assert upstream.deleted == []
+
+    # The SDK call still completes on its thread
+    await asyncio.sleep(0.5)
+    assert upstream.created == [f"session-{FAST_DEVICE}", f"session-{SLOW_DEVICE}"]
+    assert upstream.deleted == [f"session-{SLOW_DEVICE}"]
+    assert [s.session_id for s in qod_service.sessions.list(emergency_id="e1")] == [
+        f"session-{FAST_DEVICE}"]
+    assert not qod_service._late_tasks
+
+
+async def test_all_devices_failed(upstream):
+    """No session created at all is an error listing the devices."""
+    response = await post_emergency({"devices": [SLOW_DEVICE]})
+    assert response.status_code == 500
+    assert response.json()["detail"]["failed_devices"][0]["device_id"] == SLOW_DEVICE
+    await asyncio.sleep(0.5)
+    assert upstream.deleted == [f"session-{SLOW_DEVICE}"]
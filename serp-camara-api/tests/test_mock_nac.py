@@ -0,0 +1,42 @@
+"""
+Smoke test of the Network as Code SDK against the mock upstream.
+"""
+import network_as_code as nac
+
+from app.core.config import settings
+
+PHONE_NUMBER = "+34600000001"
+
+
+def test_sdk_against_mock(mock_nac):
+    """Every SDK call the gateway makes is served by the mock."""
+    client = nac.NetworkAsCodeClient(token="test", **settings.nac_base_urls())
+    device = client.devices.get(phone_number=PHONE_NUMBER)
+
+    location = device.location(max_age=60)
+    assert device.verify_location(longitude=location.longitude,
+                                  latitude=location.latitude,
+                                  radius=100, max_age=60)
+    assert not device.verify_location(longitude=location.longitude + 1,
+                                      latitude=location.latitude,
+                                      radius=100, max_age=60)
+
+    session = device.create_qod_session(profile=settings.DEFAULT_QOD_PROFILE,
+                                        service_ipv4="5.6.7.8",
+                                        duration=600)
+    assert session.duration() == 600
+    assert [x.id for x in device.sessions()] == [session.id]
+    session.delete()
+    assert device.sessions() == []
+
+    subscription = client.connectivity.subscribe(
+        event_type=settings.STATUS_EVENT_TYPE,
+        max_num_of_reports=10,
+        notification_url="http://127.0.0.1:1/callback",
+        notification_auth_token="token",
+        device=device)
+    assert subscription.id
+    stored = client.connectivity.get_subscription(subscription.id)
+    assert stored.device.phone_number == PHONE_NUMBER
+    assert stored.notification_url == "http://127.0.0.1:1/callback"
+    stored.delete()
@@ -0,0 +1,137 @@
+"""
+Tests of the batched delivery of the status notifications.
+"""
+import asyncio
+from collections import defaultdict
+
+import httpx
+import pytest
+
+from app.services import notifications
+from app.services.notifications import BATCH_MEDIA_TYPE, NotificationDispatcher
+
+pytestmark = pytest.mark.asyncio
+
+
+class Subscribers:
+    """HTTP endpoints of the subscribers, answering with the given statuses."""
+
+    def __init__(self, statuses=(), delay=0.0):
+        self.statuses = list(statuses)
+        self.delay = delay
+        self.requests = []
+        self.in_flight = defaultdict(int)
+        self.max_in_flight = defaultdict(int)
+
+    async def handler(self, request: httpx.Request) -> httpx.Response:
+        url = str(request.url)
+        self.in_flight[url] += 1
+        self.max_in_flight[url] = max(self.max_in_flight[url], self.in_flight[url])
+        try:
+            await asyncio.sleep(self.delay)
+            self.requests.append(request)
+            status = self.statuses.pop(0) if self.statuses else 204
+            return httpx.Response(status)
+        finally:
+            self.in_flight[url] -= 1
+
+    def batches(self, url):
+        """Notification ids of the batches posted to url."""
+        return [[x["id"] for x in httpx.Response(200, content=r.content).json()]
+                for r in self.requests if str(r.url) == url]
+
+
+@pytest.fixture
+def subscribers(monkeypatch):
+    """Subscribers reached by the dispatcher through a mock transport."""
+    endpoints = Subscribers()
+    client = httpx.AsyncClient(transport=httpx.MockTransport(endpoints.handler))
+    monkeypatch.setattr(notifications, "get_http_client", lambda: client)
+    return endpoints
+
+
+def event(i):
+    return {"id": str(i), "data": {"connectivityStatus": "CONNECTED_DATA"}}
+
+
+async def run(dispatcher: NotificationDispatcher):
+    """Deliver what is queued."""
+    await dispatcher.start()
+    await dispatcher.stop()
+
+
+async def test_batches_in_order(subscribers):
+    """Notifications of a destination are posted in order, in batches."""
+    dispatcher = NotificationDispatcher(batch_size=3, batch_seconds=0.01)
+    for i in range(7):
+        dispatcher.enqueue("http://first/notify", "token", event(i))
+    dispatcher.enqueue("http://second/notify", None, event(100))
+    await run(dispatcher)
+
+    assert subscribers.batches("http://first/notify") == [
+        ["0", "1", "2"], ["3", "4", "5"], ["6"]]
+    assert subscribers.batches("http://second/notify") == [["100"]]
+    headers = {str(r.url): r.headers for r in subscribers.requests}
+    assert headers["http://first/notify"]["Content-Type"] == BATCH_MEDIA_TYPE
+    assert headers["http://first/notify"]["Authorization"] == "Bearer token"
+    assert "Authorization" not in headers["http://second/notify"]
+    stats = dispatcher.stats()
+    assert (stats["delivered"], stats["batches"], stats["pending"]) == (8, 4, 0)
+
+
+async def test_retry_and_give_up(subscribers):
+    """5xx and 429 are retried with backoff, other 4xx are not."""
+    subscribers.statuses = [503, 429, 204, 400]
+    dispatcher = NotificationDispatcher(batch_size=1, batch_seconds=0.01,
+                                        max_retries=3, backoff=0.001)
+    dispatcher.enqueue("http://first/notify", None, event(1))
+    dispatcher.enqueue("http://first/notify", None, event(2))
+    await run(dispatcher)
+
+    assert subscribers.batches("http://first/notify") == [["1"], ["1"], ["1"], ["2"]]
+    stats = dispatcher.stats()
+    assert (stats["delivered"], stats["retries"], stats["failed"]) == (1, 2, 1)
+
+    subscribers.statuses = [500] * 3
+    dispatcher = NotificationDispatcher(batch_size=1, batch_seconds=0.01,
+                                        max_retries=2, backoff=0.001)
+    dispatcher.enqueue("http://first/notify", None, event(3))
+    await run(dispatcher)
+    stats = dispatcher.stats()
+    assert (stats["delivered"], stats["retries"], stats["failed"]) == (0, 2, 1)
+
+
+async def test_drop_oldest(subscribers):
+    """Past max_pending the oldest notifications are dropped."""
+    dispatcher = NotificationDispatcher(batch_size=10, batch_seconds=0.01, max_pending=3)
+    for i in range(5):
+        dispatcher.enqueue("http://first/notify", None, event(i))
+    assert dispatcher.pending == 3
+    assert dispatcher.stats()["dropped"] == 2
+    # Taken from the longest queue when the destination has none
+    dispatcher.enqueue("http://second/notify", None, event(100))
+    assert dispatcher.pending == 3
+    await run(dispatcher)
+
+    assert subscribers.batches("http://first/notify") == [["3", "4"]]
+    assert subscribers.batches("http://second/notify") == [["100"]]
+
+
+async def test_one_delivery_per_destination(subscribers):
+    """A destination has one delivery in flight, destinations run together."""
+    subscribers.delay = 0.02
+    dispatcher = NotificationDispatcher(batch_size=1, batch_seconds=0.005)
+    for i in range(4):
+        dispatcher.enqueue("http://first/notify", None, event(i))
+        dispatcher.enqueue("http://second/notify", None, event(100 + i))
+    await dispatcher.start()
+    while dispatcher.pending or dispatcher.stats()["in_flight"]:
+        await asyncio.sleep(0.01)
+    await dispatcher.stop()
+
+    assert subscribers.max_in_flight["http://first/notify"] == 1
+    assert subscribers.max_in_flight["http://second/notify"] == 1
+    assert subscribers.batches("http://first/notify") == [["0"], ["1"], ["2"], ["3"]]
+    # Both destinations were delivered at the same time
+    urls = [str(r.url) for r in subscribers.requests]
+    assert set(urls[:2]) == {"http://first/notify", "http://second/notify"}
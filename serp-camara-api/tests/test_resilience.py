@@ -0,0 +1,188 @@
+"""
+Tests of the circuit breakers, the retry budget and the hedging of the
+upstream calls.
+"""
+import asyncio
+
+import httpx
+import pytest
+from network_as_code.errors import APIError, AuthenticationException, NotFound, ServiceError
+
+from app.core import resilience
+from app.core.resilience import (
+    CircuitBreaker,
+    CircuitOpenError,
+    RetryBudget,
+    RetryBudgetExhaustedError,
+    SDKOverloadedError,
+    UpstreamGuard,
+    UpstreamHTTPError,
+    is_client_error,
+)
+
+pytestmark = pytest.mark.asyncio
+
+
+def sdk_error(error_class, status_code):
+    """SDK error raised from an HTTP answer, as the SDK error handler does."""
+    request = httpx.Request("GET", "https://nac.example/sessions")
+    response = httpx.Response(status_code, request=request)
+    try:
+        try:
+            response.raise_for_status()
+        except httpx.HTTPStatusError as e:
+            raise error_class() from e
+    except error_class as e:
+        return e
+
+
+class Upstream:
+    """Upstream call failing with the given errors, then answering."""
+
+    def __init__(self, *errors, delay=0.0):
+        self.errors = list(errors)
+        self.delay = delay
+        self.calls = 0
+
+    async def __call__(self):
+        self.calls += 1
+        await asyncio.sleep(self.delay)
+        if self.errors:
+            raise self.errors.pop(0)
+        return "ok"
+
+
+@pytest.fixture(autouse=True)
+def no_backoff(monkeypatch):
+    monkeypatch.setattr(resilience, "backoff_delay", lambda attempt: 0)
+
+
+def guard(**kwargs) -> UpstreamGuard:
+    """Guard with a generous retry budget and no hedging."""
+    return UpstreamGuard(budget=RetryBudget(ratio=1.0, min_retries=10, window=60),
+                         hedge_delay=kwargs.pop("hedge_delay", 0))
+
+
+async def test_client_errors():
+    """SDK errors are classified by type or by the HTTP error they wrap."""
+    assert is_client_error(sdk_error(NotFound, 404))
+    assert is_client_error(sdk_error(AuthenticationException, 403))
+    assert is_client_error(NotFound())
+    assert is_client_error(sdk_error(APIError, 400))
+    assert not is_client_error(sdk_error(APIError, 429))
+    assert not is_client_error(sdk_error(ServiceError, 503))
+    assert is_client_error(UpstreamHTTPError(404, "Not found"))
+    assert not is_client_error(UpstreamHTTPError(502, "Bad gateway"))
+    assert not is_client_error(SDKOverloadedError("full"))
+    assert not is_client_error(TimeoutError())
+
+
+async def test_breaker_states(monkeypatch):
+    """Closed, open after the failures, half open after the reset, closed."""
+    now = [1000.0]
+    monkeypatch.setattr(resilience.time, "monotonic", lambda: now[0])
+    breaker = CircuitBreaker("qod", failure_threshold=2, reset_timeout=10, half_open_calls=1)
+
+    for _ in range(2):
+        breaker.acquire()
+        breaker.release(False)
+    assert breaker.state == CircuitBreaker.OPEN
+    with pytest.raises(CircuitOpenError):
+        breaker.acquire()
+
+    now[0] += 10
+    breaker.acquire()
+    assert breaker.state == CircuitBreaker.HALF_OPEN
+    # One probe at a time
+    with pytest.raises(CircuitOpenError):
+        breaker.acquire()
+    breaker.release(False)
+    assert breaker.state == CircuitBreaker.OPEN
+
+    now[0] += 10
+    breaker.acquire()
+    breaker.release(True)
+    assert breaker.state == CircuitBreaker.CLOSED
+    assert breaker.stats()["opened"] == 2
+
+    # Client errors and cancellations say nothing about the endpoint
+    for _ in range(5):
+        breaker.acquire()
+        breaker.release(None)
+    assert breaker.state == CircuitBreaker.CLOSED
+
+
+async def test_retries_server_errors_only():
+    """5xx and 429 are retried, client errors and overload are not."""
+    upstream = guard()
+    call = Upstream(sdk_error(ServiceError, 503), sdk_error(APIError, 429))
+    assert await upstream.call("qod", call, retries=2) == "ok"
+    assert call.calls == 3
+    assert upstream.breaker("qod").consecutive_failures == 0
+
+    for error in (sdk_error(NotFound, 404), sdk_error(AuthenticationException, 403),
+                  SDKOverloadedError("full")):
+        call = Upstream(error, error, error, error, error, error)
+        for _ in range(5):
+            with pytest.raises(type(error)):
+                await upstream.call("location", call, retries=2)
+        assert call.calls == 5
+        breaker = upstream.breaker("location")
+        assert breaker.state == CircuitBreaker.CLOSED
+        assert breaker.failures == 0
+
+
+async def test_breaker_opens_on_server_errors():
+    """Consecutive server errors open the endpoint, calls then fail at once."""
+    upstream = guard()
+    breaker = upstream.breaker("qod")
+    breaker.failure_threshold = 3
+    call = Upstream(*[sdk_error(ServiceError, 500)] * 10)
+    for _ in range(3):
+        with pytest.raises(ServiceError):
+            await upstream.call("qod", call)
+    assert breaker.state == CircuitBreaker.OPEN
+    with pytest.raises(CircuitOpenError):
+        await upstream.call("qod", call)
+    assert call.calls == 3
+
+
+async def test_retry_budget():
+    """Retries and fallbacks are bounded by the ratio of the recent requests."""
+    budget = RetryBudget(ratio=0.5, min_retries=1, window=60)
+    for _ in range(4):
+        budget.record_request()
+    assert [budget.try_retry() for _ in range(4)] == [True, True, True, False]
+    assert budget.stats()["exhausted"] == 1
+
+    upstream = UpstreamGuard(budget=RetryBudget(ratio=0.0, min_retries=1, window=60),
+                             hedge_delay=0)
+    call = Upstream(*[sdk_error(ServiceError, 503)] * 10)
+    with pytest.raises(ServiceError):
+        await upstream.call("qod", call, retries=5)
+    # One retry allowed by the budget
+    assert call.calls == 2
+    with pytest.raises(RetryBudgetExhaustedError):
+        await upstream.call("qod", call, fallback=True)
+    assert call.calls == 2
+
+
+async def test_hedging():
+    """A slow first attempt is hedged, the first answer wins."""
+    upstream = guard(hedge_delay=0.01)
+    attempts = []
+
+    async def call():
+        attempts.append(len(attempts))
+        await asyncio.sleep(1 if len(attempts) == 1 else 0)
+        return len(attempts)
+
+    assert await upstream.call("location", call, hedge=True) == 2
+    assert upstream.stats()["hedges"] == 1
+    assert upstream.stats()["hedge_wins"] == 1
+
+    # A fast answer is not hedged
+    fast = Upstream()
+    assert await upstream.call("location", fast, hedge=True) == "ok"
+    assert fast.calls == 1
+    assert upstream.stats()["hedges"] == 1
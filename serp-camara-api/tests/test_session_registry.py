@@ -0,0 +1,111 @@
+"""
+Tests of the registry of the active QoD sessions, with and without
+persistence.
+"""
+import asyncio
+from datetime import datetime, timedelta
+
+import pytest
+
+from app.core.store import MemoryStore, SQLiteStore
+from app.models.qod import QoDSession
+from app.services.session_registry import QoDSessionRegistry
+
+pytestmark = pytest.mark.asyncio
+
+
+@pytest.fixture(params=["memory", "sqlite"])
+def store_factory(request, tmp_path):
+    """Creates stores of the same backend, sharing the SQLite file."""
+    def create():
+        if request.param == "memory":
+            return MemoryStore("qod_sessions", QoDSession, "session_id")
+        return SQLiteStore(str(tmp_path / "data" / "qod_sessions.db"),
+                           "qod_sessions", QoDSession, "session_id")
+    return create
+
+
+def qod_session(session_id, device_id="+34600000001", emergency_id=None, seconds=3600):
+    return QoDSession(
+        session_id=session_id,
+        device_id=device_id,
+        emergency_id=emergency_id,
+        expires_at=None if seconds is None else datetime.now() + timedelta(seconds=seconds),
+    )
+
+
+async def test_indexes(store_factory):
+    """The device and emergency indexes follow the replaced and removed sessions."""
+    registry = QoDSessionRegistry(store_factory())
+    await registry.start()
+    try:
+        await registry.add(qod_session("s1", "+34600000001", "e1"))
+        await registry.add(qod_session("s2", "+34600000001", "e2"))
+        await registry.add(qod_session("s3", "+34600000002", "e1"))
+        assert {s.session_id for s in registry.list(device_id="+34600000001")} == {"s1", "s2"}
+        assert {s.session_id for s in registry.list(emergency_id="e1")} == {"s1", "s3"}
+        assert [s.session_id for s in registry.list("+34600000001", "e1")] == ["s1"]
+
+        # Replaced: moves to the other device and emergency
+        await registry.add(qod_session("s1", "+34600000002", "e2"))
+        assert len(registry) == 3
+        assert [s.session_id for s in registry.list(device_id="+34600000001")] == ["s2"]
+        assert {s.session_id for s in registry.list(emergency_id="e2")} == {"s1", "s2"}
+        assert registry.list(emergency_id="e1")[0].session_id == "s3"
+
+        assert await registry.remove("s2")
+        assert not await registry.remove("s2")
+        assert registry.list(device_id="+34600000001") == []
+        stats = registry.stats()
+        assert stats["devices"] == 1
+        assert stats["emergencies"] == 2
+    finally:
+        await registry.stop()
+
+
+async def test_expiry(store_factory):
+    """Sessions are evicted when they expire, in order of expiry."""
+    registry = QoDSessionRegistry(store_factory())
+    await registry.start()
+    try:
+        await registry.add(qod_session("late", seconds=3600))
+        await registry.add(qod_session("unlimited", seconds=None))
+        await registry.add(qod_session("soon", seconds=0.2))
+        # Extended: its first expiry is skipped
+        await registry.add(qod_session("extended", seconds=0.1))
+        await registry.add(qod_session("extended", seconds=3600))
+        await registry.add(qod_session("removed", seconds=0.1))
+        await registry.remove("removed")
+
+        await asyncio.sleep(0.5)
+        assert registry.get("soon") is None
+        assert {s.session_id for s in registry.list()} == {"late", "unlimited", "extended"}
+        assert registry.expired == 1
+        assert registry.stats()["scheduled_expiries"] == 2
+    finally:
+        await registry.stop()
+
+
+async def test_reload(store_factory, tmp_path):
+    """Sessions are loaded on start, those expired while stopped are purged."""
+    registry = QoDSessionRegistry(store_factory())
+    await registry.start()
+    await registry.add(qod_session("s1", emergency_id="e1"))
+    await registry.add(qod_session("s2", seconds=1))
+    await registry.add(qod_session("s3"))
+    await registry.remove("s3")
+    await registry.stop()
+    await asyncio.sleep(1)
+
+    store = store_factory()
+    registry = QoDSessionRegistry(store)
+    await registry.start()
+    try:
+        if isinstance(store, MemoryStore):
+            assert len(registry) == 0
+            return
+        assert [s.session_id for s in registry.list(emergency_id="e1")] == ["s1"]
+        assert registry.expired == 1
+        assert [s.session_id for s in await store.load()] == ["s1"]
+    finally:
+        await registry.stop()
@@ -0,0 +1,164 @@
+"""
+Tests of the device status subscriptions registry and callback endpoint.
+"""
+import itertools
+from types import SimpleNamespace
+
+import httpx
+import pytest
+from fastapi import FastAPI
+
+from app.api import device_status
+from app.core.config import settings
+from app.core.nac_async import nac_async
+from app.core.store import MemoryStore, SQLiteStore
+from app.models.device import DeviceStatusSubscription
+from app.services.notifications import NotificationDispatcher
+from app.services.subscriptions import StatusSubscriptionRegistry
+
+pytestmark = pytest.mark.asyncio
+
+PHONE_NUMBER = "+34600000001"
+
+
+class FakeUpstream:
+    """Status subscriptions of the Nokia NAC SDK, recorded."""
+
+    def __init__(self):
+        self.ids = (f"upstream-{i}" for i in itertools.count(1))
+        self.subscribed = []
+        self.deleted = []
+
+    async def get_device(self, phone_number=None, ipv4_address=None):
+        return SimpleNamespace(phone_number=phone_number)
+
+    async def subscribe_connectivity(self, device, **kwargs):
+        self.subscribed.append((device.phone_number, kwargs))
+        return SimpleNamespace(id=next(self.ids))
+
+    async def delete_connectivity_subscription(self, subscription_id):
+        self.deleted.append(subscription_id)
+
+
+@pytest.fixture
+def upstream(monkeypatch):
+    """Fake upstream and callback settings."""
+    fake = FakeUpstream()
+    for name in ("get_device", "subscribe_connectivity", "delete_connectivity_subscription"):
+        monkeypatch.setattr(nac_async, name, getattr(fake, name))
+    monkeypatch.setattr(settings, "STATUS_CALLBACK_URL", "http://gateway/device/status/callback")
+    monkeypatch.setattr(settings, "STATUS_CALLBACK_TOKEN", "callback-token")
+    return fake
+
+
+def status_event(upstream_subscription_id, status="NOT_CONNECTED"):
+    """Upstream connectivity status CloudEvent."""
+    return {
+        "id": "event-1",
+        "type": settings.STATUS_EVENT_TYPE,
+        "data": {
+            "subscriptionId": upstream_subscription_id,
+            "device": {"phoneNumber": PHONE_NUMBER},
+            "connectivityStatus": status,
+        },
+    }
+
+
+async def test_one_upstream_subscription_per_device(upstream):
+    """Subscribers of a device share the upstream subscription."""
+    dispatcher = NotificationDispatcher()
+    registry = StatusSubscriptionRegistry(
+        MemoryStore("status_subscriptions", DeviceStatusSubscription, "subscription_id"),
+        dispatcher)
+    await registry.start()
+
+    first = await registry.subscribe(PHONE_NUMBER, "http://first/notify", "first-token")
+    second = await registry.subscribe(PHONE_NUMBER, "http://second/notify")
+    assert first.upstream_subscription_id == second.upstream_subscription_id == "upstream-1"
+    assert len(upstream.subscribed) == 1
+    _, kwargs = upstream.subscribed[0]
+    assert kwargs["max_num_of_reports"] == settings.STATUS_MAX_NUM_OF_REPORTS
+    assert kwargs["notification_auth_token"] == "callback-token"
+    assert {x.subscription_id for x in registry.list(PHONE_NUMBER)} == {
+        first.subscription_id, second.subscription_id}
+
+    # Fanned out to both subscribers, with their own subscription id
+    assert registry.notify(status_event("upstream-1")) == 2
+    assert dispatcher.pending == 2
+    queued = dispatcher._queues[("http://first/notify", "first-token")]
+    assert queued[0]["data"]["subscriptionId"] == first.subscription_id
+    # Unknown upstream subscription, routed by the phone number
+    assert registry.notify(status_event("unknown")) == 2
+    assert registry.notify({"id": "event-2", "data": {}}) == 0
+    assert registry.stats()["unrouted"] == 1
+
+    assert await registry.unsubscribe(first.subscription_id)
+    assert upstream.deleted == []
+    assert await registry.unsubscribe(second.subscription_id)
+    assert upstream.deleted == ["upstream-1"]
+    assert not await registry.unsubscribe(second.subscription_id)
+    assert registry.list() == []
+    assert registry.notify(status_event("upstream-1")) == 0
+    await registry.stop()
+
+
+async def test_subscriptions_survive_restart(upstream, tmp_path):
+    """A registry reloads the stored subscriptions and routes their callbacks."""
+    def store():
+        return SQLiteStore(str(tmp_path / "status.db"), "status_subscriptions",
+                           DeviceStatusSubscription, "subscription_id")
+
+    registry = StatusSubscriptionRegistry(store(), NotificationDispatcher())
+    await registry.start()
+    first = await registry.subscribe(PHONE_NUMBER, "http://first/notify")
+    second = await registry.subscribe(PHONE_NUMBER, "http://second/notify")
+    await registry.unsubscribe(second.subscription_id)
+    await registry.stop()
+
+    restarted = StatusSubscriptionRegistry(store(), NotificationDispatcher())
+    await restarted.start()
+    assert [x.subscription_id for x in restarted.list()] == [first.subscription_id]
+    assert restarted.notify(status_event("upstream-1")) == 1
+    # Still subscribed upstream, no new subscription
+    await restarted.subscribe(PHONE_NUMBER, "http://third/notify")
+    assert len(upstream.subscribed) == 1
+    await restarted.stop()
+
+
+async def test_subscribe_needs_callback_token(upstream, monkeypatch):
+    """No upstream subscription whose callbacks would be refused."""
+    monkeypatch.setattr(settings, "STATUS_CALLBACK_TOKEN", "")
+    registry = StatusSubscriptionRegistry(
+        MemoryStore("status_subscriptions", DeviceStatusSubscription, "subscription_id"),
+        NotificationDispatcher())
+    with pytest.raises(ValueError):
+        await registry.subscribe(PHONE_NUMBER, "http://first/notify")
+    assert upstream.subscribed == []
+
+
+async def test_status_callback_token(upstream, monkeypatch):
+    """Callbacks are refused without the configured bearer token."""
+    registry = StatusSubscriptionRegistry(
+        MemoryStore("status_subscriptions", DeviceStatusSubscription, "subscription_id"),
+        NotificationDispatcher())
+    monkeypatch.setattr(device_status.device, "subscription_registry", registry)
+    await registry.subscribe(PHONE_NUMBER, "http://first/notify")
+    app = FastAPI()
+    app.include_router(device_status.router)
+
+    async with httpx.AsyncClient(app=app, base_url="http://test") as client:
+        async def callback(token):
+            headers = {"Authorization": f"Bearer {token}"} if token else {}
+            return await client.post("/device/status/callback",
+                                     json=status_event("upstream-1"), headers=headers)
+
+        assert (await callback(None)).status_code == 401
+        assert (await callback("forged")).status_code == 401
+        assert registry.callbacks == 0
+        assert (await callback("callback-token")).status_code == 204
+        assert registry.callbacks == 1
+
+        monkeypatch.setattr(settings, "STATUS_CALLBACK_TOKEN", "")
+        assert (await callback("")).status_code == 503
+        assert (await callback(None)).status_code == 503
+    assert registry.callbacks == 1
@@ -0,0 +1,26 @@
+"""Tombstone deletion time from the database clock
+
+Revision ID: 2f6a9c4e7d10
+Revises: e7b2c5d1a8f3
+Create Date: 2026-10-18 18:00:00.000000
+
+"""
+
+from typing import Sequence, Union
+
+import sqlalchemy as sa
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "2f6a9c4e7d10"
+down_revision: Union[str, None] = "e7b2c5d1a8f3"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.alter_column("tombstone", "time_deleted", server_default=sa.func.now())
+
+
+def downgrade() -> None:
+    op.alter_column("tombstone", "time_deleted", server_default=None)
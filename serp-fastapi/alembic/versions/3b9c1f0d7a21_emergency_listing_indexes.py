@@ -0,0 +1,45 @@
+"""Emergency listing indexes
+
+Revision ID: 3b9c1f0d7a21
+Revises: 587eda2c14ee
+Create Date: 2026-10-18 09:00:00.000000
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "3b9c1f0d7a21"
+down_revision: Union[str, None] = "587eda2c14ee"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_index(
+        "ix_emergency_time_created_id",
+        "emergency",
+        ["time_created", "id"],
+        if_not_exists=True,
+    )
+    op.create_index(
+        "ix_emergency_status_time_created_id",
+        "emergency",
+        ["status", "time_created", "id"],
+        if_not_exists=True,
+    )
+
+
+def downgrade() -> None:
+    op.drop_index(
+        "ix_emergency_status_time_created_id",
+        table_name="emergency",
+        if_exists=True,
+    )
+    op.drop_index(
+        "ix_emergency_time_created_id",
+        table_name="emergency",
+        if_exists=True,
+    )
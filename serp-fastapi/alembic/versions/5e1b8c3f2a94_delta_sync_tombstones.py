@@ -0,0 +1,56 @@
+"""Delta sync tombstones and time_updated indexes
+
+Revision ID: 5e1b8c3f2a94
+Revises: c4f7a2e9d8b6
+Create Date: 2026-10-18 12:00:00.000000
+
+"""
+
+from typing import Sequence, Union
+
+import sqlalchemy as sa
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "5e1b8c3f2a94"
+down_revision: Union[str, None] = "c4f7a2e9d8b6"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+INDEXES = [
+    ("ix_emergency_time_updated", "emergency", ["time_updated"]),
+    ("ix_resource_time_created", "resource", ["time_created"]),
+    ("ix_resource_time_updated", "resource", ["time_updated"]),
+    ("ix_location_time_created", "location", ["time_created"]),
+    ("ix_location_time_updated", "location", ["time_updated"]),
+]
+
+
+def upgrade() -> None:
+    op.create_table(
+        "tombstone",
+        sa.Column("id", sa.Uuid(), nullable=False),
+        sa.Column("entity", sa.String(length=32), nullable=False),
+        sa.Column("entity_id", sa.Uuid(), nullable=False),
+        sa.Column("time_deleted", sa.DateTime(timezone=True), nullable=False),
+        sa.PrimaryKeyConstraint("id"),
+        if_not_exists=True,
+    )
+    op.create_index(
+        "ix_tombstone_time_deleted",
+        "tombstone",
+        ["time_deleted"],
+        if_not_exists=True,
+    )
+    for name, table, columns in INDEXES:
+        op.create_index(name, table, columns, if_not_exists=True)
+
+
+def downgrade() -> None:
+    for name, table, _ in INDEXES:
+        op.drop_index(name, table_name=table, if_exists=True)
+    op.drop_index(
+        "ix_tombstone_time_deleted", table_name="tombstone", if_exists=True
+    )
+    op.drop_table("tombstone", if_exists=True)
@@ -0,0 +1,50 @@
+"""Spatial and resource availability indexes
+
+Revision ID: 8d2e4a6c1b53
+Revises: 3b9c1f0d7a21
+Create Date: 2026-10-18 10:00:00.000000
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "8d2e4a6c1b53"
+down_revision: Union[str, None] = "3b9c1f0d7a21"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.execute("CREATE EXTENSION IF NOT EXISTS cube")
+    op.execute("CREATE EXTENSION IF NOT EXISTS earthdistance")
+    op.execute(
+        "CREATE INDEX IF NOT EXISTS ix_location_earth ON location "
+        "USING gist (ll_to_earth(latitude, longitude))"
+    )
+    op.create_index(
+        "ix_resource_status_resource_type",
+        "resource",
+        ["status", "resource_type"],
+        if_not_exists=True,
+    )
+    op.create_index(
+        "ix_resource_actual_location",
+        "resource",
+        ["actual_location"],
+        if_not_exists=True,
+    )
+
+
+def downgrade() -> None:
+    op.drop_index(
+        "ix_resource_actual_location", table_name="resource", if_exists=True
+    )
+    op.drop_index(
+        "ix_resource_status_resource_type",
+        table_name="resource",
+        if_exists=True,
+    )
+    op.execute("DROP INDEX IF EXISTS ix_location_earth")
@@ -0,0 +1,42 @@
+"""Location history partitioned by day
+
+Revision ID: 9a3d6e1f4c27
+Revises: 5e1b8c3f2a94
+Create Date: 2026-10-18 13:00:00.000000
+
+"""
+
+from typing import Sequence, Union
+
+import sqlalchemy as sa
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "9a3d6e1f4c27"
+down_revision: Union[str, None] = "5e1b8c3f2a94"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # The daily partitions are created by the application at startup
+    # (src.services.history.maintain_history)
+    op.create_table(
+        "location_history",
+        sa.Column("resource_id", sa.Uuid(), nullable=False),
+        sa.Column("recorded_at", sa.DateTime(timezone=True), nullable=False),
+        sa.Column("latitude", sa.Float(), nullable=False),
+        sa.Column("longitude", sa.Float(), nullable=False),
+        sa.Column("accuracy", sa.Float(), nullable=True),
+        sa.Column("speed", sa.Float(), nullable=True),
+        sa.Column("heading", sa.Float(), nullable=True),
+        sa.PrimaryKeyConstraint("resource_id", "recorded_at"),
+        postgresql_partition_by="RANGE (recorded_at)",
+        if_not_exists=True,
+    )
+
+
+def downgrade() -> None:
+    # Drops the partitions too
+    op.drop_table("location_history", if_exists=True)
@@ -0,0 +1,29 @@
+"""Change feed triggers
+
+Revision ID: c4f7a2e9d8b6
+Revises: 8d2e4a6c1b53
+Create Date: 2026-10-18 11:00:00.000000
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+from src.configs.database import CHANGE_FEED_DDL, CHANGE_FEED_TABLES
+
+# revision identifiers, used by Alembic.
+revision: str = "c4f7a2e9d8b6"
+down_revision: Union[str, None] = "8d2e4a6c1b53"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    for statement in CHANGE_FEED_DDL:
+        op.execute(statement)
+
+
+def downgrade() -> None:
+    for table in CHANGE_FEED_TABLES:
+        op.execute(f"DROP TRIGGER IF EXISTS serp_notify_change ON {table}")
+    op.execute("DROP FUNCTION IF EXISTS serp_notify_change()")
@@ -0,0 +1,40 @@
+"""Indexes of the references to resources
+
+Revision ID: e7b2c5d1a8f3
+Revises: 9a3d6e1f4c27
+Create Date: 2026-10-18 15:00:00.000000
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "e7b2c5d1a8f3"
+down_revision: Union[str, None] = "9a3d6e1f4c27"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# Used by the set-based statements of the resources decommission, which
+# would scan the whole table otherwise (the link primary key starts with
+# emergency_id)
+INDEXES = [
+    ("ix_emergency_resource_id", "emergency", ["resource_id"]),
+    ("ix_emergency_destination_id", "emergency", ["destination_id"]),
+    (
+        "ix_emergencyresourcelink_resource_id",
+        "emergencyresourcelink",
+        ["resource_id"],
+    ),
+]
+
+
+def upgrade() -> None:
+    for name, table, columns in INDEXES:
+        op.create_index(name, table, columns, if_not_exists=True)
+
+
+def downgrade() -> None:
+    for name, table, _ in INDEXES:
+        op.drop_index(name, table_name=table, if_exists=True)
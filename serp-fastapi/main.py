@@ -13,13 +13,33 @@ from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 
 # Config DB
-from src.configs.database import sessionmanager
-from src.routes import emergencies, location, resources #, qosod
+from src.configs.config import settings
+from src.configs.database import (
+    ReadYourWritesMiddleware,
+    change_feed,
+    sessionmanager,
+)
+from src.routes import (  # , qosod
+    database,
+    emergencies,
+    fleet,
+    history,
+    live,
+    location,
+    resources,
+    sync,
+    telemetry,
+)
+from src.services.broadcaster import broadcaster
+from src.services.fleet import fleet_snapshot
+from src.services.history import maintain_history
+from src.services.telemetry import telemetry_ingestor
+from src.services.tombstones import purge_tombstones
 
 # Seed DB
 from src.seeders.main import seed_db as seed_db_helper
 
-from fastapi_utilities import repeat_at
+from fastapi_utilities import repeat_at, repeat_every
 from apscheduler.schedulers.background import BackgroundScheduler
 
 
@@ -44,6 +64,66 @@ async def lifespan(app: FastAPI):
         await seed_db_helper(5)
     # Initialize the DatabaseSessionManager
     await sessionmanager.create_db_and_tables()
+
+    # Replication lag of the read replicas, checked before reading from them
+    if sessionmanager.has_replicas:
+
+        @repeat_every(seconds=settings.DB_REPLICA_CHECK_SECONDS, logger=logger)
+        async def check_read_replicas():
+            await sessionmanager.check_replicas()
+
+        await check_read_replicas()
+
+    # Build the in-memory fleet snapshot and keep it refreshed
+    @repeat_every(seconds=fleet_snapshot.refresh_seconds, logger=logger)
+    async def refresh_fleet_snapshot():
+        async with sessionmanager.session() as session:
+            await fleet_snapshot.refresh(session)
+
+    async with sessionmanager.session() as session:
+        await fleet_snapshot.load(session)
+    await refresh_fleet_snapshot()
+
+    # Drop the tombstones of the delta sync past their retention
+    @repeat_every(seconds=3600, logger=logger)
+    async def purge_sync_tombstones():
+        async with sessionmanager.session() as session:
+            await purge_tombstones(session)
+
+    await purge_sync_tombstones()
+
+    # Partitions of the location history and its retention
+    @repeat_every(seconds=3600, logger=logger)
+    async def maintain_location_history():
+        async with sessionmanager.session() as session:
+            await maintain_history(session)
+
+    await maintain_location_history()
+
+    # Write the coalesced GPS fixes in batches
+    @repeat_every(seconds=telemetry_ingestor.flush_seconds, logger=logger)
+    async def flush_telemetry():
+        async with sessionmanager.session() as session:
+            await telemetry_ingestor.flush(
+                session, fleet_snapshot, broadcaster
+            )
+
+    await flush_telemetry()
+
+    # Changes written by other workers/replicas, through LISTEN/NOTIFY
+    if settings.CHANGE_FEED_ENABLED:
+
+        @repeat_every(seconds=0.5, logger=logger)
+        async def refresh_stale_fleet_snapshot():
+            if fleet_snapshot.stale:
+                async with sessionmanager.session() as session:
+                    await fleet_snapshot.refresh_if_stale(session)
+
+        change_feed.subscribe(fleet_snapshot.handle_row_change)
+        change_feed.subscribe(broadcaster.publish_row_change)
+        change_feed.start()
+        await refresh_stale_fleet_snapshot()
+
     # # Seed Database for Demo
     # if "SEED_DB_DEMO" in os.environ and str_to_bool(
     #     os.environ["SEED_DB_DEMO"]
@@ -53,6 +133,9 @@ async def lifespan(app: FastAPI):
     yield
 
     # Functions that run when the server is terminatet
+    await change_feed.stop()
+    async with sessionmanager.session() as session:
+        await telemetry_ingestor.flush(session, fleet_snapshot, broadcaster)
     print("Shutting down scheduler...")
     await scheduler.stop()
     await sessionmanager.close()  # Cleanup DB connecti
@@ -81,6 +164,9 @@ else:
         lifespan=lifespan
         )
 
+# Reads of a client go to the primary right after its own writes
+app.add_middleware(ReadYourWritesMiddleware)
+
 scheduler = BackgroundScheduler()
 
 cli = typer.Typer()
@@ -126,12 +212,19 @@ def runserver():
         allow_credentials=True,
         allow_methods=["*"],
         allow_headers=["*"],
+        expose_headers=["X-Next-Cursor", "ETag"],
     )
 
+    app.include_router(database.router)
     app.include_router(emergencies.router)
+    app.include_router(fleet.router)
+    app.include_router(history.router)
+    app.include_router(live.router)
     app.include_router(location.router)
     # app.include_router(qosod.router)
     app.include_router(resources.router)
+    app.include_router(sync.router)
+    app.include_router(telemetry.router)
 
     if "PORT" in os.environ:
         port_app = int(os.environ["PORT"])
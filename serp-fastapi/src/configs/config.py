@@ -18,5 +18,127 @@ class Settings(BaseModel):
     POSTGRES_DB: Optional[str] = os.getenv("POSTGRES_DB")
     POSTGRES_PORT: Optional[str] = os.getenv("POSTGRES_PORT")
 
+    # Connection pool of the engine: connections kept open, extra ones
+    # opened under load, seconds waiting for a free connection before
+    # failing, seconds before a connection is replaced, and whether it is
+    # tested before use
+    DB_POOL_SIZE: int = int(os.getenv("DB_POOL_SIZE", "10"))
+    DB_MAX_OVERFLOW: int = int(os.getenv("DB_MAX_OVERFLOW", "20"))
+    DB_POOL_TIMEOUT: float = float(os.getenv("DB_POOL_TIMEOUT", "30"))
+    DB_POOL_RECYCLE: int = int(os.getenv("DB_POOL_RECYCLE", "1800"))
+    DB_POOL_PRE_PING: bool = os.getenv("DB_POOL_PRE_PING", "true").lower() in [
+        "true",
+        "1",
+        "yes",
+    ]
+
+    # Prepared statements cached per connection (0 behind pgbouncer in
+    # transaction mode), server side statement timeout in milliseconds (0
+    # for none), PostgreSQL JIT (off: compiling costs more than it saves
+    # on short queries), and application_name of the connections, suffixed
+    # by the process id
+    DB_STATEMENT_CACHE_SIZE: int = int(
+        os.getenv("DB_STATEMENT_CACHE_SIZE", "100")
+    )
+    DB_STATEMENT_TIMEOUT_MS: int = int(
+        os.getenv("DB_STATEMENT_TIMEOUT_MS", "30000")
+    )
+    DB_JIT: bool = os.getenv("DB_JIT", "false").lower() in [
+        "true",
+        "1",
+        "yes",
+    ]
+    DB_APPLICATION_NAME: str = os.getenv("DB_APPLICATION_NAME", "serp-fastapi")
+
+    # SQL statements logging: off by default, when on only this fraction of
+    # the statements is logged
+    DB_ECHO: bool = os.getenv("DB_ECHO", "false").lower() in [
+        "true",
+        "1",
+        "yes",
+    ]
+    DB_ECHO_SAMPLE_RATE: float = float(
+        os.getenv("DB_ECHO_SAMPLE_RATE", "0.01")
+    )
+
+    # Read replicas: comma separated host[:port] list (none by default, all
+    # the reads on the primary), same credentials and database as the
+    # primary. A replica lagging more than DB_REPLICA_MAX_LAG_SECONDS is not
+    # read from, the lag is measured every DB_REPLICA_CHECK_SECONDS. After
+    # its own write a client reads from the primary until a replica has
+    # replayed it, for DB_READ_YOUR_WRITES_SECONDS at most (keep it above the
+    # max lag)
+    DB_READ_REPLICA_HOSTS: str = os.getenv("DB_READ_REPLICA_HOSTS", "")
+    DB_REPLICA_MAX_LAG_SECONDS: float = float(
+        os.getenv("DB_REPLICA_MAX_LAG_SECONDS", "5")
+    )
+    DB_REPLICA_CHECK_SECONDS: float = float(
+        os.getenv("DB_REPLICA_CHECK_SECONDS", "2")
+    )
+    DB_READ_YOUR_WRITES_SECONDS: float = float(
+        os.getenv("DB_READ_YOUR_WRITES_SECONDS", "10")
+    )
+
+    # In-memory fleet snapshot: seconds between incremental refreshes, i.e.
+    # the staleness bound for writes made by other processes
+    FLEET_REFRESH_SECONDS: float = float(
+        os.getenv("FLEET_REFRESH_SECONDS", "5")
+    )
+
+    # Live feed: events kept to resume from a sequence number, and events
+    # queued per client before it is dropped as too slow
+    LIVE_FEED_BUFFER_SIZE: int = int(
+        os.getenv("LIVE_FEED_BUFFER_SIZE", "10000")
+    )
+    LIVE_FEED_QUEUE_SIZE: int = int(os.getenv("LIVE_FEED_QUEUE_SIZE", "1000"))
+
+    # Delta sync: the new watermark is taken this many seconds in the past,
+    # so rows of transactions committing late are sent again, not missed.
+    # Tombstones older than the retention are purged, clients with an older
+    # watermark get a full sync.
+    SYNC_SAFETY_MARGIN_SECONDS: float = float(
+        os.getenv("SYNC_SAFETY_MARGIN_SECONDS", "5")
+    )
+    SYNC_TOMBSTONE_RETENTION_DAYS: int = int(
+        os.getenv("SYNC_TOMBSTONE_RETENTION_DAYS", "7")
+    )
+
+    # Change feed: LISTEN/NOTIFY of the row changes between processes
+    CHANGE_FEED_ENABLED: bool = os.getenv(
+        "CHANGE_FEED_ENABLED", "true"
+    ).lower() in ["true", "1", "yes"]
+
+    # Telemetry ingestion: seconds between writes of the coalesced fixes,
+    # resources written per upsert statement, and resources with a pending
+    # fix before new ones are rejected until the next flush
+    TELEMETRY_FLUSH_SECONDS: float = float(
+        os.getenv("TELEMETRY_FLUSH_SECONDS", "1")
+    )
+    TELEMETRY_FLUSH_BATCH_SIZE: int = int(
+        os.getenv("TELEMETRY_FLUSH_BATCH_SIZE", "1000")
+    )
+    TELEMETRY_MAX_PENDING: int = int(
+        os.getenv("TELEMETRY_MAX_PENDING", "50000")
+    )
+
+    # Emergencies per page of the list when the client sends no limit
+    EMERGENCY_PAGE_SIZE: int = int(os.getenv("EMERGENCY_PAGE_SIZE", "100"))
+
+    # Creation of emergencies and resources: entities written per statement
+    # (with their locations and addresses), and emergencies per bulk request.
+    # Resources per bulk decommission request
+    INTAKE_BATCH_SIZE: int = int(os.getenv("INTAKE_BATCH_SIZE", "500"))
+    EMERGENCY_BULK_MAX: int = int(os.getenv("EMERGENCY_BULK_MAX", "1000"))
+    RESOURCE_BULK_MAX: int = int(os.getenv("RESOURCE_BULK_MAX", "1000"))
+
+    # Location history: days of positions kept, and daily partitions
+    # created in advance (PostgreSQL)
+    LOCATION_HISTORY_RETENTION_DAYS: int = int(
+        os.getenv("LOCATION_HISTORY_RETENTION_DAYS", "90")
+    )
+    LOCATION_HISTORY_DAYS_AHEAD: int = int(
+        os.getenv("LOCATION_HISTORY_DAYS_AHEAD", "3")
+    )
+
 
 settings = Settings()
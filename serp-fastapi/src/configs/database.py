@@ -1,8 +1,19 @@
 """Class file to manage Database communitcation"""
 
+import asyncio
 import contextlib
-from typing import Any, AsyncIterator, Optional
+import json
+import logging
+import math
+import random
+import time
+import uuid as uuid_pkg
+from typing import Any, AsyncIterator, Callable, List, Optional, Sequence
 
+import asyncpg
+from fastapi import Request
+from sqlalchemy import DDL, event, make_url, text
+from sqlalchemy import exc as sa_exc
 from sqlalchemy.ext.asyncio import (
     AsyncConnection,
     AsyncEngine,
@@ -11,7 +22,9 @@ from sqlalchemy.ext.asyncio import (
     create_async_engine,
 )
 from sqlalchemy.orm import declarative_base
+from sqlalchemy.pool import AsyncAdaptedQueuePool
 from sqlmodel import SQLModel
+from starlette.datastructures import MutableHeaders
 
 from src.configs.config import settings
 
@@ -37,6 +50,197 @@ DATABASE_URL = (
 )
 
 
+# Identifies the connections of this process, so the change feed can skip
+# the notifications of its own writes
+PROCESS_ID = uuid_pkg.uuid4().hex[:8]
+APPLICATION_NAME = f"{settings.DB_APPLICATION_NAME}-{PROCESS_ID}"
+
+logger = logging.getLogger(__name__)
+sql_logger = logging.getLogger(f"{__name__}.sql")
+
+
+class PoolMetrics:
+    """Time spent waiting for a connection of the pool"""
+
+    __slots__ = ("checkouts", "waits", "timeouts", "wait_seconds", "max_wait")
+
+    # Checkouts slower than this waited for a connection to be released
+    WAIT_THRESHOLD_SECONDS = 0.001
+
+    def __init__(self):
+        self.checkouts = 0
+        self.waits = 0
+        self.timeouts = 0
+        self.wait_seconds = 0.0
+        self.max_wait = 0.0
+
+    def record(self, seconds: float, timed_out: bool = False) -> None:
+        """Records a checkout that took seconds"""
+        if timed_out:
+            self.timeouts += 1
+        else:
+            self.checkouts += 1
+        if seconds >= self.WAIT_THRESHOLD_SECONDS:
+            self.waits += 1
+        self.wait_seconds += seconds
+        self.max_wait = max(self.max_wait, seconds)
+
+
+class TimedAsyncQueuePool(AsyncAdaptedQueuePool):
+    """Queue pool measuring how long every checkout waits"""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.metrics = PoolMetrics()
+
+    def _do_get(self):
+        started = time.perf_counter()
+        try:
+            connection = super()._do_get()
+        except sa_exc.TimeoutError:
+            self.metrics.record(time.perf_counter() - started, True)
+            raise
+        self.metrics.record(time.perf_counter() - started)
+        return connection
+
+
+def engine_kwargs() -> dict[str, Any]:
+    """create_async_engine arguments of the PostgreSQL engine, from settings"""
+    server_settings = {
+        "application_name": APPLICATION_NAME,
+        "jit": "on" if settings.DB_JIT else "off",
+    }
+    if settings.DB_STATEMENT_TIMEOUT_MS:
+        server_settings["statement_timeout"] = str(
+            settings.DB_STATEMENT_TIMEOUT_MS
+        )
+    return {
+        # Statements are logged by the sampling listener instead
+        "echo": False,
+        "poolclass": TimedAsyncQueuePool,
+        "pool_size": settings.DB_POOL_SIZE,
+        "max_overflow": settings.DB_MAX_OVERFLOW,
+        "pool_timeout": settings.DB_POOL_TIMEOUT,
+        "pool_recycle": settings.DB_POOL_RECYCLE,
+        "pool_pre_ping": settings.DB_POOL_PRE_PING,
+        "connect_args": {
+            "server_settings": server_settings,
+            # asyncpg own cache, and the one of the SQLAlchemy adapter
+            "statement_cache_size": settings.DB_STATEMENT_CACHE_SIZE,
+            "prepared_statement_cache_size": settings.DB_STATEMENT_CACHE_SIZE,
+        },
+    }
+
+
+def engine_pool_stats(engine: AsyncEngine) -> dict[str, Any]:
+    """Connections of the pool of an engine and the waits for one"""
+    pool = engine.pool
+    stats: dict[str, Any] = {"pool": type(pool).__name__}
+    if isinstance(pool, AsyncAdaptedQueuePool):
+        stats.update(
+            size=pool.size(),
+            checked_in=pool.checkedin(),
+            checked_out=pool.checkedout(),
+            overflow=max(0, pool.overflow()),
+        )
+    metrics = getattr(pool, "metrics", None)
+    if metrics is not None:
+        stats.update(
+            checkouts=metrics.checkouts,
+            waits=metrics.waits,
+            timeouts=metrics.timeouts,
+            avg_wait_seconds=(
+                metrics.wait_seconds / metrics.checkouts
+                if metrics.checkouts
+                else 0.0
+            ),
+            max_wait_seconds=metrics.max_wait,
+        )
+    return stats
+
+
+def replica_urls(primary_url: str, hosts: str) -> List[str]:
+    """
+    URLs of the read replicas at hosts, a comma separated host[:port] list:
+    the URL of the primary with its host and port replaced
+    """
+    hosts_list = [host.strip() for host in hosts.split(",") if host.strip()]
+    if not hosts_list:
+        return []
+    url = make_url(primary_url)
+    urls = []
+    for host in hosts_list:
+        name, _, port = host.partition(":")
+        urls.append(
+            url.set(
+                host=name, port=int(port) if port else url.port
+            ).render_as_string(hide_password=False)
+        )
+    return urls
+
+
+# Seconds the replica is behind the primary: 0 when it has replayed the WAL
+# written by the primary up to :primary_lsn (an idle primary writes no WAL,
+# the last replayed transaction may be old), the age of the last replayed
+# transaction otherwise. NULL when it is not a standby
+REPLICA_LAG_SQL = """
+SELECT CASE
+    WHEN pg_last_wal_replay_lsn() >= CAST(:primary_lsn AS pg_lsn) THEN 0
+    ELSE EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp())
+END
+"""
+
+
+class ReadReplica:
+    """Engine of a read replica and its last measured replication lag"""
+
+    def __init__(self, url: str, engine_kwargs: dict[str, Any]):
+        self.engine = create_async_engine(url, **engine_kwargs)
+        self.sessionmaker = async_sessionmaker(
+            autocommit=False, bind=self.engine
+        )
+        self.name = self.engine.url.host or self.engine.url.database
+        # Seconds behind the primary, None until measured or when the
+        # replica cannot be reached: it is not read from
+        self.lag: Optional[float] = None
+        self.checked_at = 0.0
+        self.reads = 0
+
+    @property
+    def replayed_until(self) -> float:
+        """Time up to which the writes of the primary are on the replica"""
+        return self.checked_at - (self.lag or 0.0)
+
+    async def check(
+        self, primary_lsn: Optional[str], checked_at: float
+    ) -> None:
+        """
+        Measures the replication lag against primary_lsn, the WAL position
+        of the primary at checked_at (None if unknown)
+        """
+        try:
+            async with self.engine.connect() as connection:
+                if connection.dialect.name == "postgresql":
+                    result = await connection.execute(
+                        text(REPLICA_LAG_SQL), {"primary_lsn": primary_lsn}
+                    )
+                    lag = result.scalar()
+                else:
+                    # No replication lag to measure, reachable is enough
+                    await connection.execute(text("SELECT 1"))
+                    lag = 0.0
+        except Exception:  # pylint: disable=broad-exception-caught
+            logger.warning("Read replica %s unreachable", self.name)
+            self.lag = None
+            return
+        self.lag = float(lag or 0.0)
+        self.checked_at = checked_at
+        if self.lag > settings.DB_REPLICA_MAX_LAG_SECONDS:
+            logger.warning(
+                "Read replica %s lagging %.1f seconds", self.name, self.lag
+            )
+
+
 Base = declarative_base()
 
 # Heavily inspired by
@@ -46,10 +250,33 @@ Base = declarative_base()
 class DatabaseSessionManager:
     """Class to manage Database session"""
 
-    def __init__(self, host: str, engine_kwargs: dict[str, Any] = {}):
+    def __init__(
+        self,
+        host: str,
+        engine_kwargs: dict[str, Any] = {},
+        echo_sample_rate: float = 0.0,
+        replica_urls: Sequence[str] = (),
+        max_replica_lag: float = 5.0,
+    ):
         self._engine: Optional[AsyncEngine] = create_async_engine(
             host, **engine_kwargs
         )
+        self._replicas = [
+            ReadReplica(url, engine_kwargs) for url in replica_urls
+        ]
+        self.max_replica_lag = max_replica_lag
+        self._next_replica = 0
+        self.primary_reads = 0
+        self.echo_sample_rate = echo_sample_rate
+        if echo_sample_rate > 0:
+            for engine in [self._engine] + [
+                replica.engine for replica in self._replicas
+            ]:
+                event.listen(
+                    engine.sync_engine,
+                    "before_cursor_execute",
+                    self._log_sampled_statement,
+                )
         # self._sessionmaker: Optional[async_sessionmaker[AsyncSession]] = async_sessionmaker(
         #     autocommit=False, bind=self._engine
         # )
@@ -57,14 +284,91 @@ class DatabaseSessionManager:
             autocommit=False, bind=self._engine
         )
 
+    def _log_sampled_statement(
+        self, conn, cursor, statement, parameters, context, executemany
+    ) -> None:
+        if random.random() < self.echo_sample_rate:
+            sql_logger.info("%s %r", statement, parameters)
+
+    def pool_stats(self) -> dict[str, Any]:
+        """Connections of the pool and the waits for one"""
+        if self._engine is None:
+            raise Exception("DatabaseSessionManager is not initialized")
+        return engine_pool_stats(self._engine)
+
+    @property
+    def has_replicas(self) -> bool:
+        """Whether reads can be sent to read replicas"""
+        return bool(self._replicas)
+
+    async def check_replicas(self) -> None:
+        """Measures the replication lag of every replica"""
+        if not self._replicas:
+            return
+        # Taken before the WAL position, so replayed_until is never ahead
+        checked_at = time.time()
+        primary_lsn = None
+        if self._engine.dialect.name == "postgresql":
+            try:
+                async with self._engine.connect() as connection:
+                    result = await connection.execute(
+                        text("SELECT CAST(pg_current_wal_lsn() AS text)")
+                    )
+                    primary_lsn = result.scalar()
+            except Exception:  # pylint: disable=broad-exception-caught
+                logger.warning("Primary unreachable, lag estimated")
+        await asyncio.gather(
+            *(
+                replica.check(primary_lsn, checked_at)
+                for replica in self._replicas
+            )
+        )
+
+    def replica_stats(self) -> dict[str, Any]:
+        """Reads served by the primary and by every replica, with its lag"""
+        return {
+            "primary_reads": self.primary_reads,
+            "replicas": [
+                {
+                    "name": replica.name,
+                    "lag_seconds": replica.lag,
+                    "reads": replica.reads,
+                    **engine_pool_stats(replica.engine),
+                }
+                for replica in self._replicas
+            ],
+        }
+
+    def _pick_replica(
+        self, last_write: Optional[float]
+    ) -> Optional[ReadReplica]:
+        """
+        A replica lagging less than max_replica_lag that has replayed the
+        write made at last_write, if any, in turn
+        """
+        replicas = [
+            replica
+            for replica in self._replicas
+            if replica.lag is not None
+            and replica.lag <= self.max_replica_lag
+            and (last_write is None or replica.replayed_until >= last_write)
+        ]
+        if not replicas:
+            return None
+        self._next_replica += 1
+        return replicas[self._next_replica % len(replicas)]
+
     async def close(self) -> None:
         """Close connection with database"""
         if self._engine is None:
             raise Exception("DatabaseSessionManager is not initialized")
         await self._engine.dispose()
+        for replica in self._replicas:
+            await replica.engine.dispose()
 
         self._engine = None
         self._sessionmaker = None
+        self._replicas = []
 
     @contextlib.asynccontextmanager
     async def connect(self) -> AsyncIterator[AsyncConnection]:
@@ -94,6 +398,33 @@ class DatabaseSessionManager:
         finally:
             await session.close()
 
+    @contextlib.asynccontextmanager
+    async def read_session(
+        self, last_write: Optional[float] = None
+    ) -> AsyncIterator[AsyncSession]:
+        """
+        Open a session for reads only, on a replica when one is recent
+        enough: lagging less than max_replica_lag, and past last_write (the
+        time of the last write of the client) when given. On the primary
+        otherwise.
+        """
+        replica = self._pick_replica(last_write)
+        if replica is None:
+            self.primary_reads += 1
+            async with self.session() as session:
+                yield session
+            return
+
+        replica.reads += 1
+        session = replica.sessionmaker()
+        try:
+            yield session
+        except Exception:
+            await session.rollback()
+            raise
+        finally:
+            await session.close()
+
     async def create_db_and_tables(self) -> None:
         """Create DB and tables = Migrations"""
         if type(self._engine) == AsyncEngine:
@@ -107,7 +438,13 @@ class DatabaseSessionManager:
                 await conn.run_sync(SQLModel.metadata.drop_all)
 
 
-sessionmanager = DatabaseSessionManager(DATABASE_URL, {"echo": True})
+sessionmanager = DatabaseSessionManager(
+    DATABASE_URL,
+    engine_kwargs(),
+    settings.DB_ECHO_SAMPLE_RATE if settings.DB_ECHO else 0.0,
+    replica_urls(DATABASE_URL, settings.DB_READ_REPLICA_HOSTS),
+    settings.DB_REPLICA_MAX_LAG_SECONDS,
+)
 
 
 # Possible Error
@@ -115,3 +452,213 @@ async def get_db() -> AsyncSession:
     """Get DB Session"""
     async with sessionmanager.session() as session:
         yield session
+
+
+# READ YOUR WRITES
+# Clients that wrote get a cookie with the time of their last write, their
+# reads go to the primary until a replica has replayed it.
+READ_YOUR_WRITES_COOKIE = "serp_last_write"
+
+
+def last_write_time(request: Request) -> Optional[float]:
+    """Time of the last write of the client, None if old enough to ignore"""
+    try:
+        written = float(request.cookies.get(READ_YOUR_WRITES_COOKIE, ""))
+    except ValueError:
+        return None
+    now = time.time()
+    if now - written > settings.DB_READ_YOUR_WRITES_SECONDS:
+        return None
+    return min(written, now)
+
+
+class ReadYourWritesMiddleware:
+    """
+    Sets the last write cookie on the successful responses to the requests
+    that may write (all but GET, HEAD and OPTIONS). 202 Accepted responses
+    are left out: the write is buffered (telemetry) and not committed yet,
+    the cookie would send the next reads to a replica that does not have it
+    """
+
+    READ_METHODS = {"GET", "HEAD", "OPTIONS"}
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["method"] in self.READ_METHODS:
+            await self.app(scope, receive, send)
+            return
+
+        max_age = math.ceil(settings.DB_READ_YOUR_WRITES_SECONDS)
+
+        async def send_with_cookie(message):
+            if (
+                message["type"] == "http.response.start"
+                and message["status"] < 400
+                and message["status"] != 202
+            ):
+                # The handler has committed by the time it answers
+                MutableHeaders(scope=message).append(
+                    "set-cookie",
+                    f"{READ_YOUR_WRITES_COOKIE}={time.time():.3f}; "
+                    f"Max-Age={max_age}; Path=/; HttpOnly; SameSite=Lax",
+                )
+            await send(message)
+
+        await self.app(scope, receive, send_with_cookie)
+
+
+async def get_read_db(request: Request) -> AsyncSession:
+    """
+    Get a DB Session for reads only, on a read replica when one is recent
+    enough for the client
+    """
+    async with sessionmanager.read_session(
+        last_write_time(request)
+    ) as session:
+        yield session
+
+
+# CHANGE FEED
+# Row changes of the tables below are notified by triggers on the
+# CHANGE_FEED_CHANNEL channel, delivered by PostgreSQL on commit only.
+CHANGE_FEED_CHANNEL = "serp_changes"
+CHANGE_FEED_TABLES = ["emergency", "resource", "location"]
+
+CHANGE_FEED_FUNCTION_DDL = f"""
+CREATE OR REPLACE FUNCTION serp_notify_change() RETURNS trigger AS $$
+DECLARE
+    row_id text;
+BEGIN
+    IF TG_OP = 'DELETE' THEN
+        row_id := OLD.id::text;
+    ELSE
+        row_id := NEW.id::text;
+    END IF;
+    PERFORM pg_notify(
+        '{CHANGE_FEED_CHANNEL}',
+        json_build_object(
+            'table', TG_TABLE_NAME,
+            'op', lower(TG_OP),
+            'id', row_id,
+            'origin', current_setting('application_name', true)
+        )::text
+    );
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql
+"""
+
+CHANGE_FEED_DDL = [CHANGE_FEED_FUNCTION_DDL] + [
+    f"CREATE OR REPLACE TRIGGER serp_notify_change "
+    f"AFTER INSERT OR UPDATE OR DELETE ON {table} "
+    f"FOR EACH ROW EXECUTE FUNCTION serp_notify_change()"
+    for table in CHANGE_FEED_TABLES
+]
+
+for statement in CHANGE_FEED_DDL:
+    event.listen(
+        SQLModel.metadata,
+        "after_create",
+        DDL(statement).execute_if(dialect="postgresql"),
+    )
+
+
+class RowChange:
+    """A row change notified by the change feed"""
+
+    __slots__ = ("table", "op", "id", "origin")
+
+    def __init__(
+        self, table: str, op: str, row_id: Optional[str], origin: str
+    ):
+        self.table = table
+        # insert, update, delete - or resync after a (re)connection, when
+        # changes may have been missed
+        self.op = op
+        self.id = row_id
+        self.origin = origin
+
+
+class ChangeFeed:
+    """
+    One dedicated asyncpg connection per process LISTENing to the row
+    changes, dispatched to the subscribers. Changes written by this process
+    are skipped: they were already applied by the write paths.
+    """
+
+    def __init__(self, dsn: str, channel: str = CHANGE_FEED_CHANNEL):
+        self._dsn = dsn
+        self._channel = channel
+        self._subscribers: List[Callable[[RowChange], None]] = []
+        self._task: Optional[asyncio.Task] = None
+
+    def subscribe(self, callback: Callable[[RowChange], None]) -> None:
+        """Registers a callback called with every RowChange"""
+        self._subscribers.append(callback)
+
+    def _dispatch(self, change: RowChange) -> None:
+        for callback in self._subscribers:
+            try:
+                callback(change)
+            except Exception:  # pylint: disable=broad-exception-caught
+                logger.exception("Change feed subscriber failed")
+
+    def _on_notify(self, connection, pid, channel, payload) -> None:
+        try:
+            data = json.loads(payload)
+        except ValueError:
+            logger.warning("Invalid change feed payload: %s", payload)
+            return
+        if data.get("origin") == APPLICATION_NAME:
+            return
+        self._dispatch(
+            RowChange(data["table"], data["op"], data["id"], data["origin"])
+        )
+
+    async def _listen(self) -> None:
+        backoff = 1
+        while True:
+            connection = None
+            try:
+                connection = await asyncpg.connect(
+                    self._dsn,
+                    server_settings={
+                        "application_name": f"{APPLICATION_NAME}-listener"
+                    },
+                )
+                closed = asyncio.Event()
+                connection.add_termination_listener(lambda _: closed.set())
+                await connection.add_listener(self._channel, self._on_notify)
+                backoff = 1
+                # Notifications sent while disconnected are lost
+                self._dispatch(RowChange("*", "resync", None, ""))
+                await closed.wait()
+                logger.warning("Change feed connection lost")
+            except asyncio.CancelledError:
+                if connection is not None:
+                    await connection.close()
+                raise
+            except Exception:  # pylint: disable=broad-exception-caught
+                logger.exception("Change feed listener failed")
+            await asyncio.sleep(backoff)
+            backoff = min(backoff * 2, 30)
+
+    def start(self) -> None:
+        """Starts listening in a background task"""
+        if self._task is None:
+            self._task = asyncio.create_task(self._listen())
+
+    async def stop(self) -> None:
+        """Stops listening"""
+        if self._task is not None:
+            self._task.cancel()
+            with contextlib.suppress(asyncio.CancelledError):
+                await self._task
+            self._task = None
+
+
+change_feed = ChangeFeed(
+    DATABASE_URL.replace("postgresql+asyncpg://", "postgresql://", 1)
+)
@@ -7,7 +7,9 @@ from src.models.address import Address
 from src.models.emergency import Emergency
 from src.models.emergencyresourceslink import EmergencyResourceLink
 from src.models.location import Location
+from src.models.location_history import LocationHistory
 from src.models.resource import Resource
+from src.models.tombstone import Tombstone
 from src.models.user import User
 
 metadata = SQLModel.metadata
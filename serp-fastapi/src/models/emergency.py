@@ -5,7 +5,7 @@ import uuid as uuid_pkg
 from datetime import datetime
 from typing import List, Optional
 
-from sqlalchemy import Column, DateTime, Enum, String, func
+from sqlalchemy import Column, DateTime, Enum, Index, String, func
 from sqlmodel import Field, Relationship, SQLModel
 
 from src.models.emergencyresourceslink import EmergencyResourceLink
@@ -42,6 +42,21 @@ class StatusType(str, enum.Enum):
 class Emergency(SQLModel, table=True):
     """Emergency SQLModel for FastApi"""
 
+    # Composite indexes backing the keyset pagination of the listing
+    __table_args__ = (
+        Index("ix_emergency_time_created_id", "time_created", "id"),
+        Index(
+            "ix_emergency_status_time_created_id",
+            "status",
+            "time_created",
+            "id",
+        ),
+        Index("ix_emergency_time_updated", "time_updated"),
+        # Resources decommission
+        Index("ix_emergency_resource_id", "resource_id"),
+        Index("ix_emergency_destination_id", "destination_id"),
+    )
+
     id: uuid_pkg.UUID = Field(
         default_factory=uuid_pkg.uuid4,
         primary_key=True,
@@ -2,6 +2,7 @@
 
 import uuid as uuid_pkg
 
+from sqlalchemy import Index
 from sqlmodel import Field, SQLModel
 
 
@@ -10,6 +11,11 @@ class EmergencyResourceLink(SQLModel, table=True):
     ToDo - Change To One to Many table
     """
 
+    # Assignments of a resource (the primary key starts with emergency_id)
+    __table_args__ = (
+        Index("ix_emergencyresourcelink_resource_id", "resource_id"),
+    )
+
     emergency_id: uuid_pkg.UUID | None = Field(
         default=None, foreign_key="emergency.id", primary_key=True
     )
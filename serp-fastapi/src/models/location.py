@@ -4,13 +4,19 @@ import uuid as uuid_pkg
 from datetime import datetime
 from typing import Optional
 
-from sqlalchemy import Column, DateTime, Float, func
+from sqlalchemy import DDL, Column, DateTime, Float, Index, event, func
 from sqlmodel import Field, SQLModel
 
 
 class Location(SQLModel, table=True):
     """Location SQLModel For FastAPI"""
 
+    # Delta sync
+    __table_args__ = (
+        Index("ix_location_time_created", "time_created"),
+        Index("ix_location_time_updated", "time_updated"),
+    )
+
     id: uuid_pkg.UUID = Field(
         default_factory=uuid_pkg.uuid4,
         primary_key=True,
@@ -29,3 +35,24 @@ class Location(SQLModel, table=True):
     time_updated: Optional[datetime] = Field(
         sa_column=Column(DateTime(timezone=True), onupdate=func.now())
     )
+
+
+# Spatial GiST index over the earth position of the location, used by the
+# nearest resources (KNN) queries. earthdistance ships with PostgreSQL
+# contrib, so no PostGIS is needed. Other dialects (tests) skip it.
+Index(
+    "ix_location_earth",
+    func.ll_to_earth(
+        Location.__table__.c.latitude, Location.__table__.c.longitude
+    ),
+    postgresql_using="gist",
+).ddl_if(dialect="postgresql")
+
+for extension in ["cube", "earthdistance"]:
+    event.listen(
+        Location.__table__,
+        "before_create",
+        DDL(f"CREATE EXTENSION IF NOT EXISTS {extension}").execute_if(
+            dialect="postgresql"
+        ),
+    )
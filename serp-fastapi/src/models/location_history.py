@@ -0,0 +1,34 @@
+"""Append-only history of the resources positions"""
+
+import uuid as uuid_pkg
+from datetime import datetime
+from typing import Optional
+
+from sqlalchemy import Column, DateTime, Float
+from sqlmodel import Field, SQLModel
+
+
+class LocationHistory(SQLModel, table=True):
+    """
+    Position of a resource at a point in time. On PostgreSQL the table is
+    range partitioned by recorded_at, one partition per day, created and
+    dropped by src.services.history. There is no foreign key to resource:
+    tracks outlive the resources for after-action review.
+    """
+
+    __tablename__ = "location_history"
+    __table_args__ = {"postgresql_partition_by": "RANGE (recorded_at)"}
+
+    # The primary key holds the partition key, as PostgreSQL requires, and
+    # serves the track queries of a resource over a time window
+    resource_id: uuid_pkg.UUID = Field(primary_key=True, nullable=False)
+    recorded_at: datetime = Field(
+        sa_column=Column(
+            DateTime(timezone=True), primary_key=True, nullable=False
+        )
+    )
+    latitude: float = Field(sa_column=Column(Float, nullable=False))
+    longitude: float = Field(sa_column=Column(Float, nullable=False))
+    accuracy: Optional[float] = Field(sa_column=Column(Float, nullable=True))
+    speed: Optional[float] = Field(sa_column=Column(Float, nullable=True))
+    heading: Optional[float] = Field(sa_column=Column(Float, nullable=True))
@@ -5,7 +5,7 @@ import uuid as uuid_pkg
 from datetime import datetime
 from typing import List, Optional
 
-from sqlalchemy import Column, DateTime, Enum, String, func
+from sqlalchemy import Column, DateTime, Enum, Index, String, func
 from sqlmodel import Field, Relationship, SQLModel
 
 from src.models.emergency import Emergency
@@ -33,6 +33,15 @@ class ResourceTypeEnum(str, enum.Enum):
 class Resource(SQLModel, table=True):
     """Resource Model for SQL Model"""
 
+    # Indexes backing the nearest available resources queries
+    __table_args__ = (
+        Index("ix_resource_status_resource_type", "status", "resource_type"),
+        Index("ix_resource_actual_location", "actual_location"),
+        # Delta sync
+        Index("ix_resource_time_created", "time_created"),
+        Index("ix_resource_time_updated", "time_updated"),
+    )
+
     id: uuid_pkg.UUID = Field(
         default_factory=uuid_pkg.uuid4,
         primary_key=True,
@@ -0,0 +1,31 @@
+"""Tombstones of deleted rows for the delta sync"""
+
+import uuid as uuid_pkg
+from datetime import datetime
+from typing import Optional
+
+from sqlalchemy import Column, DateTime, String, func
+from sqlmodel import Field, SQLModel
+
+
+class Tombstone(SQLModel, table=True):
+    """Record of a deleted emergency, resource or location"""
+
+    id: uuid_pkg.UUID = Field(
+        default_factory=uuid_pkg.uuid4,
+        primary_key=True,
+        nullable=False,
+    )
+    entity: str = Field(sa_column=Column(String(32), nullable=False))
+    entity_id: uuid_pkg.UUID = Field(nullable=False)
+
+    # From the database clock, the one of the sync watermark
+    time_deleted: Optional[datetime] = Field(
+        default=None,
+        sa_column=Column(
+            DateTime(timezone=True),
+            server_default=func.now(),
+            index=True,
+            nullable=False,
+        ),
+    )
@@ -0,0 +1,21 @@
+"""
+Database Routes - Usage of the connection pools
+"""
+
+from typing import Any, Dict
+
+from fastapi import APIRouter
+
+from src.configs.database import sessionmanager
+
+router = APIRouter()
+
+
+@router.get("/api/database/pool")
+async def get_pool_stats() -> Dict[str, Any]:
+    """
+    Connections of the pool and the time spent waiting for one: a growing
+    max_wait_seconds or any timeouts mean the pool is too small for the load.
+    With read replicas, the reads served by each and its replication lag
+    """
+    return {**sessionmanager.pool_stats(), **sessionmanager.replica_stats()}
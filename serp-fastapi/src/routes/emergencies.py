@@ -2,22 +2,25 @@
 
 import uuid as uuid_pkg
 from datetime import datetime
-from typing import Annotated, List, Optional
+from typing import Annotated, Dict, List, Optional, Tuple
 
 from fastapi import (
     APIRouter,
     Depends,
     HTTPException,
+    Query,
+    Response,
 )
+from fastapi.responses import StreamingResponse
 from pydantic import (
     BaseModel,
     Field,
 )
-from sqlalchemy import select
+from sqlalchemy import Select, select, tuple_
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy.orm import selectinload
 
-from src.configs.database import get_db
+from src.configs.config import settings
+from src.configs.database import get_db, get_read_db
 from src.models.address import Address
 from src.models.emergency import (
     Emergency,
@@ -27,7 +30,24 @@ from src.models.emergency import (
 )
 from src.models.emergencyresourceslink import EmergencyResourceLink
 from src.models.location import Location
-from src.models.resource import Resource, ResourceStatusEnum
+from src.models.resource import (
+    Resource,
+    ResourceStatusEnum,
+    ResourceTypeEnum,
+)
+from src.routes.resources import ResourcesWithLocationModel
+from src.services.assignments import assign_resources
+from src.services.broadcaster import (
+    ChangeBroadcaster,
+    get_broadcaster,
+    location_delta,
+)
+from src.services.fleet import FleetSnapshot, get_fleet_snapshot
+from src.services.intake import insert_rows
+from src.services.pagination import decode_cursor, encode_cursor
+from src.services.spatial import nearest_available_resources
+from src.services.streaming import ExportFormat, streaming_rows_response
+from src.services.tombstones import add_tombstones
 
 router = APIRouter()
 
@@ -98,6 +118,48 @@ class EmergencyWithLocationModelResponse(EmergencyModelResponse):
     model_config = {"arbitrary_types_allowed": True}
 
 
+def emergencies_with_location_stmt(
+    status: Optional[List[StatusType]] = None,
+    priority: Optional[List[PriorityType]] = None,
+    emergency_type: Optional[List[EmergencyType]] = None,
+    created_after: Optional[datetime] = None,
+    created_before: Optional[datetime] = None,
+) -> Select:
+    """
+    Select of emergencies joined with their location, filtered and
+    ordered by (time_created, id)
+    """
+    stmt = select(Emergency, Location).join(
+        Location, Location.id == Emergency.location_emergency
+    )
+
+    if status:
+        stmt = stmt.where(Emergency.status.in_(status))
+    if priority:
+        stmt = stmt.where(Emergency.priority.in_(priority))
+    if emergency_type:
+        stmt = stmt.where(Emergency.emergency_type.in_(emergency_type))
+    if created_after is not None:
+        stmt = stmt.where(Emergency.time_created >= created_after)
+    if created_before is not None:
+        stmt = stmt.where(Emergency.time_created < created_before)
+
+    return stmt.order_by(Emergency.time_created, Emergency.id)
+
+
+def to_emergency_with_location(
+    emergency: Emergency, location: Location
+) -> EmergencyWithLocationModelResponse:
+    """
+    Builds the response model of an emergency row joined with its location
+    """
+    return EmergencyWithLocationModelResponse(
+        # **emergency.model_dump(),
+        **emergency.__dict__,  # Using __dict__ as model_dump can cause problems in async contexts, or so I read online, I do not understand why ^^'
+        location_emergency_data=location,
+    )
+
+
 @router.get(
     "/api/emergencies",
     status_code=200,
@@ -105,28 +167,78 @@ class EmergencyWithLocationModelResponse(EmergencyModelResponse):
     tags=["Emergencies"],
 )
 async def list_alerts(
-    session: Annotated[AsyncSession, Depends(get_db)],
+    session: Annotated[AsyncSession, Depends(get_read_db)],
+    response: Response,
+    status: Annotated[Optional[List[StatusType]], Query()] = None,
+    priority: Annotated[Optional[List[PriorityType]], Query()] = None,
+    emergency_type: Annotated[Optional[List[EmergencyType]], Query()] = None,
+    created_after: Optional[datetime] = None,
+    created_before: Optional[datetime] = None,
+    limit: Annotated[Optional[int], Query(ge=1, le=1000)] = None,
+    cursor: Optional[str] = None,
 ) -> List[EmergencyWithLocationModelResponse]:
-    """List all emergencies"""
+    """
+    List emergencies ordered by (time_created, id), a page at a time
 
-    emergencies = await session.execute(
-        select(Emergency, Location).join(
-            Location, Location.id == Emergency.location_emergency
-        )
+    A page has limit emergencies, EMERGENCY_PAGE_SIZE by default. The
+    cursor for the next one is sent in the X-Next-Cursor header (absent on
+    the last page). The export streams them all.
+    """
+    if limit is None:
+        limit = settings.EMERGENCY_PAGE_SIZE
+
+    stmt = emergencies_with_location_stmt(
+        status, priority, emergency_type, created_after, created_before
     )
+    if cursor is not None:
+        stmt = stmt.where(
+            tuple_(Emergency.time_created, Emergency.id)
+            > tuple_(*decode_cursor(cursor))
+        )
 
-    result = emergencies.all()
-    emergencies_with_location = []
+    # Fetch one extra row to know if there is a next page
+    stmt = stmt.limit(limit + 1)
+
+    emergencies = await session.execute(stmt)
 
-    for emergency, location in result:
-        emergency_with_location = EmergencyWithLocationModelResponse(
-            # **emergency.model_dump(),
-            **emergency.__dict__,  # Using __dict__ as model_dump can cause problems in async contexts, or so I read online, I do not understand why ^^'
-            location_emergency_data=location,
+    result = emergencies.all()
+    if len(result) > limit:
+        result = result[:limit]
+        last_emergency = result[-1][0]
+        response.headers["X-Next-Cursor"] = encode_cursor(
+            last_emergency.time_created, last_emergency.id
         )
-        emergencies_with_location.append(emergency_with_location)
 
-    return emergencies_with_location
+    return [
+        to_emergency_with_location(emergency, location)
+        for emergency, location in result
+    ]
+
+
+@router.get(
+    "/api/emergencies/export",
+    status_code=200,
+    tags=["Emergencies"],
+)
+async def export_alerts(
+    session: Annotated[AsyncSession, Depends(get_read_db)],
+    status: Annotated[Optional[List[StatusType]], Query()] = None,
+    priority: Annotated[Optional[List[PriorityType]], Query()] = None,
+    emergency_type: Annotated[Optional[List[EmergencyType]], Query()] = None,
+    created_after: Optional[datetime] = None,
+    created_before: Optional[datetime] = None,
+    export_format: Annotated[ExportFormat, Query(alias="format")] = "ndjson",
+) -> StreamingResponse:
+    """
+    Stream all emergencies (same filters as the list) as NDJSON or as a
+    chunked JSON array, reading the rows from the DB cursor in batches
+    """
+    stmt = emergencies_with_location_stmt(
+        status, priority, emergency_type, created_after, created_before
+    )
+    return streaming_rows_response(
+        session, stmt, to_emergency_with_location, export_format
+    )
 
 
 class MessageResponse(BaseModel):
@@ -137,6 +249,38 @@ class MessageResponse(BaseModel):
     emergency_id: str
 
 
+class MessageBulkResponse(BaseModel):
+    """
+    Struct for response of endpoints acting on several emergencies
+    """
+    message: str
+    emergency_ids: List[str]
+
+
+def new_emergency(
+    request: EmergencyRequest,
+) -> Tuple[Location, Address, Emergency]:
+    """
+    Builds the rows of a new emergency, its location and its address, with
+    their ids already set
+    """
+    location = Location(latitude=request.latitude, longitude=request.longitude)
+    address = Address(latitude=request.latitude, longitude=request.longitude)
+    emergency = Emergency(
+        name=request.name,
+        description=request.description,
+        emergency_type=request.emergency_type,
+        location_emergency=location.id,
+        address_emergency=address.id,
+        priority=request.priority,
+        status=request.status,
+        name_contact=request.name_contact,
+        telephone_contact=request.telephone_contact,
+        id_contact=request.id_contact,
+    )
+    return location, address, emergency
+
+
 @router.post(
     "/api/emergencies",
     response_model=MessageResponse,
@@ -144,42 +288,75 @@ class MessageResponse(BaseModel):
     tags=["Emergencies"],
 )
 async def create_alert(
-    request: EmergencyRequest, db: AsyncSession = Depends(get_db)
+    request: EmergencyRequest,
+    live: Annotated[ChangeBroadcaster, Depends(get_broadcaster)],
+    db: AsyncSession = Depends(get_db),
 ) -> MessageResponse:
     """
-    Create a new emergency
+    Create a new emergency, with its location and address in one statement
     """
     async with db.begin():  # Ensures rollback on failure
-        location = Location(
-            latitude=request.latitude, longitude=request.longitude
-        )
-        db.add(location)
-        await db.flush()
+        location, address, emergency = new_emergency(request)
+        await insert_rows(db, [location], [address], [emergency])
+        emergency_id = emergency.id
 
-        address = Address(
-            latitude=request.latitude, longitude=request.longitude
-        )
-        db.add(address)
-        await db.flush()
-
-        emergency = Emergency(
-            name=request.name,
-            description=request.description,
-            emergency_type=request.emergency_type,
-            location_emergency=location.id,
-            address_emergency=address.id,
-            priority=request.priority,
-            status=request.status,
-            name_contact=request.name_contact,
-            telephone_contact=request.telephone_contact,
-            id_contact=request.id_contact,
+        live.publish(
+            "emergency", "created", emergency_id, emergency.model_dump(), db
         )
-        db.add(emergency)
-        emergency_id = emergency.id
 
     return {"message": "Emergency Created", "emergency_id": str(emergency_id)}
 
 
+class EmergenciesCreateRequest(BaseModel):
+    """Input for the bulk create emergencies endpoint"""
+
+    emergencies: List[EmergencyRequest] = Field(
+        ..., min_length=1, max_length=settings.EMERGENCY_BULK_MAX
+    )
+
+
+@router.post(
+    "/api/emergencies/bulk",
+    response_model=MessageBulkResponse,
+    status_code=201,
+    tags=["Emergencies"],
+)
+async def create_alerts_bulk(
+    request: EmergenciesCreateRequest,
+    live: Annotated[ChangeBroadcaster, Depends(get_broadcaster)],
+    db: AsyncSession = Depends(get_db),
+) -> MessageBulkResponse:
+    """
+    Create many emergencies in one transaction, INTAKE_BATCH_SIZE of them
+    (with their locations and addresses) per statement
+    """
+    emergency_ids = []
+    async with db.begin():  # All or nothing
+        batch_size = settings.INTAKE_BATCH_SIZE
+        for start in range(0, len(request.emergencies), batch_size):
+            rows = [
+                new_emergency(x)
+                for x in request.emergencies[start : start + batch_size]
+            ]
+            locations, addresses, emergencies = zip(*rows)
+            await insert_rows(db, locations, addresses, emergencies)
+
+            for emergency in emergencies:
+                emergency_ids.append(emergency.id)
+                live.publish(
+                    "emergency",
+                    "created",
+                    emergency.id,
+                    emergency.model_dump(),
+                    db,
+                )
+
+    return {
+        "message": "Emergencies Created",
+        "emergency_ids": [str(x) for x in emergency_ids],
+    }
+
+
 # READ EMERGENCY
 @router.get(
     "/api/emergencies/{emergency_id}",
@@ -188,7 +365,7 @@ async def create_alert(
     tags=["Emergencies"],
 )
 async def get_alert(
-    emergency_id: uuid_pkg.UUID, db: AsyncSession = Depends(get_db)
+    emergency_id: uuid_pkg.UUID, db: AsyncSession = Depends(get_read_db)
 ) -> EmergencyModelResponse:
     """Get emergency details"""
     stmt = select(Emergency).where(Emergency.id == emergency_id)
@@ -208,6 +385,7 @@ async def get_alert(
 async def update_alert(
     emergency_id: uuid_pkg.UUID,
     request: EmergencyRequest,
+    live: Annotated[ChangeBroadcaster, Depends(get_broadcaster)],
     db: AsyncSession = Depends(get_db),
 ) -> MessageResponse:
     """Update an emergency"""
@@ -245,6 +423,13 @@ async def update_alert(
     ).items():
         setattr(emergency, field, value)
     db.add(emergency)
+
+    live.publish(
+        "emergency", "updated", emergency.id, emergency.model_dump(), db
+    )
+    live.publish(
+        "location", "updated", location.id, location_delta(location), db
+    )
     await db.commit()
 
     await db.refresh(emergency)
@@ -288,7 +473,9 @@ class MessageDeleteResponse(BaseModel):
     tags=["Emergencies"],
 )
 async def delete_device(
-    db: Annotated[AsyncSession, Depends(get_db)], emergency_id: str
+    db: Annotated[AsyncSession, Depends(get_db)],
+    live: Annotated[ChangeBroadcaster, Depends(get_broadcaster)],
+    emergency_id: str,
 ) -> MessageDeleteResponse:
     """Delete an emergency"""
 
@@ -308,6 +495,8 @@ async def delete_device(
 
     # Delete Emergency
     await db.delete(emergency)
+    await add_tombstones(db, "emergency", [emergency_uuid])
+    live.publish("emergency", "deleted", emergency_uuid, session=db)
     await db.commit()
 
     return {"message": "Emergency Deleted"}
@@ -320,7 +509,7 @@ async def delete_device(
     tags=["Resources"],
 )
 async def get_device_assignments(
-    resource_id: uuid_pkg.UUID, session: AsyncSession = Depends(get_db)
+    resource_id: uuid_pkg.UUID, session: AsyncSession = Depends(get_read_db)
 ) -> List[EmergencyModelResponse]:
     """Get emergency assigned to a specific resource"""
 
@@ -345,6 +534,43 @@ class EmergencyAssignResourcesRequest(BaseModel):
     resourcesIDs: List[uuid_pkg.UUID]
 
 
+def publish_assignments(
+    live: ChangeBroadcaster,
+    session: AsyncSession,
+    assignments: Dict[uuid_pkg.UUID, List[uuid_pkg.UUID]],
+    released_ids: List[uuid_pkg.UUID],
+) -> None:
+    """
+    Publishes the deltas of an assignment: the new resources of each
+    emergency and the status of the released and assigned resources
+    """
+    assigned_ids = {x for ids in assignments.values() for x in ids}
+    for resource_id in set(released_ids) - assigned_ids:
+        live.publish(
+            "resource",
+            "updated",
+            resource_id,
+            {"id": resource_id, "status": ResourceStatusEnum.AVAILABLE},
+            session,
+        )
+    for resource_id in assigned_ids:
+        live.publish(
+            "resource",
+            "updated",
+            resource_id,
+            {"id": resource_id, "status": ResourceStatusEnum.BUSY},
+            session,
+        )
+    for emergency_id, resources_ids in assignments.items():
+        live.publish(
+            "emergency",
+            "updated",
+            emergency_id,
+            {"id": emergency_id, "resources": resources_ids},
+            session,
+        )
+
+
 @router.post(
     "/api/emergencies/{emergency_id}/assign",
     response_model=MessageResponse,
@@ -353,50 +579,109 @@ class EmergencyAssignResourcesRequest(BaseModel):
 async def add_device_assignments(
     emergency_id: uuid_pkg.UUID,
     request: EmergencyAssignResourcesRequest,
+    snapshot: Annotated[FleetSnapshot, Depends(get_fleet_snapshot)],
+    live: Annotated[ChangeBroadcaster, Depends(get_broadcaster)],
     session: AsyncSession = Depends(get_db),
 ) -> MessageResponse:
     """Assign resources to an emergency."""
 
-    # Fetch the emergency with its resources in one query
-    stmt = (
-        select(Emergency)
-        .options(selectinload(Emergency.resources))
-        .where(Emergency.id == emergency_id)
-    )
-    result = await session.execute(stmt)
-    emergency = result.unique().scalar_one_or_none()
+    assignments = {emergency_id: request.resourcesIDs}
+    released_ids, assigned_ids = await assign_resources(session, assignments)
+    snapshot.set_status(released_ids, ResourceStatusEnum.AVAILABLE, session)
+    snapshot.set_status(assigned_ids, ResourceStatusEnum.BUSY, session)
+    publish_assignments(live, session, assignments, released_ids)
+    await session.commit()
 
-    if emergency is None:
-        raise HTTPException(status_code=404, detail="Emergency not found")
+    return {"message": "Updated", "emergency_id": str(emergency_id)}
 
-    # Reset existing resources to AVAILABLE
-    for resource in emergency.resources:
-        resource.status = ResourceStatusEnum.AVAILABLE
-        session.add(resource)
-
-    # Fetch and update new resources
-    db_resources = []
-    for resource_id in request.resourcesIDs:
-        stmt = select(Resource).where(Resource.id == resource_id)
-        result = await session.execute(stmt)
-        resource = result.scalar_one_or_none()
-        if resource is None:
-            raise HTTPException(
-                status_code=404, detail=f"Resource {resource_id} not found"
-            )
 
-        resource.status = ResourceStatusEnum.BUSY
-        session.add(resource)
-        db_resources.append(resource)
+class EmergencyAssignment(EmergencyAssignResourcesRequest):
+    """Resources to assign to one emergency in a bulk assignment"""
+
+    emergency_id: uuid_pkg.UUID
+
 
-    # Update the many-to-many relationship
-    emergency.resources = db_resources
+class EmergenciesAssignResourcesRequest(BaseModel):
+    """Input for the bulk assign resources to emergencies endpoint"""
 
-    # Commit all changes in one transaction
-    session.add(emergency)
+    assignments: List[EmergencyAssignment] = Field(..., max_length=1000)
+
+
+@router.post(
+    "/api/emergencies/assign",
+    response_model=MessageBulkResponse,
+    tags=["Emergencies"],
+)
+async def add_devices_assignments_bulk(
+    request: EmergenciesAssignResourcesRequest,
+    snapshot: Annotated[FleetSnapshot, Depends(get_fleet_snapshot)],
+    live: Annotated[ChangeBroadcaster, Depends(get_broadcaster)],
+    session: AsyncSession = Depends(get_db),
+) -> MessageBulkResponse:
+    """Assign resources to many emergencies in one transaction."""
+
+    assignments = {}
+    for assignment in request.assignments:
+        assignments.setdefault(assignment.emergency_id, []).extend(
+            assignment.resourcesIDs
+        )
+
+    released_ids, assigned_ids = await assign_resources(session, assignments)
+    snapshot.set_status(released_ids, ResourceStatusEnum.AVAILABLE, session)
+    snapshot.set_status(assigned_ids, ResourceStatusEnum.BUSY, session)
+    publish_assignments(live, session, assignments, released_ids)
     await session.commit()
 
-    # Refresh the emergency to ensure the response includes updated data
-    await session.refresh(emergency, attribute_names=["resources"])
+    return {
+        "message": "Updated",
+        "emergency_ids": [str(x) for x in assignments],
+    }
+
 
-    return {"message": "Updated", "emergency_id": str(emergency_id)}
+class ResourceCandidateModel(ResourcesWithLocationModel):
+    """Resource candidate for an emergency, with its distance to it"""
+
+    distance: float
+
+
+@router.get(
+    "/api/emergencies/{emergency_id}/candidates",
+    response_model=List[ResourceCandidateModel],
+    tags=["Emergencies"],
+)
+async def get_emergency_candidates(
+    emergency_id: uuid_pkg.UUID,
+    session: Annotated[AsyncSession, Depends(get_read_db)],
+    resource_type: Annotated[
+        Optional[ResourceTypeEnum], Query(alias="type")
+    ] = None,
+    k: Annotated[int, Query(ge=1, le=100)] = 5,
+) -> List[ResourceCandidateModel]:
+    """
+    List the k AVAILABLE resources closest to an emergency, closest first.
+    Distances are in meters.
+    """
+    stmt = (
+        select(Location)
+        .join(Emergency, Emergency.location_emergency == Location.id)
+        .where(Emergency.id == emergency_id)
+    )
+    result = await session.execute(stmt)
+    location = result.scalar_one_or_none()
+    if location is None:
+        raise HTTPException(
+            status_code=404, detail="Emergency location not found"
+        )
+
+    candidates = await nearest_available_resources(
+        session, location.latitude, location.longitude, resource_type, k
+    )
+
+    return [
+        ResourceCandidateModel(
+            **resource.__dict__,
+            location_resource_data=resource_location,
+            distance=distance,
+        )
+        for resource, resource_location, distance in candidates
+    ]
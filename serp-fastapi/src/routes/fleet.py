@@ -0,0 +1,116 @@
+"""
+Fleet Routes - Dashboard reads served from the in-memory fleet snapshot
+"""
+
+import uuid as uuid_pkg
+from datetime import datetime
+from typing import Annotated, List, Optional
+
+from fastapi import (
+    APIRouter,
+    Depends,
+    Header,
+    HTTPException,
+    Response,
+)
+from pydantic import BaseModel
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from src.configs.database import get_db
+from src.models.resource import ResourceStatusEnum, ResourceTypeEnum
+from src.services.fleet import FleetRecord, FleetSnapshot, get_fleet_snapshot
+
+router = APIRouter()
+
+
+class FleetRecordModel(BaseModel):
+    """Compact resource of the fleet with its actual position"""
+
+    id: uuid_pkg.UUID
+    resource_type: Optional[ResourceTypeEnum]
+    status: Optional[ResourceStatusEnum]
+    latitude: Optional[float]
+    longitude: Optional[float]
+    accuracy: Optional[float]
+    speed: Optional[float]
+    heading: Optional[float]
+    version: int
+
+
+class FleetSnapshotModel(BaseModel):
+    """Fleet snapshot with its version and staleness bound"""
+
+    version: int
+    refreshed_at: Optional[datetime]
+    max_staleness_seconds: float
+    resources: List[FleetRecordModel]
+
+
+def to_fleet_record_model(record: FleetRecord) -> FleetRecordModel:
+    """
+    Builds the response model of a fleet record
+    """
+    return FleetRecordModel(
+        id=record.id,
+        resource_type=record.resource_type,
+        status=record.status,
+        latitude=record.latitude,
+        longitude=record.longitude,
+        accuracy=record.accuracy,
+        speed=record.speed,
+        heading=record.heading,
+        version=record.version,
+    )
+
+
+@router.get(
+    "/api/fleet",
+    response_model=FleetSnapshotModel,
+    tags=["Fleet"],
+    responses={304: {"description": "Fleet not modified"}},
+)
+async def get_fleet(
+    session: Annotated[AsyncSession, Depends(get_db)],
+    snapshot: Annotated[FleetSnapshot, Depends(get_fleet_snapshot)],
+    response: Response,
+    if_none_match: Annotated[Optional[str], Header()] = None,
+):
+    """
+    Get the whole fleet from memory. The ETag changes with the snapshot
+    version, so polling with If-None-Match costs a 304 when nothing changed
+    """
+    await snapshot.ensure_loaded(session)
+
+    if if_none_match == snapshot.etag:
+        return Response(status_code=304, headers={"ETag": snapshot.etag})
+
+    response.headers["ETag"] = snapshot.etag
+    return FleetSnapshotModel(
+        version=snapshot.version,
+        refreshed_at=snapshot.refreshed_at,
+        max_staleness_seconds=snapshot.refresh_seconds,
+        resources=[
+            to_fleet_record_model(record) for record in snapshot.records()
+        ],
+    )
+
+
+@router.get(
+    "/api/fleet/{resource_id}",
+    response_model=FleetRecordModel,
+    tags=["Fleet"],
+)
+async def get_fleet_resource(
+    resource_id: uuid_pkg.UUID,
+    session: Annotated[AsyncSession, Depends(get_db)],
+    snapshot: Annotated[FleetSnapshot, Depends(get_fleet_snapshot)],
+) -> FleetRecordModel:
+    """
+    Get one resource of the fleet from memory
+    """
+    await snapshot.ensure_loaded(session)
+
+    record = snapshot.get(resource_id)
+    if record is None:
+        raise HTTPException(status_code=404, detail="Resource not found")
+    return to_fleet_record_model(record)
@@ -0,0 +1,94 @@
+"""
+History Routes - Tracks of the resources from the location history
+"""
+
+import uuid as uuid_pkg
+from datetime import datetime, timedelta, timezone
+from typing import Annotated, List, Optional
+
+from fastapi import (
+    APIRouter,
+    Depends,
+    HTTPException,
+    Query,
+)
+from pydantic import BaseModel
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from src.configs.database import get_read_db
+from src.services.history import resource_track
+
+router = APIRouter()
+
+
+class TrackPointModel(BaseModel):
+    """Position of a resource at a point in time"""
+
+    recorded_at: datetime
+    latitude: float
+    longitude: float
+    accuracy: Optional[float]
+    speed: Optional[float]
+    heading: Optional[float]
+
+
+class TrackResponse(BaseModel):
+    """Downsampled track: the first position of every bucket"""
+
+    resource_id: uuid_pkg.UUID
+    start: datetime
+    end: datetime
+    bucket_seconds: float
+    points: List[TrackPointModel]
+
+
+@router.get(
+    "/api/resources/{resource_id}/track",
+    response_model=TrackResponse,
+    tags=["History"],
+)
+async def get_resource_track(
+    session: Annotated[AsyncSession, Depends(get_read_db)],
+    resource_id: uuid_pkg.UUID,
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    max_points: Annotated[int, Query(ge=2, le=10000)] = 1000,
+) -> TrackResponse:
+    """
+    Get the track of a resource between start and end (last hour by
+    default), with at most max_points positions. Tracks of deleted
+    resources are kept until the history retention.
+    """
+    if end is None:
+        end = datetime.now(timezone.utc)
+    elif end.tzinfo is None:
+        end = end.replace(tzinfo=timezone.utc)
+    if start is None:
+        start = end - timedelta(hours=1)
+    elif start.tzinfo is None:
+        start = start.replace(tzinfo=timezone.utc)
+    start = start.astimezone(timezone.utc)
+    end = end.astimezone(timezone.utc)
+    if start >= end:
+        raise HTTPException(status_code=400, detail="start must be before end")
+
+    bucket_seconds, points = await resource_track(
+        session, resource_id, start, end, max_points
+    )
+    return TrackResponse(
+        resource_id=resource_id,
+        start=start,
+        end=end,
+        bucket_seconds=bucket_seconds,
+        points=[
+            TrackPointModel(
+                recorded_at=point.recorded_at,
+                latitude=point.latitude,
+                longitude=point.longitude,
+                accuracy=point.accuracy,
+                speed=point.speed,
+                heading=point.heading,
+            )
+            for point in points
+        ],
+    )
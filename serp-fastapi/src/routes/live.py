@@ -0,0 +1,132 @@
+"""
+Live feed Routes - Push of the emergencies, resources and locations deltas
+over Server-Sent Events and WebSocket
+"""
+
+import asyncio
+import json
+from typing import Annotated, AsyncIterator, Optional
+
+from fastapi import (
+    APIRouter,
+    Depends,
+    Header,
+    Request,
+    WebSocket,
+)
+from fastapi.responses import StreamingResponse
+
+from src.services.broadcaster import (
+    ChangeBroadcaster,
+    Subscription,
+    get_broadcaster,
+)
+
+router = APIRouter()
+
+# Seconds between keep-alive comments on an idle SSE stream
+SSE_HEARTBEAT_SECONDS = 15
+
+
+async def sse_events(
+    request: Request,
+    broadcaster: ChangeBroadcaster,
+    subscription: Subscription,
+) -> AsyncIterator[str]:
+    """
+    Writes the events of a subscription in the Server-Sent Events format
+    """
+    try:
+        if subscription.reset:
+            yield f"event: reset\ndata: {json.dumps({'type': 'reset'})}\n\n"
+        while not await request.is_disconnected():
+            try:
+                event = await asyncio.wait_for(
+                    subscription.get(), timeout=SSE_HEARTBEAT_SECONDS
+                )
+            except asyncio.TimeoutError:
+                yield ": keep-alive\n\n"
+                continue
+            if event is None:
+                # Too slow: reconnect with Last-Event-ID to resume
+                yield (
+                    "event: overflow\n"
+                    f"data: {json.dumps({'type': 'overflow'})}\n\n"
+                )
+                break
+            yield f"id: {event.event_id}\ndata: {event.to_json()}\n\n"
+    finally:
+        broadcaster.unsubscribe(subscription)
+
+
+@router.get("/api/live/events", tags=["Live"])
+async def live_feed_sse(
+    request: Request,
+    broadcaster: Annotated[ChangeBroadcaster, Depends(get_broadcaster)],
+    since: Optional[str] = None,
+    last_event_id: Annotated[Optional[str], Header()] = None,
+) -> StreamingResponse:
+    """
+    Server-Sent Events stream of the create/update/delete deltas. Resumes
+    after the Last-Event-ID header (or since) when still buffered, else a
+    reset event tells the client to refetch the lists.
+    """
+    subscription = broadcaster.subscribe(last_event_id or since)
+    return StreamingResponse(
+        sse_events(request, broadcaster, subscription),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+async def websocket_events(
+    websocket: WebSocket, subscription: Subscription
+) -> None:
+    """Sends the events of a subscription until it overflows"""
+    if subscription.reset:
+        await websocket.send_text(json.dumps({"type": "reset"}))
+    while True:
+        event = await subscription.get()
+        if event is None:
+            await websocket.send_text(json.dumps({"type": "overflow"}))
+            # 1013 - Try Again Later
+            await websocket.close(code=1013)
+            return
+        await websocket.send_text(event.to_json())
+
+
+async def websocket_disconnect(websocket: WebSocket) -> None:
+    """Reads (and ignores) the client messages until it disconnects"""
+    while True:
+        message = await websocket.receive()
+        if message["type"] == "websocket.disconnect":
+            return
+
+
+@router.websocket("/api/live/ws")
+async def live_feed_websocket(
+    websocket: WebSocket,
+    broadcaster: Annotated[ChangeBroadcaster, Depends(get_broadcaster)],
+    since: Optional[str] = None,
+):
+    """
+    WebSocket stream of the create/update/delete deltas, same messages as
+    the SSE stream. Resumes after the since event id when still buffered.
+
+    The client messages are read while the events are sent, so a client
+    leaving an idle stream is unsubscribed at once, not on the next event.
+    """
+    await websocket.accept()
+    subscription = broadcaster.subscribe(since)
+    tasks = [
+        asyncio.ensure_future(websocket_events(websocket, subscription)),
+        asyncio.ensure_future(websocket_disconnect(websocket)),
+    ]
+    try:
+        await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+    finally:
+        for task in tasks:
+            task.cancel()
+        # A send to a client gone raises WebSocketDisconnect
+        await asyncio.gather(*tasks, return_exceptions=True)
+        broadcaster.unsubscribe(subscription)
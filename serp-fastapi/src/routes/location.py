@@ -15,6 +15,7 @@ from sqlalchemy.ext.asyncio import AsyncSession
 from src.configs.database import get_db
 from src.models.location import Location
 from src.models.resource import Resource
+from src.services.fleet import FleetSnapshot, get_fleet_snapshot
 from src.services.helpers import convertStringToUUID
 
 router = APIRouter()
@@ -26,7 +27,9 @@ router = APIRouter()
     tags=["Location"],
 )
 async def get_device_location(
-    resource_id: str, db: Annotated[AsyncSession, Depends(get_db)]
+    resource_id: str,
+    db: Annotated[AsyncSession, Depends(get_db)],
+    snapshot: Annotated[FleetSnapshot, Depends(get_fleet_snapshot)],
 ):
     """
     Get the location for an specific location uuid
@@ -34,13 +37,24 @@ async def get_device_location(
 
     resource_uuid = convertStringToUUID(resource_id)
 
+    # Served from the fleet snapshot, the database is only hit on a miss
+    await snapshot.ensure_loaded(db)
+    record = snapshot.get(resource_uuid)
+    location = record.to_location() if record is not None else None
+    if location is not None:
+        return location
+
     stmt = select(Resource).where(Resource.id == resource_uuid)
     result = await db.execute(stmt)
     resource = result.scalar_one_or_none()
+    if resource is None:
+        raise HTTPException(status_code=404, detail="Resource not found")
 
     stmt = select(Location).where(Location.id == resource.actual_location)
     result = await db.execute(stmt)
     location = result.scalar_one_or_none()
     if location is None:
         raise HTTPException(status_code=404, detail="Location not found")
+
+    snapshot.set_location(resource_uuid, location)
     return location
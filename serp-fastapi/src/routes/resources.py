@@ -4,24 +4,37 @@ Routes for resources CRUD and more related to resources Model
 
 import uuid as uuid_pkg
 from datetime import datetime
-from typing import Annotated, List, Optional
+from typing import Annotated, Any, Dict, List, Optional
 
 from fastapi import (
     APIRouter,
     Depends,
     HTTPException,
+    Query,
 )
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel, Field
-from sqlalchemy import select
+from sqlalchemy import Select, select, update
 from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import aliased, lazyload
+from sqlalchemy.orm.attributes import set_committed_value
+from sqlmodel import SQLModel
 
-from src.configs.database import get_db
+from src.configs.config import settings
+from src.configs.database import get_db, get_read_db
 from src.models.address import Address
-from src.models.emergency import Emergency
-from src.models.emergencyresourceslink import EmergencyResourceLink
 from src.models.location import Location
 from src.models.resource import Resource, ResourceStatusEnum, ResourceTypeEnum
+from src.services.broadcaster import (
+    ChangeBroadcaster,
+    get_broadcaster,
+    location_delta,
+)
+from src.services.decommission import decommission_resources
+from src.services.fleet import FleetSnapshot, get_fleet_snapshot
 from src.services.helpers import convertStringToUUID
+from src.services.intake import insert_rows
+from src.services.streaming import ExportFormat, streaming_rows_response
 
 router = APIRouter()
 
@@ -82,6 +95,26 @@ class ResourcesWithLocationModel(ResourceModel):
     model_config = {"arbitrary_types_allowed": True}
 
 
+def resources_with_location_stmt() -> Select:
+    """
+    Select of resources joined with their actual location
+    """
+    return select(Resource, Location).join(
+        Location, Location.id == Resource.actual_location
+    )
+
+
+def to_resource_with_location(
+    resource: Resource, location: Location
+) -> ResourcesWithLocationModel:
+    """
+    Builds the response model of a resource row joined with its location
+    """
+    return ResourcesWithLocationModel(
+        **resource.__dict__, location_resource_data=location
+    )
+
+
 # LIST ALL RESOURCES
 @router.get(
     "/api/resources",
@@ -89,27 +122,39 @@ class ResourcesWithLocationModel(ResourceModel):
     response_model=List[ResourcesWithLocationModel],
 )
 async def list_devices(
-    session: Annotated[AsyncSession, Depends(get_db)],
+    session: Annotated[AsyncSession, Depends(get_read_db)],
 ) -> List[ResourcesWithLocationModel]:
     """
     List all resources
     """
 
-    resources = await session.execute(
-        select(Resource, Location).join(
-            Location, Location.id == Resource.actual_location
-        )
-    )
+    resources = await session.execute(resources_with_location_stmt())
     result = resources.all()
-    new_resources = []
 
-    for resource, location in result:
-        resource_with_location = ResourcesWithLocationModel(
-            **resource.__dict__, location_resource_data=location
-        )
-        new_resources.append(resource_with_location)
+    return [
+        to_resource_with_location(resource, location)
+        for resource, location in result
+    ]
 
-    return new_resources
+
+@router.get(
+    "/api/resources/export",
+    tags=["Resources"],
+)
+async def export_devices(
+    session: Annotated[AsyncSession, Depends(get_read_db)],
+    export_format: Annotated[ExportFormat, Query(alias="format")] = "ndjson",
+) -> StreamingResponse:
+    """
+    Stream all resources as NDJSON or as a chunked JSON array, reading the
+    rows from the DB cursor in batches
+    """
+    return streaming_rows_response(
+        session,
+        resources_with_location_stmt(),
+        to_resource_with_location,
+        export_format,
+    )
 
 
 class MessageResponse(BaseModel):
@@ -128,10 +173,13 @@ class MessageResponse(BaseModel):
 )
 async def create_device(
     db: Annotated[AsyncSession, Depends(get_db)],
+    snapshot: Annotated[FleetSnapshot, Depends(get_fleet_snapshot)],
+    live: Annotated[ChangeBroadcaster, Depends(get_broadcaster)],
     request: ResourceModelRequest,
 ) -> MessageResponse:
     """
-    Create a new device/resource
+    Create a new device/resource, with its locations and addresses in one
+    statement
     """
 
     async with db.begin():  # Ensures rollback on failure
@@ -139,27 +187,23 @@ async def create_device(
             latitude=request.actual_latitude,
             longitude=request.actual_longitude,
         )
-        db.add(actual_location)
 
         # For future implementations
         actual_address = Address(
             latitude=request.actual_address_latitude,
             longitude=request.actual_address_longitude,
         )
-        db.add(actual_address)
 
         normal_location = Location(
             latitude=request.normal_latitude,
             longitude=request.normal_longitude,
         )
-        db.add(normal_location)
 
         # For future implementations
         normal_address = Address(
             latitude=request.normal_address_latitude,
             longitude=request.normal_address_longitude,
         )
-        db.add(normal_address)
 
         resource = Resource(
             name=request.name,
@@ -173,10 +217,27 @@ async def create_device(
             telephone=request.telephone,
             email=request.email,
         )
-        db.add(resource)
+        await insert_rows(
+            db,
+            [actual_location, normal_location],
+            [actual_address, normal_address],
+            [resource],
+        )
 
         resource_id = resource.id
 
+        snapshot.upsert(resource, actual_location, db)
+        live.publish(
+            "resource", "created", resource_id, resource.model_dump(), db
+        )
+        live.publish(
+            "location",
+            "created",
+            actual_location.id,
+            location_delta(actual_location, resource_id),
+            db,
+        )
+
     return {"message": "Resource Created", "resource_id": str(resource_id)}
 
 
@@ -185,7 +246,7 @@ async def create_device(
     "/api/resources/{resource_id}", response_model=Resource, tags=["Resources"]
 )
 async def get_device(
-    db: Annotated[AsyncSession, Depends(get_db)], resource_id: str
+    db: Annotated[AsyncSession, Depends(get_read_db)], resource_id: str
 ) -> Resource:
     """
     Get device/resource details
@@ -202,6 +263,78 @@ async def get_device(
     return resource
 
 
+# Columns of the resource a request updates
+RESOURCE_FIELDS = [
+    "name",
+    "resource_type",
+    "status",
+    "responsible",
+    "telephone",
+    "email",
+]
+
+# Locations and addresses of a resource, in the order they are selected:
+# name, and request fields of their latitude and longitude
+RESOURCE_SATELLITES = [
+    ("Actual Location", "actual_latitude", "actual_longitude"),
+    ("Actual Address", "actual_address_latitude", "actual_address_longitude"),
+    ("Normal Location", "normal_latitude", "normal_longitude"),
+    ("Normal Address", "normal_address_latitude", "normal_address_longitude"),
+]
+
+
+def resource_graph_stmt(resource_id: uuid_pkg.UUID) -> Select:
+    """
+    Select of a resource with its actual location and address and its
+    normal location and address, in one query
+    """
+    actual_location = aliased(Location)
+    actual_address = aliased(Address)
+    normal_location = aliased(Location)
+    normal_address = aliased(Address)
+    return (
+        select(
+            Resource,
+            actual_location,
+            actual_address,
+            normal_location,
+            normal_address,
+        )
+        .outerjoin(
+            actual_location, actual_location.id == Resource.actual_location
+        )
+        .outerjoin(
+            actual_address, actual_address.id == Resource.actual_address
+        )
+        .outerjoin(
+            normal_location, normal_location.id == Resource.normal_location
+        )
+        .outerjoin(
+            normal_address, normal_address.id == Resource.normal_address
+        )
+        .where(Resource.id == resource_id)
+        # The assigned emergencies are not needed
+        .options(lazyload(Resource.emergencies))
+    )
+
+
+def apply_changes(
+    instance: SQLModel, values: Dict[str, Any]
+) -> Dict[str, Any]:
+    """
+    Sets the values that differ on instance, as already written, and returns
+    them: the UPDATE statements write them, not a flush
+    """
+    changes = {
+        key: value
+        for key, value in values.items()
+        if getattr(instance, key) != value
+    }
+    for key, value in changes.items():
+        set_committed_value(instance, key, value)
+    return changes
+
+
 # @router.patch("/api/devices/{resource_id}", response_model=Resource, tags=["Devices"])
 @router.patch(
     "/api/resources/{resource_id}",
@@ -210,84 +343,82 @@ async def get_device(
 )
 async def update_device(
     db: Annotated[AsyncSession, Depends(get_db)],
+    snapshot: Annotated[FleetSnapshot, Depends(get_fleet_snapshot)],
+    live: Annotated[ChangeBroadcaster, Depends(get_broadcaster)],
     resource_id: uuid_pkg.UUID,
     request: ResourceModelRequest,
+    partial: bool = False,
 ) -> MessageResponse:
     """
     Update resource details
+
+    The resource, its locations and its addresses are read by one query,
+    and only the columns that change are written, by one UPDATE per table.
+    With partial the fields not sent keep their value (the locations and
+    addresses are not even checked when none of their fields is sent),
+    otherwise they are reset to their default.
     """
+    values = request.model_dump(exclude_unset=partial)
 
     async with db.begin():  # Ensures rollback on failure
-        # Find Resource
-        stmt = select(Resource).where(Resource.id == resource_id)
-        result = await db.execute(stmt)
-        resource = result.scalars().first()
-        if not resource:
+        result = await db.execute(resource_graph_stmt(resource_id))
+        row = result.first()
+        if row is None:
             raise HTTPException(status_code=404, detail="Resource not found")
+        resource, *satellites = row
+        actual_location = satellites[0]
 
         # Update Model Data
-        model_data = {
-            key: value
-            for key, value in request.dict().items()
-            if key
-            in [
-                "name",
-                "resource_type",
-                "status",
-                "responsible",
-                "telephone",
-                "email",
-            ]
-        }
-        # for field, value in model_data.dict(exclude_unset=True).items():
-        for field, value in model_data.items():
-            setattr(resource, field, value)
-
-        # Update Actual Location
-        # Find Location
-        stmt = select(Location).where(Location.id == resource.actual_location)
-        result = await db.execute(stmt)
-        actual_location = result.scalars().first()
-        if not actual_location:
-            raise HTTPException(
-                status_code=404, detail="Actual Location not found"
-            )
-        actual_location.longitude = request.actual_longitude
-        actual_location.latitude = request.actual_latitude
-
-        # Update Actual Address
-        stmt = select(Address).where(Address.id == resource.actual_address)
-        result = await db.execute(stmt)
-        actual_address = result.scalars().first()
-        if not actual_address:
-            raise HTTPException(
-                status_code=404, detail="Actual Location not found"
-            )
-        actual_address.longitude = request.actual_address_longitude
-        actual_address.latitude = request.actual_address_latitude
-
-        # Update Normal Location
-        # Find Location
-        stmt = select(Location).where(Location.id == resource.normal_location)
-        result = await db.execute(stmt)
-        normal_location = result.scalars().first()
-        if not normal_location:
-            raise HTTPException(
-                status_code=404, detail="normal Location not found"
+        changes = apply_changes(
+            resource,
+            {key: values[key] for key in RESOURCE_FIELDS if key in values},
+        )
+        if changes:
+            await db.execute(
+                update(Resource.__table__)
+                .where(Resource.id == resource_id)
+                .values(**changes)
             )
-        normal_location.longitude = request.normal_longitude
-        normal_location.latitude = request.normal_latitude
-
-        # Update normal Address
-        stmt = select(Address).where(Address.id == resource.normal_address)
-        result = await db.execute(stmt)
-        normal_address = result.scalars().first()
-        if not normal_address:
-            raise HTTPException(
-                status_code=404, detail="normal Location not found"
+
+        # Update Locations and Addresses, by primary key
+        satellite_rows: Dict[type, List[Dict[str, Any]]] = {}
+        for satellite, (name, latitude, longitude) in zip(
+            satellites, RESOURCE_SATELLITES
+        ):
+            coordinates = {
+                column: values[key]
+                for column, key in [
+                    ("latitude", latitude),
+                    ("longitude", longitude),
+                ]
+                if key in values
+            }
+            if not coordinates:
+                continue
+            if satellite is None:
+                raise HTTPException(
+                    status_code=404, detail=f"{name} not found"
+                )
+            changes = apply_changes(satellite, coordinates)
+            if changes:
+                satellite_rows.setdefault(type(satellite), []).append(
+                    {"id": satellite.id, **changes}
+                )
+        for model, rows in satellite_rows.items():
+            await db.execute(update(model), rows)
+
+        snapshot.upsert(resource, actual_location, db)
+        live.publish(
+            "resource", "updated", resource_id, resource.model_dump(), db
+        )
+        if actual_location is not None:
+            live.publish(
+                "location",
+                "updated",
+                actual_location.id,
+                location_delta(actual_location, resource_id),
+                db,
             )
-        normal_address.longitude = request.normal_address_longitude
-        normal_address.latitude = request.normal_address_latitude
 
     return {"message": "Resource Updated", "resource_id": str(resource_id)}
 
@@ -297,56 +428,67 @@ async def update_device(
     "/api/resources/{resource_id}", status_code=200, tags=["Resources"]
 )
 async def delete_device(
-    db: Annotated[AsyncSession, Depends(get_db)], resource_id: uuid_pkg.UUID
+    db: Annotated[AsyncSession, Depends(get_db)],
+    snapshot: Annotated[FleetSnapshot, Depends(get_fleet_snapshot)],
+    live: Annotated[ChangeBroadcaster, Depends(get_broadcaster)],
+    resource_id: uuid_pkg.UUID,
 ):
     """
-    Delete a resource
+    Delete a resource, its assignments and its references from the
+    emergencies, with one statement each
     """
 
     async with db.begin():  # Ensures rollback on failure
-        # Fetch Resource From DB From ID
-        stmt = select(Resource).where(Resource.id == resource_id)
-        result = await db.execute(stmt)
-        resource = result.scalars().first()
-        if not resource:
-            raise HTTPException(status_code=404, detail="Resource not found")
+        # If QOSOD is Active Deactivate it ToDo - IMPORTANT
+        await decommission_resources(db, [resource_id])
 
-        # Delete all instances of value in many to many table:
-        # Remove relationships in the association table (example_other_model_association)
-        stmt = select(EmergencyResourceLink).where(
-            EmergencyResourceLink.resource_id == resource.id
-        )
-        result = await db.execute(stmt)
-        resources_to_emergencies = result.scalars().all()
-        for el in resources_to_emergencies:
-            await db.delete(el)
-            # await db.commit()
-
-        # Unset ALL Emergencies with This Resource
-        result = await db.execute(
-            select(Emergency).filter(Emergency.resource_id == resource.id)
-        )
-        models = result.scalars().all()
+        snapshot.remove(resource_id, db)
+        live.publish("resource", "deleted", resource_id, session=db)
 
-        # Unset (set to None) the ex2_id field for those models
-        for model in models:
-            model.resource_id = None  # Set ex2_id to None
-            # await db.commit()
+    return {"message": "Resource Deleted", "resource_id": resource_id}
 
-        # Unset ALL Emergencies with This Resource
-        result_dest = await db.execute(
-            select(Emergency).filter(Emergency.destination_id == resource.id)
-        )
-        models_dest = result_dest.scalars().all()
 
-        # Unset (set to None) the ex2_id field for those models
-        for model in models_dest:
-            model.destination_id = None  # Set ex2_id to None
-            # await db.commit()
+class ResourcesDecommissionRequest(BaseModel):
+    """Input for the bulk delete resources endpoint"""
 
-        # If QOSOD is Active Deactivate it ToDo - IMPORTANT
+    resources_ids: List[uuid_pkg.UUID] = Field(
+        ..., min_length=1, max_length=settings.RESOURCE_BULK_MAX
+    )
+
+
+class MessageBulkResponse(BaseModel):
+    """
+    Struct for response of endpoints acting on several resources
+    """
+
+    message: str
+    resources_ids: List[str]
+
+
+@router.post(
+    "/api/resources/decommission",
+    response_model=MessageBulkResponse,
+    tags=["Resources"],
+)
+async def decommission_devices(
+    db: Annotated[AsyncSession, Depends(get_db)],
+    snapshot: Annotated[FleetSnapshot, Depends(get_fleet_snapshot)],
+    live: Annotated[ChangeBroadcaster, Depends(get_broadcaster)],
+    request: ResourcesDecommissionRequest,
+) -> MessageBulkResponse:
+    """
+    Delete many resources in one transaction, all or none (404 if one of
+    them is not found)
+    """
+
+    async with db.begin():  # Ensures rollback on failure
+        resources_ids = await decommission_resources(db, request.resources_ids)
 
-        # Delete Resource
-        await db.delete(resource)
+        for resource_id in resources_ids:
+            snapshot.remove(resource_id, db)
+            live.publish("resource", "deleted", resource_id, session=db)
 
-    return {"message": "Resource Deleted", "resource_id": resource.id}
+    return {
+        "message": "Resources Deleted",
+        "resources_ids": [str(x) for x in resources_ids],
+    }
@@ -0,0 +1,116 @@
+"""
+Delta Sync Routes - Only what changed since a watermark
+"""
+
+import uuid as uuid_pkg
+from datetime import datetime, timedelta, timezone
+from typing import Annotated, List, Optional
+
+from fastapi import (
+    APIRouter,
+    Depends,
+)
+from pydantic import BaseModel
+from sqlalchemy import func, or_, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from src.configs.config import settings
+from src.configs.database import get_db
+from src.models.emergency import Emergency
+from src.models.location import Location
+from src.models.resource import Resource
+from src.models.tombstone import Tombstone
+from src.routes.emergencies import EmergencyModelResponse
+from src.services.tombstones import tombstone_horizon
+
+router = APIRouter()
+
+
+class TombstoneModel(BaseModel):
+    """Deleted emergency, resource or location"""
+
+    entity: str
+    entity_id: uuid_pkg.UUID
+    time_deleted: datetime
+
+
+class SyncResponse(BaseModel):
+    """
+    Changes since the requested watermark. With full, the lists hold every
+    row and the client must replace its state with them.
+    """
+
+    watermark: datetime
+    full: bool
+    emergencies: List[EmergencyModelResponse]
+    resources: List[Resource]
+    locations: List[Location]
+    deleted: List[TombstoneModel]
+
+
+def changed_since(model, since: Optional[datetime]):
+    """Select of the rows of model created or updated after since"""
+    stmt = select(model)
+    if since is not None:
+        stmt = stmt.where(
+            or_(model.time_created > since, model.time_updated > since)
+        )
+    return stmt
+
+
+@router.get("/api/sync", response_model=SyncResponse, tags=["Sync"])
+async def sync(
+    session: Annotated[AsyncSession, Depends(get_db)],
+    since: Optional[datetime] = None,
+) -> SyncResponse:
+    """
+    Emergencies, resources and locations created or updated since the
+    watermark, and the deleted ones. Pass the returned watermark as since
+    in the next call. Rows may be sent twice around the watermark, apply
+    them by id.
+    """
+    # Taken before reading, in the past, so nothing committed late is lost.
+    # From the database clock, the one of time_created and time_updated
+    result = await session.execute(select(func.now()))
+    watermark = result.scalar_one()
+    if watermark.tzinfo is None:
+        watermark = watermark.replace(tzinfo=timezone.utc)
+    watermark -= timedelta(seconds=settings.SYNC_SAFETY_MARGIN_SECONDS)
+
+    if since is not None and since.tzinfo is None:
+        since = since.replace(tzinfo=timezone.utc)
+    full = since is None or since < tombstone_horizon()
+    if full:
+        since = None
+    else:
+        since = since.astimezone(timezone.utc)
+
+    emergencies = await session.execute(changed_since(Emergency, since))
+    resources = await session.execute(changed_since(Resource, since))
+    locations = await session.execute(changed_since(Location, since))
+
+    deleted = []
+    if since is not None:
+        tombstones = await session.execute(
+            select(Tombstone).where(Tombstone.time_deleted > since)
+        )
+        deleted = [
+            TombstoneModel(
+                entity=tombstone.entity,
+                entity_id=tombstone.entity_id,
+                time_deleted=tombstone.time_deleted,
+            )
+            for tombstone in tombstones.scalars().all()
+        ]
+
+    return SyncResponse(
+        watermark=watermark,
+        full=full,
+        emergencies=[
+            EmergencyModelResponse(**emergency.__dict__)
+            for emergency in emergencies.scalars().all()
+        ],
+        resources=resources.scalars().all(),
+        locations=locations.scalars().all(),
+        deleted=deleted,
+    )
@@ -0,0 +1,145 @@
+"""
+Telemetry Routes - High-rate GPS position fixes of the resources
+"""
+
+import uuid as uuid_pkg
+from datetime import datetime
+from typing import Annotated, List, Optional, Union
+
+from fastapi import (
+    APIRouter,
+    Body,
+    Depends,
+    HTTPException,
+)
+from pydantic import BaseModel, Field
+
+from src.services.telemetry import (
+    TelemetryFix,
+    TelemetryIngestor,
+    get_telemetry_ingestor,
+)
+
+router = APIRouter()
+
+
+class TelemetryFixModel(BaseModel):
+    """Position fix of a resource"""
+
+    resource_id: uuid_pkg.UUID
+    latitude: float = Field(..., ge=-90, le=90)
+    longitude: float = Field(..., ge=-180, le=180)
+    accuracy: Optional[float] = Field(None, ge=0)
+    speed: Optional[float] = Field(None, ge=0)
+    heading: Optional[float] = Field(None, ge=0, lt=360)
+    # Time the device took the fix, the reception time if not sent
+    timestamp: Optional[datetime] = None
+
+
+class TelemetryAcceptedResponse(BaseModel):
+    """Fixes queued, the ones older than the known position are dropped"""
+
+    received: int
+    accepted: int
+
+
+class TelemetryStatsResponse(BaseModel):
+    """Ingestion metrics of this process"""
+
+    pending: int
+    ingest_lag_seconds: float
+    last_batch_size: int
+    last_history_batch_size: int
+    last_ingest_lag_seconds: float
+    last_fix_age_seconds: float
+    last_flush_seconds: float
+    last_flush_at: Optional[datetime]
+    flush_interval_seconds: float
+    received: int
+    coalesced: int
+    dropped_stale: int
+    dropped_unknown: int
+    dropped_history: int
+    written: int
+    history_written: int
+    flushes: int
+
+
+@router.post(
+    "/api/telemetry",
+    response_model=TelemetryAcceptedResponse,
+    status_code=202,
+    tags=["Telemetry"],
+    responses={503: {"description": "Ingestion queue full, retry later"}},
+)
+async def ingest_telemetry(
+    ingestor: Annotated[TelemetryIngestor, Depends(get_telemetry_ingestor)],
+    fixes: Annotated[
+        Union[
+            TelemetryFixModel,
+            Annotated[List[TelemetryFixModel], Field(max_length=5000)],
+        ],
+        Body(),
+    ],
+):
+    """
+    Queue one position fix or a batch of them. They are written with the
+    next flush, only the latest fix of every resource is kept.
+    """
+    if not isinstance(fixes, list):
+        fixes = [fixes]
+
+    if ingestor.full:
+        raise HTTPException(
+            status_code=503,
+            detail="Telemetry ingestion queue full",
+            headers={
+                "Retry-After": str(max(1, round(ingestor.flush_seconds)))
+            },
+        )
+
+    accepted = ingestor.submit(
+        TelemetryFix(
+            resource_id=fix.resource_id,
+            latitude=fix.latitude,
+            longitude=fix.longitude,
+            accuracy=fix.accuracy,
+            speed=fix.speed,
+            heading=fix.heading,
+            timestamp=fix.timestamp,
+        )
+        for fix in fixes
+    )
+    return {"received": len(fixes), "accepted": accepted}
+
+
+@router.get(
+    "/api/telemetry/stats",
+    response_model=TelemetryStatsResponse,
+    tags=["Telemetry"],
+)
+async def get_telemetry_stats(
+    ingestor: Annotated[TelemetryIngestor, Depends(get_telemetry_ingestor)],
+):
+    """
+    Get the ingestion lag and batch sizes of this process
+    """
+    return TelemetryStatsResponse(
+        pending=ingestor.pending,
+        ingest_lag_seconds=ingestor.ingest_lag_seconds,
+        last_batch_size=ingestor.last_batch_size,
+        last_history_batch_size=ingestor.last_history_batch_size,
+        last_ingest_lag_seconds=ingestor.last_ingest_lag_seconds,
+        last_fix_age_seconds=ingestor.last_fix_age_seconds,
+        last_flush_seconds=ingestor.last_flush_seconds,
+        last_flush_at=ingestor.last_flush_at,
+        flush_interval_seconds=ingestor.flush_seconds,
+        received=ingestor.received,
+        coalesced=ingestor.coalesced,
+        dropped_stale=ingestor.dropped_stale,
+        dropped_unknown=ingestor.dropped_unknown,
+        dropped_history=ingestor.dropped_history,
+        written=ingestor.written,
+        history_written=ingestor.history_written,
+        flushes=ingestor.flushes,
+    )
@@ -0,0 +1,97 @@
+"""
+Set-based assignment of resources to emergencies.
+"""
+
+import uuid as uuid_pkg
+from typing import Dict, List, Tuple
+
+from fastapi import HTTPException
+from sqlalchemy import delete, insert, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from src.models.emergency import Emergency
+from src.models.emergencyresourceslink import EmergencyResourceLink
+from src.models.resource import Resource, ResourceStatusEnum
+
+
+async def assign_resources(
+    session: AsyncSession,
+    assignments: Dict[uuid_pkg.UUID, List[uuid_pkg.UUID]],
+) -> Tuple[List[uuid_pkg.UUID], List[uuid_pkg.UUID]]:
+    """
+    Replaces the resources assigned to each emergency of assignments.
+
+    Previously assigned resources are set AVAILABLE and the new ones BUSY.
+    The number of statements is constant, whatever the number of
+    emergencies or resources. The caller commits the transaction.
+    Returns the ids of the released resources and of the assigned ones.
+    """
+    # Drop duplicated resource ids keeping the order
+    assignments = {
+        emergency_id: list(dict.fromkeys(resources_ids))
+        for emergency_id, resources_ids in assignments.items()
+    }
+    emergencies_ids = list(assignments)
+    resources_ids = list(
+        {resource_id for ids in assignments.values() for resource_id in ids}
+    )
+
+    result = await session.execute(
+        select(Emergency.id).where(Emergency.id.in_(emergencies_ids))
+    )
+    missing_emergencies = set(emergencies_ids) - set(result.scalars().all())
+    if missing_emergencies:
+        raise HTTPException(
+            status_code=404,
+            detail=(
+                "Emergency not found: "
+                + ", ".join(sorted(str(x) for x in missing_emergencies))
+            ),
+        )
+
+    if resources_ids:
+        result = await session.execute(
+            select(Resource.id).where(Resource.id.in_(resources_ids))
+        )
+        missing_resources = set(resources_ids) - set(result.scalars().all())
+        if missing_resources:
+            raise HTTPException(
+                status_code=404,
+                detail=(
+                    "Resource not found: "
+                    + ", ".join(sorted(str(x) for x in missing_resources))
+                ),
+            )
+
+    # Unlink and reset the existing resources to AVAILABLE
+    result = await session.execute(
+        delete(EmergencyResourceLink)
+        .where(EmergencyResourceLink.emergency_id.in_(emergencies_ids))
+        .returning(EmergencyResourceLink.resource_id)
+    )
+    released_ids = list(set(result.scalars().all()))
+    if released_ids:
+        await session.execute(
+            update(Resource)
+            .where(Resource.id.in_(released_ids))
+            .values(status=ResourceStatusEnum.AVAILABLE)
+        )
+
+    if not resources_ids:
+        return released_ids, resources_ids
+
+    await session.execute(
+        update(Resource)
+        .where(Resource.id.in_(resources_ids))
+        .values(status=ResourceStatusEnum.BUSY)
+    )
+    await session.execute(
+        insert(EmergencyResourceLink),
+        [
+            {"emergency_id": emergency_id, "resource_id": resource_id}
+            for emergency_id, ids in assignments.items()
+            for resource_id in ids
+        ],
+    )
+
+    return released_ids, resources_ids
@@ -0,0 +1,210 @@
+"""
+Internal broadcaster of create/update/delete deltas of emergencies,
+resources and locations, fanned out to the live feed clients.
+
+Every event gets a sequence number, and an event id "<epoch>-<seq>" where
+epoch identifies this broadcaster (process). The last LIVE_FEED_BUFFER_SIZE
+events are kept so a client can resume from the last event id it saw. Each
+client has a bounded queue: a client too slow to drain it is disconnected
+(backpressure) and resumes from its last sequence number when it reconnects.
+
+A "resync" event (entity "*") tells the clients to refetch everything: the
+change feed reconnected and changes of other processes may have been
+missed.
+"""
+
+import asyncio
+import json
+import uuid as uuid_pkg
+from collections import deque
+from typing import Any, Deque, Dict, Optional, Set
+
+from fastapi.encoders import jsonable_encoder
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from src.configs.config import settings
+from src.services.transactions import on_commit
+
+# Change feed operations to live feed operations
+ROW_CHANGE_OPS = {
+    "insert": "created",
+    "update": "updated",
+    "delete": "deleted",
+}
+
+
+class ChangeEvent:
+    """Delta of one entity"""
+
+    __slots__ = ("event_id", "seq", "entity", "op", "id", "data")
+
+    def __init__(
+        self,
+        epoch: str,
+        seq: int,
+        entity: str,
+        op: str,
+        entity_id: str,
+        data: Optional[Dict[str, Any]],
+    ):
+        self.event_id = f"{epoch}-{seq}"
+        self.seq = seq
+        self.entity = entity
+        self.op = op
+        self.id = entity_id
+        self.data = data
+
+    def to_json(self) -> str:
+        """JSON payload of the event"""
+        return json.dumps(
+            {
+                "event_id": self.event_id,
+                "seq": self.seq,
+                "entity": self.entity,
+                "op": self.op,
+                "id": self.id,
+                "data": self.data,
+            }
+        )
+
+
+class Subscription:
+    """A live feed client: its bounded queue of pending events"""
+
+    def __init__(self, queue_size: int):
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=queue_size)
+        self.overflowed = False
+        # Set when the client must refetch everything: the event it resumes
+        # from is older than the buffered ones or from another process
+        self.reset = False
+
+    def push(self, event: ChangeEvent) -> bool:
+        """Queues event, False if the client is too slow to keep up"""
+        try:
+            self.queue.put_nowait(event)
+        except asyncio.QueueFull:
+            self.overflowed = True
+            return False
+        return True
+
+    async def get(self) -> Optional[ChangeEvent]:
+        """Next event, None once the subscription overflowed"""
+        if self.overflowed and self.queue.empty():
+            return None
+        return await self.queue.get()
+
+
+class ChangeBroadcaster:
+    """Single fan-out point of the changes to the live feed clients"""
+
+    def __init__(
+        self,
+        buffer_size: int = settings.LIVE_FEED_BUFFER_SIZE,
+        queue_size: int = settings.LIVE_FEED_QUEUE_SIZE,
+    ):
+        self.epoch = uuid_pkg.uuid4().hex[:8]
+        self.seq = 0
+        self.queue_size = queue_size
+        self._buffer: Deque[ChangeEvent] = deque(maxlen=buffer_size)
+        self._subscriptions: Set[Subscription] = set()
+
+    @property
+    def clients(self) -> int:
+        """Number of connected clients"""
+        return len(self._subscriptions)
+
+    def publish(
+        self,
+        entity: str,
+        op: str,
+        entity_id: Any,
+        data: Any = None,
+        session: Optional[AsyncSession] = None,
+    ) -> None:
+        """
+        Publishes a delta once the transaction of session commits. data is
+        encoded right away, ORM objects are expired after the commit.
+        """
+        entity_id = str(entity_id)
+        data = jsonable_encoder(data) if data is not None else None
+        on_commit(session, lambda: self._publish(entity, op, entity_id, data))
+
+    def _publish(
+        self,
+        entity: str,
+        op: str,
+        entity_id: str,
+        data: Optional[Dict[str, Any]],
+    ) -> None:
+        self.seq += 1
+        event = ChangeEvent(self.epoch, self.seq, entity, op, entity_id, data)
+        self._buffer.append(event)
+        for subscription in list(self._subscriptions):
+            if not subscription.push(event):
+                self._subscriptions.discard(subscription)
+
+    def _last_seq(self, last_event_id: str) -> Optional[int]:
+        """Sequence number of one of our event ids, None if not ours"""
+        epoch, _, seq = last_event_id.partition("-")
+        if epoch != self.epoch or not seq.isdigit() or int(seq) > self.seq:
+            return None
+        return int(seq)
+
+    def subscribe(self, last_event_id: Optional[str] = None) -> Subscription:
+        """
+        New client. With last_event_id the buffered events after it are
+        replayed first.
+        """
+        subscription = Subscription(self.queue_size)
+        if last_event_id:
+            last_seq = self._last_seq(last_event_id)
+            oldest = self._buffer[0].seq if self._buffer else self.seq + 1
+            if last_seq is None or last_seq + 1 < oldest:
+                subscription.reset = True
+            else:
+                for event in self._buffer:
+                    if event.seq > last_seq and not subscription.push(event):
+                        break
+        if not subscription.overflowed:
+            self._subscriptions.add(subscription)
+        return subscription
+
+    def publish_row_change(self, change) -> None:
+        """
+        Change feed subscriber: relays the changes written by other
+        processes. Their data is not notified, clients refetch the entity,
+        or everything on a resync.
+        """
+        if change.op in ROW_CHANGE_OPS:
+            self._publish(
+                change.table, ROW_CHANGE_OPS[change.op], change.id, None
+            )
+        elif change.op == "resync":
+            self._publish("*", "resync", "", None)
+
+    def unsubscribe(self, subscription: Subscription) -> None:
+        """Client gone"""
+        self._subscriptions.discard(subscription)
+
+
+broadcaster = ChangeBroadcaster()
+
+
+def get_broadcaster() -> ChangeBroadcaster:
+    """Get the process change broadcaster"""
+    return broadcaster
+
+
+def location_delta(
+    location: Any, resource_id: Optional[uuid_pkg.UUID] = None
+) -> Dict[str, Any]:
+    """Delta data of a location, with the resource it belongs to"""
+    return {
+        "id": location.id,
+        "resource_id": resource_id,
+        "latitude": location.latitude,
+        "longitude": location.longitude,
+        "accuracy": location.accuracy,
+        "speed": location.speed,
+        "heading": location.heading,
+    }
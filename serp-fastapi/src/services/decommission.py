@@ -0,0 +1,74 @@
+"""
+Deletion of resources with set-based statements.
+
+A resource is referenced by its assignments (EmergencyResourceLink) and by
+the emergencies it attends or is the destination of. They are removed and
+unset with one statement each, whatever the history of the resources, so
+the transaction holds its locks for a time that does not grow with it.
+
+The emergencies are unset by an UPDATE rather than by ON DELETE SET NULL,
+so their time_updated changes and the delta sync reports them.
+"""
+
+import uuid as uuid_pkg
+from typing import List
+
+from fastapi import HTTPException
+from sqlalchemy import delete, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from src.models.emergency import Emergency
+from src.models.emergencyresourceslink import EmergencyResourceLink
+from src.models.resource import Resource
+from src.services.tombstones import add_tombstones
+
+
+async def decommission_resources(
+    session: AsyncSession, resources_ids: List[uuid_pkg.UUID]
+) -> List[uuid_pkg.UUID]:
+    """
+    Deletes resources, their assignments and their references from the
+    emergencies, in the transaction of session. Returns the deleted ids.
+
+    Raises HTTPException 404 (and deletes nothing) if a resource is not
+    found.
+    """
+    resources_ids = list(dict.fromkeys(resources_ids))
+    result = await session.execute(
+        select(Resource.id).where(Resource.id.in_(resources_ids))
+    )
+    missing_resources = set(resources_ids) - set(result.scalars().all())
+    if missing_resources:
+        raise HTTPException(
+            status_code=404,
+            detail=(
+                "Resource not found: "
+                + ", ".join(sorted(str(x) for x in missing_resources))
+            ),
+        )
+
+    await session.execute(
+        delete(EmergencyResourceLink).where(
+            EmergencyResourceLink.resource_id.in_(resources_ids)
+        )
+    )
+    await session.execute(
+        update(Emergency)
+        .where(Emergency.resource_id.in_(resources_ids))
+        .values(resource_id=None)
+        .execution_options(synchronize_session=False)
+    )
+    await session.execute(
+        update(Emergency)
+        .where(Emergency.destination_id.in_(resources_ids))
+        .values(destination_id=None)
+        .execution_options(synchronize_session=False)
+    )
+    await session.execute(
+        delete(Resource)
+        .where(Resource.id.in_(resources_ids))
+        .execution_options(synchronize_session=False)
+    )
+    await add_tombstones(session, "resource", resources_ids)
+
+    return resources_ids
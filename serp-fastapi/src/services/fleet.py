@@ -0,0 +1,355 @@
+"""
+Process-local, in-memory snapshot of the fleet (resources and their actual
+location) to serve the dashboard polling reads without hitting the database.
+
+Staleness bound: writes made through this process are applied to the
+snapshot right after they commit. Writes made by other processes are picked
+up by the incremental refresh, so they are visible after at most
+FLEET_REFRESH_SECONDS (plus the refresh query time), or much sooner when
+the change feed notifies them.
+"""
+
+import asyncio
+import uuid as uuid_pkg
+from datetime import datetime, timedelta, timezone
+from typing import Dict, Iterable, List, Optional
+
+from sqlalchemy import or_, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from src.configs.config import settings
+from src.models.location import Location
+from src.models.resource import Resource, ResourceStatusEnum
+from src.services.transactions import on_commit
+
+
+class FleetRecord:
+    """Compact record of a resource and its actual location"""
+
+    __slots__ = (
+        "id",
+        "resource_type",
+        "status",
+        "location_id",
+        "latitude",
+        "longitude",
+        "accuracy",
+        "speed",
+        "heading",
+        "location_time_created",
+        "location_time_updated",
+        "version",
+    )
+
+    def __init__(self, resource_id: uuid_pkg.UUID, version: int):
+        self.id = resource_id
+        self.resource_type = None
+        self.status = None
+        self.location_id = None
+        self.latitude = None
+        self.longitude = None
+        self.accuracy = None
+        self.speed = None
+        self.heading = None
+        self.location_time_created = None
+        self.location_time_updated = None
+        self.version = version
+
+    def values(self) -> tuple:
+        """The resource and location values of the record"""
+        return (
+            self.resource_type,
+            self.status,
+            self.location_id,
+            self.latitude,
+            self.longitude,
+            self.accuracy,
+            self.speed,
+            self.heading,
+            self.location_time_created,
+            self.location_time_updated,
+        )
+
+    def to_location(self) -> Optional[Location]:
+        """
+        The actual location of the resource as a Location model, None if
+        the snapshot does not hold it complete (not yet read back from DB)
+        """
+        if self.location_id is None or self.location_time_created is None:
+            return None
+        return Location(
+            id=self.location_id,
+            latitude=self.latitude,
+            longitude=self.longitude,
+            accuracy=self.accuracy,
+            speed=self.speed,
+            heading=self.heading,
+            time_created=self.location_time_created,
+            time_updated=self.location_time_updated,
+        )
+
+
+def _location_values(location: Optional[Location]) -> tuple:
+    """Values of a location in the order of the FleetRecord slots"""
+    if location is None:
+        return (None,) * 8
+    return (
+        location.id,
+        location.latitude,
+        location.longitude,
+        location.accuracy,
+        location.speed,
+        location.heading,
+        location.time_created,
+        location.time_updated,
+    )
+
+
+def _as_utc(value: Optional[datetime]) -> Optional[datetime]:
+    """Naive datetimes (SQLite) are taken as UTC to compare them"""
+    if value is not None and value.tzinfo is None:
+        return value.replace(tzinfo=timezone.utc)
+    return value
+
+
+class FleetSnapshot:
+    """
+    In-memory fleet snapshot. Every change bumps version, which clients can
+    use as an ETag. Records are kept in a dict keyed by resource id.
+    """
+
+    def __init__(
+        self, refresh_seconds: float = settings.FLEET_REFRESH_SECONDS
+    ):
+        self.instance = uuid_pkg.uuid4().hex[:8]
+        self.refresh_seconds = refresh_seconds
+        self.version = 0
+        self.loaded = False
+        # Set by the change feed when another process changed the fleet
+        self.stale = False
+        self.refreshed_at: Optional[datetime] = None
+        self._records: Dict[uuid_pkg.UUID, FleetRecord] = {}
+        self._watermark: Optional[datetime] = None
+        self._lock = asyncio.Lock()
+
+    @property
+    def etag(self) -> str:
+        """ETag of the current snapshot version"""
+        return f'"{self.instance}-{self.version}"'
+
+    def records(self) -> List[FleetRecord]:
+        """All records of the snapshot"""
+        return list(self._records.values())
+
+    def get(self, resource_id: uuid_pkg.UUID) -> Optional[FleetRecord]:
+        """Record of a resource, None if it is not in the snapshot"""
+        return self._records.get(resource_id)
+
+    def _record(self, resource_id: uuid_pkg.UUID) -> FleetRecord:
+        self.version += 1
+        record = self._records.get(resource_id)
+        if record is None:
+            record = FleetRecord(resource_id, self.version)
+            self._records[resource_id] = record
+        record.version = self.version
+        return record
+
+    def upsert(
+        self,
+        resource: Resource,
+        location: Optional[Location],
+        session: Optional[AsyncSession] = None,
+    ) -> None:
+        """Applies a created or updated resource to the snapshot"""
+        resource_id = resource.id
+        values = (
+            resource.resource_type,
+            resource.status,
+            *_location_values(location),
+        )
+
+        def change():
+            record = self._record(resource_id)
+            (
+                record.resource_type,
+                record.status,
+                record.location_id,
+                record.latitude,
+                record.longitude,
+                record.accuracy,
+                record.speed,
+                record.heading,
+                record.location_time_created,
+                record.location_time_updated,
+            ) = values
+
+        on_commit(session, change)
+
+    def set_status(
+        self,
+        resources_ids: Iterable[uuid_pkg.UUID],
+        status: ResourceStatusEnum,
+        session: Optional[AsyncSession] = None,
+    ) -> None:
+        """Applies a status change of several resources to the snapshot"""
+        resources_ids = list(resources_ids)
+
+        def change():
+            for resource_id in resources_ids:
+                if resource_id in self._records:
+                    self._record(resource_id).status = status
+
+        on_commit(session, change)
+
+    def set_location(
+        self,
+        resource_id: uuid_pkg.UUID,
+        location: Location,
+        session: Optional[AsyncSession] = None,
+    ) -> None:
+        """Applies a new actual location of a resource to the snapshot"""
+        values = _location_values(location)
+
+        def change():
+            if resource_id in self._records:
+                record = self._record(resource_id)
+                (
+                    record.location_id,
+                    record.latitude,
+                    record.longitude,
+                    record.accuracy,
+                    record.speed,
+                    record.heading,
+                    record.location_time_created,
+                    record.location_time_updated,
+                ) = values
+
+        on_commit(session, change)
+
+    def remove(
+        self,
+        resource_id: uuid_pkg.UUID,
+        session: Optional[AsyncSession] = None,
+    ) -> None:
+        """Removes a deleted resource from the snapshot"""
+
+        def change():
+            if self._records.pop(resource_id, None) is not None:
+                self.version += 1
+
+        on_commit(session, change)
+
+    def handle_row_change(self, change) -> None:
+        """
+        Change feed subscriber: a resource or location changed in another
+        process, the next refresh_if_stale re-reads it
+        """
+        if change.table in ("resource", "location", "*"):
+            self.stale = True
+
+    @staticmethod
+    def _rows_stmt():
+        return select(
+            Resource.id,
+            Resource.resource_type,
+            Resource.status,
+            Resource.time_created,
+            Resource.time_updated,
+            Location.id,
+            Location.latitude,
+            Location.longitude,
+            Location.accuracy,
+            Location.speed,
+            Location.heading,
+            Location.time_created,
+            Location.time_updated,
+        ).outerjoin(Location, Location.id == Resource.actual_location)
+
+    def _apply_rows(self, rows) -> None:
+        for row in rows:
+            values = (row[1], row[2], *row[5:13])
+            record = self._records.get(row[0])
+            # Only changed rows bump the version
+            if record is None or record.values() != values:
+                record = self._record(row[0])
+                (
+                    record.resource_type,
+                    record.status,
+                    record.location_id,
+                    record.latitude,
+                    record.longitude,
+                    record.accuracy,
+                    record.speed,
+                    record.heading,
+                    record.location_time_created,
+                    record.location_time_updated,
+                ) = values
+            for value in (row[3], row[4], row[11], row[12]):
+                value = _as_utc(value)
+                if value is not None and (
+                    self._watermark is None or value > self._watermark
+                ):
+                    self._watermark = value
+
+    async def load(self, session: AsyncSession) -> None:
+        """Builds the whole snapshot from the database"""
+        async with self._lock:
+            result = await session.execute(self._rows_stmt())
+            self._records = {}
+            self._watermark = None
+            self._apply_rows(result.all())
+            self.loaded = True
+            self.refreshed_at = datetime.now(timezone.utc)
+
+    async def ensure_loaded(self, session: AsyncSession) -> None:
+        """Loads the snapshot on first use"""
+        if not self.loaded:
+            await self.load(session)
+
+    async def refresh(self, session: AsyncSession) -> None:
+        """
+        Incremental refresh: re-reads the resources or locations changed
+        since the watermark and drops the resources deleted elsewhere
+        """
+        self.stale = False
+        if not self.loaded:
+            await self.load(session)
+            return
+
+        async with self._lock:
+            # Re-read a margin before the watermark, so rows of transactions
+            # that committed after their timestamp was taken are not missed
+            stmt = self._rows_stmt()
+            if self._watermark is not None:
+                since = self._watermark - timedelta(
+                    seconds=self.refresh_seconds
+                )
+                stmt = stmt.where(
+                    or_(
+                        Resource.time_created > since,
+                        Resource.time_updated > since,
+                        Location.time_updated > since,
+                    )
+                )
+            result = await session.execute(stmt)
+            self._apply_rows(result.all())
+
+            result = await session.execute(select(Resource.id))
+            existing_ids = set(result.scalars().all())
+            for resource_id in set(self._records) - existing_ids:
+                self.remove(resource_id)
+
+            self.refreshed_at = datetime.now(timezone.utc)
+
+    async def refresh_if_stale(self, session: AsyncSession) -> None:
+        """Refreshes only if the change feed notified changes"""
+        if self.stale:
+            await self.refresh(session)
+
+
+fleet_snapshot = FleetSnapshot()
+
+
+def get_fleet_snapshot() -> FleetSnapshot:
+    """Get the process fleet snapshot"""
+    return fleet_snapshot
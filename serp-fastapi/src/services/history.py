@@ -0,0 +1,174 @@
+"""
+Position history of the resources: daily partitions, retention and the
+downsampled tracks.
+
+On PostgreSQL location_history is range partitioned by recorded_at, one
+partition per UTC day. Partitions are created LOCATION_HISTORY_DAYS_AHEAD
+days in advance, and the ones past LOCATION_HISTORY_RETENTION_DAYS are
+dropped whole instead of deleting rows. The live Location rows and their
+indexes are not touched by the history.
+"""
+
+import uuid as uuid_pkg
+from datetime import date, datetime, time, timedelta, timezone
+from typing import Iterable, List, Tuple
+
+from sqlalchemy import func, literal, select, text
+from sqlalchemy.dialects.postgresql import insert as postgresql_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from src.configs.config import settings
+from src.models.location_history import LocationHistory
+
+PARTITION_PREFIX = "location_history_p"
+
+# Fixes further from now than this are not recorded, their partition may
+# not exist
+MAX_CLOCK_SKEW = timedelta(days=1)
+
+# Key of the advisory lock serializing the partition maintenance
+MAINTENANCE_LOCK_KEY = 7311043
+
+
+def history_horizon() -> datetime:
+    """Oldest position kept by the history"""
+    return datetime.now(timezone.utc) - timedelta(
+        days=settings.LOCATION_HISTORY_RETENTION_DAYS
+    )
+
+
+def partition_name(day: date) -> str:
+    """Name of the partition of a day"""
+    return f"{PARTITION_PREFIX}{day:%Y%m%d}"
+
+
+def _day_start(day: date) -> datetime:
+    return datetime.combine(day, time.min, tzinfo=timezone.utc)
+
+
+async def maintain_history(session: AsyncSession) -> None:
+    """
+    Creates the partitions of yesterday to LOCATION_HISTORY_DAYS_AHEAD days
+    ahead and drops the expired ones. Other dialects (the SQLite tests)
+    delete the expired rows.
+    """
+    horizon = history_horizon()
+    if session.bind.dialect.name != "postgresql":
+        await session.execute(
+            LocationHistory.__table__.delete().where(
+                LocationHistory.recorded_at < horizon
+            )
+        )
+        await session.commit()
+        return
+
+    # Several workers run the maintenance at startup
+    await session.execute(
+        select(func.pg_advisory_xact_lock(MAINTENANCE_LOCK_KEY))
+    )
+
+    today = datetime.now(timezone.utc).date()
+    for offset in range(-1, settings.LOCATION_HISTORY_DAYS_AHEAD + 1):
+        day = today + timedelta(days=offset)
+        await session.execute(
+            text(
+                f"CREATE TABLE IF NOT EXISTS {partition_name(day)} "
+                f"PARTITION OF {LocationHistory.__tablename__} "
+                f"FOR VALUES FROM ('{_day_start(day).isoformat()}') "
+                f"TO ('{_day_start(day + timedelta(days=1)).isoformat()}')"
+            )
+        )
+
+    result = await session.execute(
+        text(
+            "SELECT child.relname FROM pg_inherits "
+            "JOIN pg_class parent ON parent.oid = pg_inherits.inhparent "
+            "JOIN pg_class child ON child.oid = pg_inherits.inhrelid "
+            "WHERE parent.relname = :parent"
+        ),
+        {"parent": LocationHistory.__tablename__},
+    )
+    for (name,) in result.all():
+        try:
+            day = datetime.strptime(
+                name.removeprefix(PARTITION_PREFIX), "%Y%m%d"
+            ).date()
+        except ValueError:
+            continue
+        if _day_start(day + timedelta(days=1)) <= horizon:
+            await session.execute(text(f"DROP TABLE IF EXISTS {name}"))
+
+    await session.commit()
+
+
+async def add_history(session: AsyncSession, rows: Iterable[dict]) -> None:
+    """
+    Appends positions to the history, in the transaction of session. rows
+    hold the LocationHistory columns. A position already recorded for the
+    same resource and time is skipped.
+    """
+    rows = list(rows)
+    if not rows:
+        return
+    if session.bind.dialect.name == "postgresql":
+        insert = postgresql_insert
+    else:
+        insert = sqlite_insert
+    await session.execute(
+        insert(LocationHistory).on_conflict_do_nothing(), rows
+    )
+
+
+async def resource_track(
+    session: AsyncSession,
+    resource_id: uuid_pkg.UUID,
+    start: datetime,
+    end: datetime,
+    max_points: int,
+) -> Tuple[float, List[LocationHistory]]:
+    """
+    Positions of a resource between start (included) and end (excluded),
+    downsampled to at most max_points: the window is cut in max_points
+    buckets and the first position of every bucket is kept. Returns the
+    bucket length in seconds and the positions, oldest first.
+
+    On PostgreSQL the downsampling is a DISTINCT ON over the buckets, only
+    the partitions of the window are scanned. Other dialects (the SQLite
+    tests) downsample in Python.
+    """
+    bucket_seconds = (end - start).total_seconds() / max_points
+    stmt = (
+        select(LocationHistory)
+        .where(LocationHistory.resource_id == resource_id)
+        .where(LocationHistory.recorded_at >= start)
+        .where(LocationHistory.recorded_at < end)
+    )
+
+    if session.bind.dialect.name == "postgresql":
+        bucket = func.floor(
+            (
+                func.extract("epoch", LocationHistory.recorded_at)
+                - literal(start.timestamp())
+            )
+            / literal(bucket_seconds)
+        )
+        stmt = stmt.distinct(bucket).order_by(
+            bucket, LocationHistory.recorded_at
+        )
+        result = await session.execute(stmt)
+        return bucket_seconds, list(result.scalars().all())
+
+    stmt = stmt.order_by(LocationHistory.recorded_at)
+    result = await session.stream(stmt.execution_options(yield_per=500))
+    points = []
+    last_bucket = None
+    async for position in result.scalars():
+        recorded_at = position.recorded_at
+        if recorded_at.tzinfo is None:
+            recorded_at = recorded_at.replace(tzinfo=timezone.utc)
+        bucket = (recorded_at - start).total_seconds() // bucket_seconds
+        if bucket != last_bucket:
+            points.append(position)
+            last_bucket = bucket
+    return bucket_seconds, points
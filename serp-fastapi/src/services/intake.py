@@ -0,0 +1,119 @@
+"""
+Creation of emergencies and resources with their locations and addresses.
+
+Ids are generated by the application (uuid4 defaults of the models), so the
+rows referencing a location or an address are built before anything is
+written: there is no flush to learn an id. On PostgreSQL all the rows are
+written by one statement, the parent tables inserted by data-modifying CTEs
+of the insert of the last table. Other dialects run one multi-row insert per
+table. Either way the number of round-trips does not grow with the number of
+rows, callers split the rows in batches of INTAKE_BATCH_SIZE entities to
+stay under the bind parameters limit.
+
+The columns the database fills (server defaults, time_created) of the last
+table, the entities themselves, are read back by RETURNING, so the rows
+published as created carry them.
+"""
+
+from typing import Any, Dict, List, Sequence
+
+from sqlalchemy import Insert, Result, cast, insert, select, values
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlmodel import SQLModel
+
+
+def row_values(instance: SQLModel) -> Dict[str, Any]:
+    """
+    Column values of a new row, leaving out the unset columns with a server
+    default (time_created) so the database fills them
+    """
+    return {
+        column.name: getattr(instance, column.name)
+        for column in instance.__table__.columns
+        if column.server_default is None
+        or getattr(instance, column.name) is not None
+    }
+
+
+def _insert_from_values(rows: List[SQLModel]) -> Insert:
+    """
+    INSERT ... SELECT FROM (VALUES ...) of rows of one table: unlike a
+    multi-row VALUES insert, its bind parameters have unique names, so it
+    can be used as a CTE next to the inserts of other tables.
+
+    PostgreSQL types a VALUES column of NULLs only as text, so every column
+    is cast back to the type of the table column it is inserted into.
+    """
+    table = rows[0].__table__
+    data = [row_values(row) for row in rows]
+    names = list(data[0])
+    rows_values = values(
+        *[table.c[name]._copy() for name in names],
+        name=f"{table.name}_values",
+    ).data([tuple(row[name] for name in names) for row in data])
+    return insert(table).from_select(
+        names,
+        select(
+            *[cast(rows_values.c[name], table.c[name].type) for name in names]
+        ),
+    )
+
+
+def _returning_server_filled(stmt: Insert, rows: List[SQLModel]) -> Insert:
+    """Adds RETURNING of the id and the server default columns of rows"""
+    table = rows[0].__table__
+    return stmt.returning(
+        table.c.id,
+        *[column for column in table.columns if column.server_default],
+    )
+
+
+def _set_server_filled(result: Result, rows: List[SQLModel]) -> None:
+    """Sets the columns returned by the database on the instances"""
+    by_id = {row.id: row for row in rows}
+    for returned in result.mappings().all():
+        row = by_id[returned["id"]]
+        for name, value in returned.items():
+            setattr(row, name, value)
+
+
+async def insert_rows(
+    session: AsyncSession, *groups: Sequence[SQLModel]
+) -> None:
+    """
+    Inserts new rows, one group of instances of the same model per table,
+    parents (referenced tables) first. The instances of the last group get
+    the values of their server default columns
+    """
+    groups = [list(group) for group in groups if group]
+    if not groups:
+        return
+
+    if session.bind.dialect.name != "postgresql":
+        for group in groups[:-1]:
+            await session.execute(
+                insert(group[0].__table__).values(
+                    [row_values(row) for row in group]
+                )
+            )
+        stmt = insert(groups[-1][0].__table__).values(
+            [row_values(row) for row in groups[-1]]
+        )
+        result = await session.execute(
+            _returning_server_filled(stmt, groups[-1])
+        )
+        _set_server_filled(result, groups[-1])
+        return
+
+    stmt = _returning_server_filled(
+        _insert_from_values(groups[-1]), groups[-1]
+    )
+    for group in groups[:-1]:
+        table = group[0].__table__
+        stmt = stmt.add_cte(
+            _insert_from_values(group)
+            .returning(table.c.id)
+            .cte(f"new_{table.name}")
+        )
+    result = await session.execute(stmt)
+    _set_server_filled(result, groups[-1])
@@ -0,0 +1,34 @@
+"""
+Helpers for keyset (cursor) pagination.
+"""
+
+import base64
+import binascii
+import uuid as uuid_pkg
+from datetime import datetime
+from typing import Tuple
+
+from fastapi import HTTPException
+
+
+def encode_cursor(time_created: datetime, row_id: uuid_pkg.UUID) -> str:
+    """
+    Encodes the (time_created, id) key of the last row of a page
+    as an opaque url-safe cursor
+    """
+    raw = f"{time_created.isoformat()}|{row_id}"
+    return base64.urlsafe_b64encode(raw.encode()).decode()
+
+
+def decode_cursor(cursor: str) -> Tuple[datetime, uuid_pkg.UUID]:
+    """
+    Decodes a cursor created by encode_cursor
+    """
+    try:
+        raw = base64.urlsafe_b64decode(cursor.encode()).decode()
+        time_created, row_id = raw.split("|", 1)
+        return datetime.fromisoformat(time_created), uuid_pkg.UUID(row_id)
+    except (ValueError, binascii.Error, UnicodeDecodeError) as exc:
+        raise HTTPException(
+            status_code=400, detail="Invalid cursor format"
+        ) from exc
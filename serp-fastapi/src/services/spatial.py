@@ -0,0 +1,87 @@
+"""
+Nearest resources (KNN) queries over the resources actual location.
+"""
+
+import math
+from typing import List, Optional, Tuple
+
+from sqlalchemy import func, literal, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from src.models.location import Location
+from src.models.resource import Resource, ResourceStatusEnum, ResourceTypeEnum
+
+# Same earth radius as the earthdistance extension, in meters
+EARTH_RADIUS_M = 6378168.0
+
+
+def haversine_distance(
+    latitude_a: float,
+    longitude_a: float,
+    latitude_b: float,
+    longitude_b: float,
+) -> float:
+    """
+    Great circle distance in meters between two points
+    """
+    phi_a = math.radians(latitude_a)
+    phi_b = math.radians(latitude_b)
+    delta_phi = phi_b - phi_a
+    delta_lambda = math.radians(longitude_b - longitude_a)
+    a = (
+        math.sin(delta_phi / 2) ** 2
+        + math.cos(phi_a) * math.cos(phi_b) * math.sin(delta_lambda / 2) ** 2
+    )
+    return 2 * EARTH_RADIUS_M * math.asin(min(1.0, math.sqrt(a)))
+
+
+async def nearest_available_resources(
+    session: AsyncSession,
+    latitude: float,
+    longitude: float,
+    resource_type: Optional[ResourceTypeEnum] = None,
+    k: int = 5,
+) -> List[Tuple[Resource, Location, float]]:
+    """
+    Returns the k AVAILABLE resources closest to (latitude, longitude) as
+    (resource, location, distance in meters), closest first.
+
+    On PostgreSQL the ordering is a KNN scan of the ix_location_earth GiST
+    index. Other dialects (the SQLite tests) sort the candidates in Python.
+    """
+    stmt = (
+        select(Resource, Location)
+        .join(Location, Location.id == Resource.actual_location)
+        .where(Resource.status == ResourceStatusEnum.AVAILABLE)
+        .where(Location.latitude.is_not(None))
+        .where(Location.longitude.is_not(None))
+    )
+    if resource_type is not None:
+        stmt = stmt.where(Resource.resource_type == resource_type)
+
+    if session.bind.dialect.name == "postgresql":
+        resource_point = func.ll_to_earth(
+            Location.latitude, Location.longitude
+        )
+        target_point = func.ll_to_earth(literal(latitude), literal(longitude))
+        stmt = (
+            stmt.add_columns(func.earth_distance(resource_point, target_point))
+            .order_by(resource_point.op("<->")(target_point))
+            .limit(k)
+        )
+        result = await session.execute(stmt)
+        return [tuple(row) for row in result.all()]
+
+    result = await session.execute(stmt)
+    candidates = [
+        (
+            resource,
+            location,
+            haversine_distance(
+                latitude, longitude, location.latitude, location.longitude
+            ),
+        )
+        for resource, location in result.all()
+    ]
+    candidates.sort(key=lambda candidate: candidate[2])
+    return candidates[:k]
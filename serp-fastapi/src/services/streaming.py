@@ -0,0 +1,71 @@
+"""
+Helpers to stream query results as NDJSON or as a chunked JSON array.
+"""
+
+from typing import AsyncIterator, Callable, Literal
+
+from fastapi.responses import StreamingResponse
+from pydantic import BaseModel
+from sqlalchemy import Select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+# Rows fetched from the DB cursor per round-trip
+STREAM_BATCH_SIZE = 500
+
+ExportFormat = Literal["ndjson", "json"]
+
+MEDIA_TYPES = {
+    "ndjson": "application/x-ndjson",
+    "json": "application/json",
+}
+
+
+async def stream_rows(
+    session: AsyncSession,
+    stmt: Select,
+    to_model: Callable[..., BaseModel],
+    export_format: ExportFormat = "ndjson",
+) -> AsyncIterator[str]:
+    """
+    Reads the rows of stmt from a server side cursor in batches and yields
+    them serialized one by one, so memory stays flat with the table size
+    """
+    result = await session.stream(
+        stmt.execution_options(yield_per=STREAM_BATCH_SIZE)
+    )
+    try:
+        if export_format == "json":
+            yield "["
+        first = True
+        async for partition in result.partitions():
+            chunk = []
+            for row in partition:
+                item = to_model(*row).model_dump_json()
+                if export_format == "json":
+                    chunk.append(item if first else "," + item)
+                else:
+                    chunk.append(item + "\n")
+                first = False
+            yield "".join(chunk)
+        if export_format == "json":
+            yield "]"
+    finally:
+        await result.close()
+        # The request dependency may already be torn down once the
+        # response starts, so release the connection here explicitly
+        await session.close()
+
+
+def streaming_rows_response(
+    session: AsyncSession,
+    stmt: Select,
+    to_model: Callable[..., BaseModel],
+    export_format: ExportFormat = "ndjson",
+) -> StreamingResponse:
+    """
+    Wraps stream_rows in a StreamingResponse with the right media type
+    """
+    return StreamingResponse(
+        stream_rows(session, stmt, to_model, export_format),
+        media_type=MEDIA_TYPES[export_format],
+    )
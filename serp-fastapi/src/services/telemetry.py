@@ -0,0 +1,392 @@
+"""
+High-rate GPS telemetry ingestion.
+
+Position fixes are not written as they arrive: they are coalesced in memory,
+keeping only the latest fix of every resource, and flushed every
+TELEMETRY_FLUSH_SECONDS with one multi-row upsert of the actual locations
+per TELEMETRY_FLUSH_BATCH_SIZE resources. A resource reporting every 2
+seconds costs one row write per flush, whatever the number of fixes.
+
+Every fix, not only the latest, is also appended to the location history
+(src.services.history) by the same flush, with one multi-row insert. The
+history is written in a savepoint: if it fails (a day partition missing
+because the maintenance did not run) the history batch is dropped and
+counted, the actual locations are still written.
+
+Pending fixes only live in this process memory, a crash loses at most the
+last flush interval of positions.
+"""
+
+import asyncio
+import logging
+import time
+import uuid as uuid_pkg
+from datetime import datetime, timezone
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy import bindparam, func, select, update
+from sqlalchemy.dialects.postgresql import insert as postgresql_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.exc import DBAPIError
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from src.configs.config import settings
+from src.models.location import Location
+from src.models.resource import Resource
+from src.services.broadcaster import ChangeBroadcaster, location_delta
+from src.services.fleet import FleetSnapshot
+from src.services.history import MAX_CLOCK_SKEW, add_history
+
+logger = logging.getLogger(__name__)
+
+
+class TelemetryFix:
+    """Position fix of a resource"""
+
+    __slots__ = (
+        "resource_id",
+        "latitude",
+        "longitude",
+        "accuracy",
+        "speed",
+        "heading",
+        "timestamp",
+        "received",
+    )
+
+    def __init__(
+        self,
+        resource_id: uuid_pkg.UUID,
+        latitude: float,
+        longitude: float,
+        accuracy: Optional[float] = None,
+        speed: Optional[float] = None,
+        heading: Optional[float] = None,
+        timestamp: Optional[datetime] = None,
+    ):
+        self.resource_id = resource_id
+        self.latitude = latitude
+        self.longitude = longitude
+        self.accuracy = accuracy
+        self.speed = speed
+        self.heading = heading
+        # Time the device took the fix
+        self.timestamp = timestamp
+        # Monotonic time the fix was received, for the ingest lag
+        self.received = 0.0
+
+
+def _upsert_locations(dialect: str, rows: List[dict]):
+    """
+    Multi-row INSERT ... ON CONFLICT (id) DO UPDATE of the actual locations
+    """
+    insert = postgresql_insert if dialect == "postgresql" else sqlite_insert
+    stmt = insert(Location).values(rows)
+    return stmt.on_conflict_do_update(
+        index_elements=[Location.id],
+        set_={
+            "latitude": stmt.excluded.latitude,
+            "longitude": stmt.excluded.longitude,
+            "accuracy": stmt.excluded.accuracy,
+            "speed": stmt.excluded.speed,
+            "heading": stmt.excluded.heading,
+            "time_updated": func.now(),
+        },
+    ).returning(*Location.__table__.c)
+
+
+class TelemetryIngestor:
+    """Coalesces the fixes per resource and writes them in batches"""
+
+    def __init__(
+        self,
+        flush_seconds: float = settings.TELEMETRY_FLUSH_SECONDS,
+        batch_size: int = settings.TELEMETRY_FLUSH_BATCH_SIZE,
+        max_pending: int = settings.TELEMETRY_MAX_PENDING,
+    ):
+        self.flush_seconds = flush_seconds
+        self.batch_size = batch_size
+        self.max_pending = max_pending
+        self._pending: Dict[uuid_pkg.UUID, TelemetryFix] = {}
+        # Every fix, for the location history
+        self._history: List[TelemetryFix] = []
+        # Timestamp of the last fix written per resource, to drop the ones
+        # arriving out of order
+        self._last_written: Dict[uuid_pkg.UUID, datetime] = {}
+        self._lock = asyncio.Lock()
+
+        # Metrics
+        self.received = 0
+        self.coalesced = 0
+        self.dropped_stale = 0
+        self.dropped_unknown = 0
+        self.dropped_history = 0
+        self.written = 0
+        self.history_written = 0
+        self.flushes = 0
+        self.last_batch_size = 0
+        self.last_history_batch_size = 0
+        self.last_flush_at: Optional[datetime] = None
+        self.last_flush_seconds = 0.0
+        # Longest wait of a fix between its reception and its commit
+        self.last_ingest_lag_seconds = 0.0
+        # Age of the oldest fix written, from the time the device took it
+        self.last_fix_age_seconds = 0.0
+
+    @property
+    def pending(self) -> int:
+        """Resources with a fix waiting to be written"""
+        return len(self._pending)
+
+    @property
+    def full(self) -> bool:
+        """True when no more fixes can be queued until the next flush"""
+        return (
+            len(self._pending) >= self.max_pending
+            or len(self._history) >= self.max_pending
+        )
+
+    @property
+    def ingest_lag_seconds(self) -> float:
+        """Age of the oldest pending fix, since it was received"""
+        if not self._pending:
+            return 0.0
+        oldest = min(fix.received for fix in self._pending.values())
+        return time.monotonic() - oldest
+
+    def submit(self, fixes: Iterable[TelemetryFix]) -> int:
+        """
+        Queues fixes, keeping the latest one of every resource. Returns the
+        number of fixes accepted as actual location, the ones older than the
+        fix already known for their resource are dropped. They are recorded
+        in the history anyway, unless too far from now.
+        """
+        now = time.monotonic()
+        utcnow = datetime.now(timezone.utc)
+        accepted = 0
+        for fix in fixes:
+            self.received += 1
+            if fix.timestamp is None:
+                fix.timestamp = utcnow
+            elif fix.timestamp.tzinfo is None:
+                fix.timestamp = fix.timestamp.replace(tzinfo=timezone.utc)
+            fix.received = now
+
+            if abs(utcnow - fix.timestamp) <= MAX_CLOCK_SKEW:
+                self._history.append(fix)
+            else:
+                self.dropped_history += 1
+
+            last_written = self._last_written.get(fix.resource_id)
+            if last_written is not None and fix.timestamp < last_written:
+                self.dropped_stale += 1
+                continue
+            pending = self._pending.get(fix.resource_id)
+            if pending is not None:
+                if fix.timestamp < pending.timestamp:
+                    self.dropped_stale += 1
+                    continue
+                # Keep waiting since the first fix replaced was received
+                fix.received = pending.received
+                self.coalesced += 1
+            self._pending[fix.resource_id] = fix
+            accepted += 1
+        return accepted
+
+    def _requeue(self, fixes: Iterable[TelemetryFix]) -> None:
+        """Puts back the fixes of a failed flush, unless newer ones came"""
+        for fix in fixes:
+            pending = self._pending.get(fix.resource_id)
+            if pending is None:
+                self._pending[fix.resource_id] = fix
+            elif pending.timestamp >= fix.timestamp:
+                pending.received = min(pending.received, fix.received)
+
+    async def flush(
+        self,
+        session: AsyncSession,
+        snapshot: Optional[FleetSnapshot] = None,
+        live: Optional[ChangeBroadcaster] = None,
+    ) -> int:
+        """
+        Writes the pending fixes, one upsert statement per batch_size
+        resources, and the history. Returns the number of locations written.
+        """
+        async with self._lock:
+            if not self._pending and not self._history:
+                self.last_batch_size = 0
+                self.last_history_batch_size = 0
+                return 0
+
+            fixes = list(self._pending.values())
+            history = self._history
+            self._pending = {}
+            self._history = []
+            started = time.monotonic()
+            try:
+                written, history_written = await self._write(
+                    session, fixes, history, snapshot, live
+                )
+            except Exception:
+                self._requeue(fixes)
+                self._history = history + self._history
+                raise
+
+            finished = time.monotonic()
+            now = datetime.now(timezone.utc)
+            self.flushes += 1
+            self.written += len(written)
+            self.history_written += history_written
+            self.last_batch_size = len(written)
+            self.last_history_batch_size = history_written
+            self.last_flush_at = now
+            self.last_flush_seconds = finished - started
+            self.last_ingest_lag_seconds = max(
+                finished - fix.received for fix in fixes + history
+            )
+            self.last_fix_age_seconds = max(
+                (now - fix.timestamp).total_seconds()
+                for fix in fixes + history
+            )
+            for fix in written:
+                self._last_written[fix.resource_id] = fix.timestamp
+            return len(written)
+
+    async def _write(
+        self,
+        session: AsyncSession,
+        fixes: List[TelemetryFix],
+        history: List[TelemetryFix],
+        snapshot: Optional[FleetSnapshot],
+        live: Optional[ChangeBroadcaster],
+    ) -> Tuple[List[TelemetryFix], int]:
+        dialect = session.bind.dialect.name
+        async with session.begin():
+            # Actual location of the resources, absent if deleted
+            resources_ids = list(
+                {fix.resource_id for fix in fixes}
+                | {fix.resource_id for fix in history}
+            )
+            locations_ids = {}
+            for start in range(0, len(resources_ids), self.batch_size):
+                result = await session.execute(
+                    select(Resource.id, Resource.actual_location).where(
+                        Resource.id.in_(
+                            resources_ids[start : start + self.batch_size]
+                        )
+                    )
+                )
+                locations_ids.update(result.all())
+
+            written = []
+            for fix in fixes:
+                if fix.resource_id in locations_ids:
+                    written.append(fix)
+                else:
+                    self.dropped_unknown += 1
+            for start in range(0, len(written), self.batch_size):
+                await self._write_locations(
+                    session,
+                    dialect,
+                    written[start : start + self.batch_size],
+                    locations_ids,
+                    snapshot,
+                    live,
+                )
+
+            history_rows = [
+                {
+                    "resource_id": fix.resource_id,
+                    "recorded_at": fix.timestamp,
+                    "latitude": fix.latitude,
+                    "longitude": fix.longitude,
+                    "accuracy": fix.accuracy,
+                    "speed": fix.speed,
+                    "heading": fix.heading,
+                }
+                for fix in history
+                if fix.resource_id in locations_ids
+            ]
+            self.dropped_history += len(history) - len(history_rows)
+            if history_rows:
+                try:
+                    async with session.begin_nested():
+                        await add_history(session, history_rows)
+                except DBAPIError:
+                    # Requeuing would fail the same way until the partition
+                    # exists, and hold back the actual locations meanwhile
+                    logger.exception(
+                        "Location history of %d fixes not written",
+                        len(history_rows),
+                    )
+                    self.dropped_history += len(history_rows)
+                    history_rows = []
+        return written, len(history_rows)
+
+    async def _write_locations(
+        self,
+        session: AsyncSession,
+        dialect: str,
+        fixes: List[TelemetryFix],
+        locations_ids: Dict[uuid_pkg.UUID, Optional[uuid_pkg.UUID]],
+        snapshot: Optional[FleetSnapshot],
+        live: Optional[ChangeBroadcaster],
+    ) -> None:
+        rows = []
+        new_locations = []
+        resources_ids = {}
+        for fix in fixes:
+            location_id = locations_ids[fix.resource_id]
+            if location_id is None:
+                location_id = uuid_pkg.uuid4()
+                new_locations.append(
+                    {
+                        "resource_id": fix.resource_id,
+                        "location_id": location_id,
+                    }
+                )
+            resources_ids[location_id] = fix.resource_id
+            rows.append(
+                {
+                    "id": location_id,
+                    "latitude": fix.latitude,
+                    "longitude": fix.longitude,
+                    "accuracy": fix.accuracy,
+                    "speed": fix.speed,
+                    "heading": fix.heading,
+                }
+            )
+
+        result = await session.execute(_upsert_locations(dialect, rows))
+        locations = result.all()
+        if new_locations:
+            # Core executemany: on the ORM entity a list of parameters is
+            # an update by primary key, which needs the rows keyed by id
+            resource_table = Resource.__table__
+            await session.execute(
+                update(resource_table)
+                .where(resource_table.c.id == bindparam("resource_id"))
+                .values(actual_location=bindparam("location_id")),
+                new_locations,
+            )
+
+        for location in locations:
+            resource_id = resources_ids[location.id]
+            if snapshot is not None:
+                snapshot.set_location(resource_id, location, session)
+            if live is not None:
+                live.publish(
+                    "location",
+                    "updated",
+                    location.id,
+                    location_delta(location, resource_id),
+                    session,
+                )
+
+
+telemetry_ingestor = TelemetryIngestor()
+
+
+def get_telemetry_ingestor() -> TelemetryIngestor:
+    """Get the process telemetry ingestor"""
+    return telemetry_ingestor
@@ -0,0 +1,44 @@
+"""
+Tombstones of the deleted rows, so the delta sync can report deletions.
+"""
+
+import uuid as uuid_pkg
+from datetime import datetime, timedelta, timezone
+from typing import Iterable
+
+from sqlalchemy import delete, insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from src.configs.config import settings
+from src.models.tombstone import Tombstone
+
+
+def tombstone_horizon() -> datetime:
+    """Oldest deletion still recorded by the tombstones"""
+    return datetime.now(timezone.utc) - timedelta(
+        days=settings.SYNC_TOMBSTONE_RETENTION_DAYS
+    )
+
+
+async def add_tombstones(
+    session: AsyncSession, entity: str, entities_ids: Iterable[uuid_pkg.UUID]
+) -> None:
+    """
+    Records the deletion of rows, in the transaction deleting them. The
+    deletion time is left to the database clock, the one of the sync
+    watermark, so a drift of the application clock cannot hide it
+    """
+    rows = [
+        {"id": uuid_pkg.uuid4(), "entity": entity, "entity_id": entity_id}
+        for entity_id in entities_ids
+    ]
+    if rows:
+        await session.execute(insert(Tombstone.__table__), rows)
+
+
+async def purge_tombstones(session: AsyncSession) -> None:
+    """Deletes the tombstones older than the retention"""
+    await session.execute(
+        delete(Tombstone).where(Tombstone.time_deleted < tombstone_horizon())
+    )
+    await session.commit()
@@ -0,0 +1,40 @@
+"""
+Callbacks run once the transaction of a session commits.
+
+In-memory consumers of the writes (fleet snapshot, live feed) use them so
+they never see changes that were rolled back.
+"""
+
+from typing import Callable, Optional
+
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
+# Session.info key of the callbacks waiting for the commit
+PENDING_CALLBACKS_KEY = "on_commit_callbacks"
+
+
+@event.listens_for(Session, "after_commit")
+def _run_pending_callbacks(session: Session) -> None:
+    for callback in session.info.pop(PENDING_CALLBACKS_KEY, []):
+        callback()
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_pending_callbacks(session: Session) -> None:
+    session.info.pop(PENDING_CALLBACKS_KEY, None)
+
+
+def on_commit(
+    session: Optional[AsyncSession], callback: Callable[[], None]
+) -> None:
+    """
+    Runs callback once the transaction of session commits, or right away
+    if there is no session or no transaction in progress. The callback must
+    not read ORM attributes, they are expired by the commit.
+    """
+    if session is None or not session.in_transaction():
+        callback()
+        return
+    session.info.setdefault(PENDING_CALLBACKS_KEY, []).append(callback)
@@ -0,0 +1,59 @@
+"""
+Fixtures shared by the statement-count regression tests
+"""
+
+import pytest
+
+
+@pytest.fixture(scope="function")
+def emergency_data():
+    """
+    Request body of a new emergency
+    """
+    return {
+        "name": "Benchmark Emergency",
+        "description": "Mass-casualty event",
+        "latitude": 41.38,
+        "longitude": 2.17,
+        "emergency_type": "Accident",
+        "priority": "Critical",
+        "status": "Active",
+    }
+
+
+@pytest.fixture(scope="function")
+def create_emergency(client, emergency_data):
+    """
+    Creates an emergency through the API and returns its id
+    """
+
+    async def create():
+        response = await client.post("/api/emergencies", json=emergency_data)
+        return response.json()["emergency_id"]
+
+    return create
+
+
+@pytest.fixture(scope="function")
+def create_resources(client):
+    """
+    Creates amount resources through the API and returns their ids
+    """
+
+    async def create(amount):
+        resources_ids = []
+        for i in range(amount):
+            response = await client.post(
+                "/api/resources",
+                json={
+                    "name": f"ambulance-{i}",
+                    "resource_type": "Ambulance",
+                    "actual_latitude": 41.38,
+                    "actual_longitude": 2.17,
+                    "status": "Available",
+                },
+            )
+            resources_ids.append(response.json()["resource_id"])
+        return resources_ids
+
+    return create
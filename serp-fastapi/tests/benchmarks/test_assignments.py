@@ -0,0 +1,64 @@
+"""
+Statement-count regression tests of the resource assignment endpoints: the
+number of statements sent to the database must not grow with the batch of
+assigned resources
+"""
+
+import pytest
+
+pytestmark = pytest.mark.asyncio
+
+BATCH_SIZES = [1, 10, 40, 100]
+
+
+@pytest.mark.asyncio
+async def test_assign_round_trips_flat(
+    client, query_counter, create_emergency, create_resources
+):
+    """
+    Assigning 1 or 100 resources costs the same number of statements
+    """
+    resources_ids = await create_resources(max(BATCH_SIZES))
+
+    round_trips = {}
+    for batch_size in BATCH_SIZES:
+        emergency_id = await create_emergency()
+        query_counter.reset()
+        response = await client.post(
+            f"/api/emergencies/{emergency_id}/assign",
+            json={"resourcesIDs": resources_ids[:batch_size]},
+        )
+        assert response.status_code == 200
+        round_trips[batch_size] = query_counter.count
+
+    assert len(set(round_trips.values())) == 1
+
+
+@pytest.mark.asyncio
+async def test_bulk_assign_round_trips_flat(
+    client, query_counter, create_emergency, create_resources
+):
+    """
+    Assigning resources to 1 or 40 emergencies in one bulk call costs the
+    same number of statements
+    """
+    resources_ids = await create_resources(40)
+
+    round_trips = {}
+    for batch_size in [1, 10, 40]:
+        assignments = []
+        for resource_id in resources_ids[:batch_size]:
+            assignments.append(
+                {
+                    "emergency_id": await create_emergency(),
+                    "resourcesIDs": [resource_id],
+                }
+            )
+        query_counter.reset()
+        response = await client.post(
+            "/api/emergencies/assign", json={"assignments": assignments}
+        )
+        assert response.status_code == 200
+        round_trips[batch_size] = query_counter.count
+
+    assert len(set(round_trips.values())) == 1
@@ -0,0 +1,126 @@
+"""
+Statement-count regression tests of the resource deletion endpoints: the
+number of statements sent to the database must not grow with the assignment
+history of the deleted resources
+"""
+
+import uuid as uuid_pkg
+from datetime import datetime
+
+import pytest
+from sqlalchemy import func, insert, select
+
+from src.models.emergency import Emergency
+from src.models.emergencyresourceslink import EmergencyResourceLink
+from src.models.resource import Resource
+
+pytestmark = pytest.mark.asyncio
+
+HISTORY_SIZES = [10, 1000, 5000]
+
+
+async def add_history(db_session, resource_id, amount):
+    """
+    Adds amount past emergencies attended by a resource, as the resource
+    and destination of the emergency and as an assignment
+    """
+    resource_uuid = uuid_pkg.UUID(resource_id)
+    emergencies_ids = [uuid_pkg.uuid4() for _ in range(amount)]
+    await db_session.execute(
+        insert(Emergency),
+        [
+            {
+                "id": emergency_id,
+                "name": "Past Emergency",
+                "description": "Attended",
+                "priority": "Low",
+                "emergency_type": "Accident",
+                "status": "Finished",
+                "resource_id": resource_uuid,
+                "destination_id": resource_uuid,
+                "time_created": datetime.utcnow(),
+            }
+            for emergency_id in emergencies_ids
+        ],
+    )
+    await db_session.execute(
+        insert(EmergencyResourceLink),
+        [
+            {"emergency_id": emergency_id, "resource_id": resource_uuid}
+            for emergency_id in emergencies_ids
+        ],
+    )
+    await db_session.commit()
+
+
+async def count(db_session, stmt):
+    """Runs a count statement outside of any request transaction"""
+    result = await db_session.execute(stmt)
+    value = result.scalar_one()
+    await db_session.rollback()
+    return value
+
+
+@pytest.mark.asyncio
+async def test_delete_round_trips_flat(
+    client, db_session, query_counter, create_resources
+):
+    """
+    Deleting a resource with 10 or 5000 past assignments costs the same
+    number of statements
+    """
+    round_trips = {}
+    for history_size in HISTORY_SIZES:
+        [resource_id] = await create_resources(1)
+        await add_history(db_session, resource_id, history_size)
+
+        query_counter.reset()
+        response = await client.delete(f"/api/resources/{resource_id}")
+        assert response.status_code == 200
+        round_trips[history_size] = query_counter.count
+
+    assert len(set(round_trips.values())) == 1
+    assert await count(db_session, select(func.count(Resource.id))) == 0
+    assert (
+        await count(
+            db_session, select(func.count()).select_from(EmergencyResourceLink)
+        )
+        == 0
+    )
+    assert (
+        await count(
+            db_session,
+            select(func.count(Emergency.id)).where(
+                Emergency.resource_id.is_not(None)
+                | Emergency.destination_id.is_not(None)
+            ),
+        )
+        == 0
+    )
+
+
+@pytest.mark.asyncio
+async def test_bulk_decommission_round_trips_flat(
+    client, db_session, query_counter, create_resources
+):
+    """
+    Decommissioning 1 or 20 resources with 1000 past assignments each in
+    one bulk call costs the same number of statements
+    """
+    round_trips = {}
+    for batch_size in [1, 20]:
+        resources_ids = await create_resources(batch_size)
+        for resource_id in resources_ids:
+            await add_history(db_session, resource_id, 1000)
+
+        query_counter.reset()
+        response = await client.post(
+            "/api/resources/decommission",
+            json={"resources_ids": resources_ids},
+        )
+        assert response.status_code == 200
+        assert set(response.json()["resources_ids"]) == set(resources_ids)
+        round_trips[batch_size] = query_counter.count
+
+    assert len(set(round_trips.values())) == 1
+    assert await count(db_session, select(func.count(Resource.id))) == 0
@@ -0,0 +1,59 @@
+"""
+Statement-count regression tests of the creation endpoints: an emergency or
+a resource is written with its locations and addresses by a fixed number of
+statements, whatever the number of emergencies of a bulk creation
+"""
+
+import pytest
+
+pytestmark = pytest.mark.asyncio
+
+BATCH_SIZES = [1, 10, 100, 500]
+
+
+@pytest.mark.asyncio
+async def test_create_round_trips(client, query_counter, emergency_data):
+    """
+    One statement per table (SQLite runs one multi-row insert per table,
+    PostgreSQL one statement for all of them)
+    """
+    query_counter.reset()
+    response = await client.post("/api/emergencies", json=emergency_data)
+    assert response.status_code == 201
+    assert query_counter.count == 3
+
+    query_counter.reset()
+    response = await client.post(
+        "/api/resources",
+        json={
+            "name": "ambulance-1",
+            "resource_type": "Ambulance",
+            "actual_latitude": 41.38,
+            "actual_longitude": 2.17,
+            "status": "Available",
+        },
+    )
+    assert response.status_code == 201
+    assert query_counter.count == 3
+
+
+@pytest.mark.asyncio
+async def test_bulk_create_round_trips_flat(
+    client, query_counter, emergency_data
+):
+    """
+    Creating 1 or 500 emergencies in one bulk call costs the same number of
+    statements
+    """
+    round_trips = {}
+    for batch_size in BATCH_SIZES:
+        query_counter.reset()
+        response = await client.post(
+            "/api/emergencies/bulk",
+            json={"emergencies": [emergency_data] * batch_size},
+        )
+        assert response.status_code == 201
+        assert len(response.json()["emergency_ids"]) == batch_size
+        round_trips[batch_size] = query_counter.count
+
+    assert len(set(round_trips.values())) == 1
@@ -2,9 +2,10 @@
 Configuration file for testing SERP fastAPI service
 """
 
-
+import pytest
 import pytest_asyncio
 from httpx import ASGITransport, AsyncClient
+from sqlalchemy import event
 from sqlalchemy.ext.asyncio import (
     AsyncSession,
     async_sessionmaker,
@@ -13,8 +14,11 @@ from sqlalchemy.ext.asyncio import (
 from sqlalchemy.pool import StaticPool
 
 from main import app
-from src.configs.database import get_db
+from src.configs.database import get_db, get_read_db
 from src.models import metadata
+from src.services.broadcaster import ChangeBroadcaster, get_broadcaster
+from src.services.fleet import FleetSnapshot, get_fleet_snapshot
+from src.services.telemetry import TelemetryIngestor, get_telemetry_ingestor
 
 
 @pytest_asyncio.fixture(scope="function")
@@ -72,6 +76,16 @@ async def client(db_session: AsyncSession):
             pass  # Session is closed in the db_session fixture
 
     app.dependency_overrides[get_db] = override_get_db
+    app.dependency_overrides[get_read_db] = override_get_db
+    # Fresh in-memory fleet snapshot for every test database
+    snapshot = FleetSnapshot()
+    app.dependency_overrides[get_fleet_snapshot] = lambda: snapshot
+    # Fresh live feed broadcaster for every test
+    broadcaster = ChangeBroadcaster()
+    app.dependency_overrides[get_broadcaster] = lambda: broadcaster
+    # Fresh telemetry ingestor, flushed by hand in the tests
+    ingestor = TelemetryIngestor()
+    app.dependency_overrides[get_telemetry_ingestor] = lambda: ingestor
 
     # Create an AsyncClient for testing
     async with AsyncClient(
@@ -81,3 +95,31 @@ async def client(db_session: AsyncSession):
 
     # Clear dependency overrides after the test
     app.dependency_overrides.clear()
+
+
+class QueryCounter:
+    """
+    Counts the statements sent to the database (DB round-trips)
+    """
+
+    def __init__(self):
+        self.count = 0
+
+    def __call__(self, *args, **kwargs):
+        self.count += 1
+
+    def reset(self):
+        """Restart counting from zero"""
+        self.count = 0
+
+
+@pytest.fixture(scope="function")
+def query_counter(db_session: AsyncSession):
+    """
+    Counts every statement executed through the test database engine.
+    """
+    counter = QueryCounter()
+    engine = db_session.bind.sync_engine
+    event.listen(engine, "before_cursor_execute", counter)
+    yield counter
+    event.remove(engine, "before_cursor_execute", counter)
@@ -0,0 +1,63 @@
+"""
+Tests for the LISTEN/NOTIFY change feed dispatch
+"""
+
+import json
+
+import pytest
+
+from src.configs.database import APPLICATION_NAME, ChangeFeed, RowChange
+from src.services.broadcaster import ChangeBroadcaster
+from src.services.fleet import FleetSnapshot
+
+pytestmark = pytest.mark.asyncio
+
+
+def notify(feed, table, op, row_id, origin):
+    """Delivers a notification as the asyncpg listener would"""
+    payload = json.dumps(
+        {"table": table, "op": op, "id": row_id, "origin": origin}
+    )
+    feed._on_notify(None, 0, "serp_changes", payload)
+
+
+@pytest.mark.asyncio
+async def test_change_feed_dispatch():
+    """
+    Test that the changes of other processes reach the subscribers, and
+    the ones of this process are skipped
+    """
+    feed = ChangeFeed("postgresql://unused")
+    broadcaster = ChangeBroadcaster()
+    snapshot = FleetSnapshot()
+    feed.subscribe(broadcaster.publish_row_change)
+    feed.subscribe(snapshot.handle_row_change)
+    subscription = broadcaster.subscribe()
+
+    notify(feed, "resource", "update", "abc", APPLICATION_NAME)
+    assert broadcaster.seq == 0
+    assert not snapshot.stale
+
+    notify(feed, "resource", "update", "abc", "serp-fastapi-other")
+    event = await subscription.get()
+    assert (event.entity, event.op, event.id) == ("resource", "updated", "abc")
+    assert snapshot.stale
+
+    feed._on_notify(None, 0, "serp_changes", "not json")
+    assert broadcaster.seq == 1
+
+
+@pytest.mark.asyncio
+async def test_change_feed_resync():
+    """
+    Test that a resync of the change feed reaches the live clients, which
+    must refetch everything
+    """
+    feed = ChangeFeed("postgresql://unused")
+    broadcaster = ChangeBroadcaster()
+    feed.subscribe(broadcaster.publish_row_change)
+    subscription = broadcaster.subscribe()
+
+    feed._dispatch(RowChange("*", "resync", None, ""))
+    event = await subscription.get()
+    assert (event.entity, event.op, event.id) == ("*", "resync", "")
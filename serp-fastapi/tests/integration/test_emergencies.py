@@ -2,11 +2,16 @@
 Tests for the emergency model related CRUD
 """
 
+import json
+
 import pytest
 
 from sqlalchemy import select
 
+from src.configs.config import settings
 from src.models.emergency import Emergency
+from src.models.emergencyresourceslink import EmergencyResourceLink
+from src.models.resource import Resource
 from src.services.helpers import convertStringToUUID
 
 pytestmark = pytest.mark.asyncio
@@ -227,3 +232,241 @@ async def test_delete_created_emergency(client, emergency_data):
         x for x in data_after_delete if x["id"] == emergency_id_created
     ]
     assert len(updated_emergency) == 0
+
+
+@pytest.mark.asyncio
+async def test_list_emergencies_cursor_pagination(client, emergency_data):
+    """
+    Test that walks the emergencies list page by page with the cursor
+    """
+    created_ids = []
+    for _ in range(5):
+        response = await client.post("/api/emergencies", json=emergency_data)
+        assert response.status_code == 201
+        created_ids.append(response.json()["emergency_id"])
+
+    listed_ids = []
+    params = {"limit": 2}
+    while True:
+        response = await client.get("/api/emergencies", params=params)
+        assert response.status_code == 200
+        page = response.json()
+        assert len(page) <= 2
+        listed_ids.extend(x["id"] for x in page)
+        next_cursor = response.headers.get("X-Next-Cursor")
+        if next_cursor is None:
+            break
+        params = {"limit": 2, "cursor": next_cursor}
+
+    assert sorted(listed_ids) == sorted(created_ids)
+    assert len(listed_ids) == len(set(listed_ids))
+
+
+@pytest.mark.asyncio
+async def test_list_emergencies_default_page(
+    client, emergency_data, monkeypatch
+):
+    """
+    Test that a list without limit is a page of the default size, with the
+    cursor of the next one
+    """
+    monkeypatch.setattr(settings, "EMERGENCY_PAGE_SIZE", 2)
+    for _ in range(3):
+        response = await client.post("/api/emergencies", json=emergency_data)
+        assert response.status_code == 201
+
+    response = await client.get("/api/emergencies")
+    assert len(response.json()) == 2
+    next_cursor = response.headers["X-Next-Cursor"]
+
+    response = await client.get(
+        "/api/emergencies", params={"cursor": next_cursor}
+    )
+    assert len(response.json()) == 1
+    assert "X-Next-Cursor" not in response.headers
+
+
+@pytest.mark.asyncio
+async def test_list_emergencies_filters(client, emergency_data):
+    """
+    Test that the server side filters of the emergencies list apply
+    """
+    response = await client.post("/api/emergencies", json=emergency_data)
+    active_id = response.json()["emergency_id"]
+
+    response = await client.post(
+        "/api/emergencies",
+        json={**emergency_data, "status": "Solved", "priority": "Low"},
+    )
+    solved_id = response.json()["emergency_id"]
+
+    response = await client.get(
+        "/api/emergencies", params={"status": "Active"}
+    )
+    assert [x["id"] for x in response.json()] == [active_id]
+
+    response = await client.get(
+        "/api/emergencies", params={"status": ["Active", "Solved"]}
+    )
+    assert len(response.json()) == 2
+
+    response = await client.get("/api/emergencies", params={"priority": "Low"})
+    assert [x["id"] for x in response.json()] == [solved_id]
+
+    response = await client.get(
+        "/api/emergencies", params={"cursor": "not-a-cursor"}
+    )
+    assert response.status_code == 400
+
+
+@pytest.mark.asyncio
+async def test_export_emergencies_streaming(client, emergency_data):
+    """
+    Test that the export endpoint streams every emergency as NDJSON and
+    as a JSON array
+    """
+    created_ids = set()
+    for _ in range(3):
+        response = await client.post("/api/emergencies", json=emergency_data)
+        created_ids.add(response.json()["emergency_id"])
+
+    response = await client.get("/api/emergencies/export")
+    assert response.status_code == 200
+    assert response.headers["content-type"] == "application/x-ndjson"
+    lines = [json.loads(x) for x in response.text.splitlines()]
+    assert {x["id"] for x in lines} == created_ids
+
+    response = await client.get(
+        "/api/emergencies/export", params={"format": "json"}
+    )
+    assert response.status_code == 200
+    assert {x["id"] for x in response.json()} == created_ids
+
+
+async def create_resource(client, name="ambulance-101"):
+    """Creates an available resource and returns its id"""
+    response = await client.post(
+        "/api/resources",
+        json={
+            "name": name,
+            "resource_type": "Ambulance",
+            "actual_latitude": 41.38,
+            "actual_longitude": 2.17,
+            "status": "Available",
+        },
+    )
+    return response.json()["resource_id"]
+
+
+async def get_resource_status(db_session, resource_id):
+    """Reads the status of a resource straight from the database"""
+    result = await db_session.execute(
+        select(Resource.status)
+        .where(Resource.id == convertStringToUUID(resource_id))
+        .execution_options(populate_existing=True)
+    )
+    return result.scalar_one()
+
+
+@pytest.mark.asyncio
+async def test_assign_resources(client, emergency_data, db_session):
+    """
+    Test that assigning resources replaces the previous ones and updates
+    their status
+    """
+    response = await client.post("/api/emergencies", json=emergency_data)
+    emergency_id = response.json()["emergency_id"]
+    first_id = await create_resource(client, "ambulance-1")
+    second_id = await create_resource(client, "ambulance-2")
+
+    url = f"/api/emergencies/{emergency_id}/assign"
+    response = await client.post(url, json={"resourcesIDs": [first_id]})
+    assert response.status_code == 200
+    assert await get_resource_status(db_session, first_id) == "Busy"
+
+    response = await client.post(url, json={"resourcesIDs": [second_id]})
+    assert response.status_code == 200
+    assert await get_resource_status(db_session, first_id) == "Available"
+    assert await get_resource_status(db_session, second_id) == "Busy"
+
+    result = await db_session.execute(
+        select(EmergencyResourceLink.resource_id).where(
+            EmergencyResourceLink.emergency_id
+            == convertStringToUUID(emergency_id)
+        )
+    )
+    assert [str(x) for x in result.scalars().all()] == [second_id]
+
+
+@pytest.mark.asyncio
+async def test_assign_missing_resource(client, emergency_data):
+    """
+    Test that assigning unknown resources reports them and changes nothing
+    """
+    response = await client.post("/api/emergencies", json=emergency_data)
+    emergency_id = response.json()["emergency_id"]
+    missing_id = "00000000-0000-0000-0000-000000000001"
+
+    response = await client.post(
+        f"/api/emergencies/{emergency_id}/assign",
+        json={"resourcesIDs": [missing_id]},
+    )
+    assert response.status_code == 404
+    assert missing_id in response.json()["detail"]
+
+
+@pytest.mark.asyncio
+async def test_bulk_assign_resources(client, emergency_data, db_session):
+    """
+    Test that the bulk endpoint assigns resources to several emergencies
+    """
+    assignments = []
+    for i in range(3):
+        response = await client.post("/api/emergencies", json=emergency_data)
+        assignments.append(
+            {
+                "emergency_id": response.json()["emergency_id"],
+                "resourcesIDs": [await create_resource(client, f"unit-{i}")],
+            }
+        )
+
+    response = await client.post(
+        "/api/emergencies/assign", json={"assignments": assignments}
+    )
+    assert response.status_code == 200
+    assert len(response.json()["emergency_ids"]) == 3
+    for assignment in assignments:
+        status = await get_resource_status(
+            db_session, assignment["resourcesIDs"][0]
+        )
+        assert status == "Busy"
+
+
+@pytest.mark.asyncio
+async def test_bulk_create_emergencies(client, emergency_data, db_session):
+    """
+    Test that the bulk endpoint creates every emergency with its location
+    """
+    emergencies = [
+        {**emergency_data, "name": f"Emergency {i}", "latitude": 40 + i}
+        for i in range(5)
+    ]
+    response = await client.post(
+        "/api/emergencies/bulk", json={"emergencies": emergencies}
+    )
+    assert response.status_code == 201
+    emergency_ids = response.json()["emergency_ids"]
+    assert len(emergency_ids) == 5
+
+    response = await client.get("/api/emergencies")
+    created = {x["id"]: x for x in response.json()}
+    assert set(created) == set(emergency_ids)
+    for i, emergency_id in enumerate(emergency_ids):
+        assert created[emergency_id]["name"] == f"Emergency {i}"
+        location = created[emergency_id]["location_emergency_data"]
+        assert location["latitude"] == 40 + i
+
+    response = await client.post(
+        "/api/emergencies/bulk", json={"emergencies": []}
+    )
+    assert response.status_code == 422
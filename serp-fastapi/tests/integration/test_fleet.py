@@ -0,0 +1,114 @@
+"""
+Tests for the in-memory fleet snapshot and the reads it serves
+"""
+
+import pytest
+from sqlalchemy import update
+
+from main import app
+from src.models.resource import Resource, ResourceStatusEnum
+from src.services.fleet import get_fleet_snapshot
+from src.services.helpers import convertStringToUUID
+
+pytestmark = pytest.mark.asyncio
+
+
+async def create_resource(client, name="ambulance-101", status="Available"):
+    """Creates a resource and returns its id"""
+    response = await client.post(
+        "/api/resources",
+        json={
+            "name": name,
+            "resource_type": "Ambulance",
+            "actual_latitude": 41.38,
+            "actual_longitude": 2.17,
+            "status": status,
+        },
+    )
+    return response.json()["resource_id"]
+
+
+@pytest.mark.asyncio
+async def test_fleet_served_from_memory(client, query_counter):
+    """
+    Test that once loaded, fleet reads do not hit the database and follow
+    the writes made through the API
+    """
+    resource_id = await create_resource(client)
+
+    response = await client.get("/api/fleet")
+    assert response.status_code == 200
+    fleet = response.json()
+    assert [x["id"] for x in fleet["resources"]] == [resource_id]
+    assert fleet["resources"][0]["latitude"] == 41.38
+    etag = response.headers["ETag"]
+
+    query_counter.reset()
+    response = await client.get("/api/fleet", headers={"If-None-Match": etag})
+    assert response.status_code == 304
+    response = await client.get(f"/api/fleet/{resource_id}")
+    assert response.json()["status"] == "Available"
+    response = await client.get(f"/api/devices/{resource_id}/location")
+    assert response.status_code == 200
+    assert response.json()["longitude"] == 2.17
+    assert query_counter.count == 0
+
+    response = await client.post(
+        "/api/emergencies",
+        json={
+            "name": "Test Emergency",
+            "description": "Description for Test Emergency",
+            "latitude": 41.38,
+            "longitude": 2.17,
+            "emergency_type": "Medical",
+            "priority": "High",
+            "status": "Active",
+        },
+    )
+    emergency_id = response.json()["emergency_id"]
+    await client.post(
+        f"/api/emergencies/{emergency_id}/assign",
+        json={"resourcesIDs": [resource_id]},
+    )
+
+    response = await client.get("/api/fleet", headers={"If-None-Match": etag})
+    assert response.status_code == 200
+    assert response.json()["resources"][0]["status"] == "Busy"
+
+    await client.delete(f"/api/resources/{resource_id}")
+    response = await client.get("/api/fleet")
+    assert response.json()["resources"] == []
+
+
+@pytest.mark.asyncio
+async def test_fleet_incremental_refresh(client, db_session):
+    """
+    Test that the refresh picks up writes made outside this process
+    """
+    kept_id = await create_resource(client, "ambulance-1")
+    deleted_id = await create_resource(client, "ambulance-2")
+    await client.get("/api/fleet")
+
+    snapshot = app.dependency_overrides[get_fleet_snapshot]()
+    await db_session.execute(
+        update(Resource)
+        .where(Resource.id == convertStringToUUID(kept_id))
+        .values(status=ResourceStatusEnum.MAINTENANCE)
+    )
+    await db_session.execute(
+        Resource.__table__.delete().where(
+            Resource.id == convertStringToUUID(deleted_id)
+        )
+    )
+    await db_session.commit()
+
+    version = snapshot.version
+    await snapshot.refresh(db_session)
+    assert snapshot.version > version
+    assert snapshot.get(convertStringToUUID(deleted_id)) is None
+    record = snapshot.get(convertStringToUUID(kept_id))
+    assert record.status == ResourceStatusEnum.MAINTENANCE
+
+    version = snapshot.version
+    await snapshot.refresh(db_session)
+    assert snapshot.version == version
@@ -0,0 +1,130 @@
+"""
+Tests for the location history and the resources tracks
+"""
+
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from main import app
+from src.configs.config import settings
+from src.services.history import maintain_history
+from src.services.telemetry import get_telemetry_ingestor
+
+pytestmark = pytest.mark.asyncio
+
+
+async def create_resource(client, name="ambulance-101"):
+    """Creates a resource and returns its id"""
+    response = await client.post(
+        "/api/resources",
+        json={
+            "name": name,
+            "resource_type": "Ambulance",
+            "actual_latitude": 41.38,
+            "actual_longitude": 2.17,
+            "status": "Available",
+        },
+    )
+    return response.json()["resource_id"]
+
+
+async def record_track(client, db_session, resource_id, start, seconds):
+    """Sends one fix per second from start and flushes them"""
+    await client.post(
+        "/api/telemetry",
+        json=[
+            {
+                "resource_id": resource_id,
+                "latitude": 41.38 + second / 10000,
+                "longitude": 2.17,
+                "timestamp": (start + timedelta(seconds=second)).isoformat(),
+            }
+            for second in range(seconds)
+        ],
+    )
+    ingestor = app.dependency_overrides[get_telemetry_ingestor]()
+    await ingestor.flush(db_session)
+
+
+@pytest.mark.asyncio
+async def test_track_full_and_downsampled(client, db_session):
+    """
+    Test that every fix is kept in the history and the track is downsampled
+    to the requested number of points
+    """
+    resource_id = await create_resource(client)
+    start = datetime.now(timezone.utc).replace(microsecond=0) - timedelta(
+        minutes=5
+    )
+    await record_track(client, db_session, resource_id, start, 60)
+
+    params = {
+        "start": start.isoformat(),
+        "end": (start + timedelta(seconds=60)).isoformat(),
+    }
+    response = await client.get(
+        f"/api/resources/{resource_id}/track", params=params
+    )
+    assert response.status_code == 200
+    track = response.json()
+    assert len(track["points"]) == 60
+    assert track["points"][0]["latitude"] == 41.38
+    assert track["points"][-1]["latitude"] == 41.38 + 59 / 10000
+
+    response = await client.get(
+        f"/api/resources/{resource_id}/track",
+        params={**params, "max_points": 6},
+    )
+    track = response.json()
+    assert track["bucket_seconds"] == 10
+    assert [point["latitude"] for point in track["points"]] == [
+        41.38 + second / 10000 for second in range(0, 60, 10)
+    ]
+
+    # The live location only keeps the last fix
+    response = await client.get(f"/api/devices/{resource_id}/location")
+    assert response.json()["latitude"] == 41.38 + 59 / 10000
+
+
+@pytest.mark.asyncio
+async def test_track_window_and_retention(client, db_session, monkeypatch):
+    """
+    Test the track window validation and that expired positions are
+    dropped by the maintenance
+    """
+    resource_id = await create_resource(client)
+    start = datetime.now(timezone.utc) - timedelta(hours=2)
+    await record_track(client, db_session, resource_id, start, 3)
+
+    response = await client.get(
+        f"/api/resources/{resource_id}/track",
+        params={"start": start.isoformat(), "end": start.isoformat()},
+    )
+    assert response.status_code == 400
+
+    # Default window: the last hour
+    response = await client.get(f"/api/resources/{resource_id}/track")
+    assert response.json()["points"] == []
+
+    window = {
+        "start": (start - timedelta(minutes=1)).isoformat(),
+        "max_points": 10000,
+    }
+    response = await client.get(
+        f"/api/resources/{resource_id}/track", params=window
+    )
+    assert len(response.json()["points"]) == 3
+
+    await maintain_history(db_session)
+    response = await client.get(
+        f"/api/resources/{resource_id}/track", params=window
+    )
+    assert len(response.json()["points"]) == 3
+
+    monkeypatch.setattr(settings, "LOCATION_HISTORY_RETENTION_DAYS", 0)
+    await maintain_history(db_session)
+    response = await client.get(
+        f"/api/resources/{resource_id}/track", params=window
+    )
+    assert response.json()["points"] == []
@@ -0,0 +1,86 @@
+"""
+Tests for the creation of rows with one statement per table, or one
+statement on PostgreSQL
+"""
+
+import re
+from types import SimpleNamespace
+
+import pytest
+from sqlalchemy.dialects.postgresql import asyncpg
+
+from src.models.address import Address
+from src.models.emergency import Emergency
+from src.models.location import Location
+from src.services.intake import insert_rows
+
+pytestmark = pytest.mark.asyncio
+
+
+class PostgresSession:
+    """
+    Session bound to PostgreSQL that keeps the executed statements
+    """
+
+    def __init__(self):
+        self.bind = SimpleNamespace(dialect=asyncpg.dialect())
+        self.statements = []
+
+    async def execute(self, statement):
+        self.statements.append(statement)
+        return SimpleNamespace(mappings=lambda: SimpleNamespace(all=list))
+
+
+async def test_insert_rows_postgresql_casts_values():
+    """
+    All the rows are written by one statement, and every column of its
+    VALUES is cast to the type of the table column, NULLs included
+    """
+    locations, addresses, emergencies = [], [], []
+    for i in range(2):
+        location = Location(latitude=41.38, longitude=2.17)
+        address = Address(latitude=41.38, longitude=2.17)
+        locations.append(location)
+        addresses.append(address)
+        emergencies.append(
+            Emergency(
+                name=f"Emergency {i}",
+                description="Test",
+                emergency_type="Accident",
+                priority="Critical",
+                status="Active",
+                location_emergency=location.id,
+                address_emergency=address.id,
+            )
+        )
+    session = PostgresSession()
+
+    await insert_rows(session, locations, addresses, emergencies)
+
+    assert len(session.statements) == 1
+    sql = str(session.statements[0].compile(dialect=asyncpg.dialect()))
+    assert sql.startswith("WITH new_location AS")
+    assert "new_address AS \n(INSERT INTO address" in sql
+    assert "CAST(location_values.accuracy AS FLOAT) AS accuracy" in sql
+    assert "CAST(address_values.city AS VARCHAR(64)) AS city" in sql
+    assert "CAST(emergency_values.resource_id AS UUID) AS resource_id" in sql
+    values_columns = re.findall(r"AS (\w+_values) \(([^)]*)\)", sql)
+    assert len(values_columns) == 3
+    assert sql.endswith("RETURNING emergency.id, emergency.time_created")
+    for name, columns in values_columns:
+        for column in columns.split(", "):
+            assert f"CAST({name}.{column} AS" in sql
+
+
+async def test_insert_rows_returns_server_defaults(db_session):
+    """
+    The instances of the last table get the columns filled by the database
+    """
+    locations = [Location(latitude=41.38, longitude=2.17) for _ in range(2)]
+    addresses = [Address(latitude=41.38, longitude=2.17) for _ in range(2)]
+    assert locations[0].time_created is None
+
+    await insert_rows(db_session, addresses, locations)
+
+    for location in locations:
+        assert location.time_created is not None
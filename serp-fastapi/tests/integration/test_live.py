@@ -0,0 +1,160 @@
+"""
+Tests for the live feed of emergencies, resources and locations deltas
+"""
+
+import asyncio
+import json
+from datetime import datetime
+
+import pytest
+
+from main import app
+from src.routes.live import live_feed_websocket, sse_events
+from src.services.broadcaster import ChangeBroadcaster, get_broadcaster
+
+pytestmark = pytest.mark.asyncio
+
+
+class ConnectedRequest:
+    """Request stub of a client that never disconnects"""
+
+    async def is_disconnected(self):
+        """The client is always connected"""
+        return False
+
+
+class IdleWebSocket:
+    """WebSocket stub of a client that disconnects without a message"""
+
+    def __init__(self):
+        self.closed = asyncio.Event()
+        self.sent = []
+
+    async def accept(self):
+        """Accepted"""
+
+    async def send_text(self, data):
+        """Keeps the sent messages"""
+        self.sent.append(data)
+
+    async def receive(self):
+        """Disconnects when the test closes it"""
+        await self.closed.wait()
+        return {"type": "websocket.disconnect", "code": 1000}
+
+
+@pytest.mark.asyncio
+async def test_writes_are_published(client):
+    """
+    Test that the API writes are published to the live feed clients
+    """
+    broadcaster = app.dependency_overrides[get_broadcaster]()
+    subscription = broadcaster.subscribe()
+
+    response = await client.post(
+        "/api/emergencies",
+        json={
+            "name": "Test Emergency",
+            "description": "Description for Test Emergency",
+            "latitude": 41.38,
+            "longitude": 2.17,
+            "emergency_type": "Medical",
+            "priority": "High",
+            "status": "Active",
+        },
+    )
+    emergency_id = response.json()["emergency_id"]
+    response = await client.get(f"/api/emergencies/{emergency_id}")
+    time_created = response.json()["time_created"]
+    await client.delete(f"/api/emergencies/{emergency_id}")
+
+    created = await subscription.get()
+    assert (created.entity, created.op, created.id) == (
+        "emergency",
+        "created",
+        emergency_id,
+    )
+    assert created.data["name"] == "Test Emergency"
+    # As stored, read back after the insert
+    assert datetime.fromisoformat(
+        str(created.data["time_created"])
+    ) == datetime.fromisoformat(time_created)
+    deleted = await subscription.get()
+    assert (deleted.op, deleted.seq) == ("deleted", created.seq + 1)
+
+
+@pytest.mark.asyncio
+async def test_resume_from_event_id():
+    """
+    Test that a client resumes after its last event id, and is told to
+    reset when that event is no longer buffered
+    """
+    broadcaster = ChangeBroadcaster(buffer_size=3)
+    for i in range(5):
+        broadcaster.publish("resource", "updated", i)
+
+    subscription = broadcaster.subscribe(f"{broadcaster.epoch}-3")
+    assert (await subscription.get()).seq == 4
+    assert not subscription.reset
+
+    assert broadcaster.subscribe(f"{broadcaster.epoch}-1").reset
+    assert broadcaster.subscribe("another-process-4").reset
+
+
+@pytest.mark.asyncio
+async def test_slow_client_is_dropped():
+    """
+    Test that a client that does not drain its queue is disconnected
+    without blocking the others
+    """
+    broadcaster = ChangeBroadcaster(queue_size=2)
+    slow = broadcaster.subscribe()
+    for i in range(3):
+        broadcaster.publish("resource", "updated", i)
+
+    assert broadcaster.clients == 0
+    assert (await slow.get()).id == "0"
+    assert (await slow.get()).id == "1"
+    assert await slow.get() is None
+
+
+@pytest.mark.asyncio
+async def test_sse_format():
+    """
+    Test the Server-Sent Events framing of the deltas
+    """
+    broadcaster = ChangeBroadcaster(queue_size=1)
+    subscription = broadcaster.subscribe()
+    broadcaster.publish("resource", "deleted", "abc")
+    broadcaster.publish("resource", "deleted", "def")
+
+    events = sse_events(ConnectedRequest(), broadcaster, subscription)
+    message = await anext(events)
+    assert message.startswith(f"id: {broadcaster.epoch}-1\ndata: ")
+    data = json.loads(message.split("data: ", 1)[1])
+    assert (data["entity"], data["op"], data["id"]) == (
+        "resource",
+        "deleted",
+        "abc",
+    )
+    assert (await anext(events)).startswith("event: overflow")
+
+
+@pytest.mark.asyncio
+async def test_websocket_idle_disconnect():
+    """
+    Test that a WebSocket client leaving an idle stream is unsubscribed
+    without waiting for an event
+    """
+    broadcaster = ChangeBroadcaster()
+    websocket = IdleWebSocket()
+    handler = asyncio.ensure_future(
+        live_feed_websocket(websocket, broadcaster)
+    )
+    await asyncio.sleep(0)
+    assert broadcaster.clients == 1
+
+    websocket.closed.set()
+    await asyncio.wait_for(handler, timeout=1)
+    assert broadcaster.clients == 0
+    assert websocket.sent == []
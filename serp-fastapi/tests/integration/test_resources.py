@@ -1,3 +1,295 @@
 """
 Tests for the resources model related CRUD
 """
+
+import json
+
+import pytest
+from sqlalchemy import select
+
+from src.models.location import Location
+from src.models.resource import Resource
+from src.services.helpers import convertStringToUUID
+
+pytestmark = pytest.mark.asyncio
+
+
+@pytest.fixture
+def resource_data():
+    """
+    Returns a resource data to create a resource as resource request model
+    """
+    return {
+        "name": "ambulance-101",
+        "resource_type": "Ambulance",
+        "actual_address_longitude": 2.17,
+        "actual_address_latitude": 41.38,
+        "actual_longitude": 2.17,
+        "actual_latitude": 41.38,
+        "normal_address_longitude": 2.15,
+        "normal_address_latitude": 41.40,
+        "normal_longitude": 2.15,
+        "normal_latitude": 41.40,
+        "status": "Available",
+        "responsible": "Fake Name Surname",
+        "telephone": "+34600000000",
+        "email": "fake@mail.com",
+    }
+
+
+@pytest.mark.asyncio
+async def test_export_resources_streaming(client, resource_data):
+    """
+    Test that the export endpoint streams every resource as NDJSON and
+    as a JSON array
+    """
+    created_ids = set()
+    for _ in range(3):
+        response = await client.post("/api/resources", json=resource_data)
+        assert response.status_code == 201
+        created_ids.add(response.json()["resource_id"])
+
+    response = await client.get("/api/resources/export")
+    assert response.status_code == 200
+    lines = [json.loads(x) for x in response.text.splitlines()]
+    assert {x["id"] for x in lines} == created_ids
+    assert lines[0]["location_resource_data"]["latitude"] == 41.38
+
+    response = await client.get(
+        "/api/resources/export", params={"format": "json"}
+    )
+    assert response.status_code == 200
+    assert {x["id"] for x in response.json()} == created_ids
+
+
+@pytest.mark.asyncio
+async def test_emergency_candidates_nearest_first(client, resource_data):
+    """
+    Test that the candidates of an emergency are the closest AVAILABLE
+    resources of the requested type, closest first
+    """
+    response = await client.post(
+        "/api/emergencies",
+        json={
+            "name": "Test Emergency",
+            "description": "Description for Test Emergency",
+            "latitude": 41.38,
+            "longitude": 2.17,
+            "emergency_type": "Medical",
+            "priority": "High",
+            "status": "Active",
+        },
+    )
+    emergency_id = response.json()["emergency_id"]
+
+    units = {
+        "near": (41.381, 2.171, "Ambulance", "Available"),
+        "far": (41.50, 2.30, "Ambulance", "Available"),
+        "busy": (41.380, 2.170, "Ambulance", "Busy"),
+        "police": (41.380, 2.170, "Police", "Available"),
+    }
+    ids = {}
+    for name, (latitude, longitude, resource_type, status) in units.items():
+        response = await client.post(
+            "/api/resources",
+            json={
+                **resource_data,
+                "name": name,
+                "actual_latitude": latitude,
+                "actual_longitude": longitude,
+                "resource_type": resource_type,
+                "status": status,
+            },
+        )
+        ids[response.json()["resource_id"]] = name
+
+    response = await client.get(
+        f"/api/emergencies/{emergency_id}/candidates",
+        params={"type": "Ambulance", "k": 5},
+    )
+    assert response.status_code == 200
+    candidates = response.json()
+    assert [ids[x["id"]] for x in candidates] == ["near", "far"]
+    assert candidates[0]["distance"] < candidates[1]["distance"]
+
+    response = await client.get(
+        f"/api/emergencies/{emergency_id}/candidates", params={"k": 1}
+    )
+    assert [ids[x["id"]] for x in response.json()] == ["police"]
+
+
+async def get_resource_graph(db_session, resource_id):
+    """
+    Reads the resource with its actual and normal locations straight from
+    the database
+    """
+    result = await db_session.execute(
+        select(Resource.__table__).where(
+            Resource.id == convertStringToUUID(resource_id)
+        )
+    )
+    resource = result.one()
+    result = await db_session.execute(
+        select(Location.__table__).where(
+            Location.id.in_(
+                [resource.actual_location, resource.normal_location]
+            )
+        )
+    )
+    locations = {location.id: location for location in result.all()}
+    # End the read transaction, the next request begins its own
+    await db_session.rollback()
+    return (
+        resource,
+        locations[resource.actual_location],
+        locations[resource.normal_location],
+    )
+
+
+@pytest.mark.asyncio
+async def test_update_resource_round_trips(
+    client, resource_data, db_session, query_counter
+):
+    """
+    Test that an update reads the resource graph with one query and writes
+    one UPDATE per changed table
+    """
+    response = await client.post("/api/resources", json=resource_data)
+    resource_id = response.json()["resource_id"]
+
+    query_counter.reset()
+    response = await client.patch(
+        f"/api/resources/{resource_id}",
+        json={
+            **resource_data,
+            "name": "ambulance-102",
+            "actual_latitude": 41.39,
+            "normal_latitude": 41.41,
+            "actual_address_latitude": 41.39,
+        },
+    )
+    assert response.status_code == 200
+    # Select, then resource, locations and addresses updates
+    assert query_counter.count == 4
+
+    resource, actual_location, normal_location = await get_resource_graph(
+        db_session, resource_id
+    )
+    assert resource.name == "ambulance-102"
+    assert actual_location.latitude == 41.39
+    assert normal_location.latitude == 41.41
+    assert actual_location.time_updated is not None
+
+    # Nothing changes, nothing written
+    query_counter.reset()
+    response = await client.patch(
+        f"/api/resources/{resource_id}",
+        json={
+            **resource_data,
+            "name": "ambulance-102",
+            "actual_latitude": 41.39,
+            "normal_latitude": 41.41,
+            "actual_address_latitude": 41.39,
+        },
+    )
+    assert response.status_code == 200
+    assert query_counter.count == 1
+
+
+@pytest.mark.asyncio
+async def test_partial_update_resource(
+    client, resource_data, db_session, query_counter
+):
+    """
+    Test that a partial update only writes the fields sent, and skips the
+    locations and addresses when none of their fields is sent
+    """
+    response = await client.post("/api/resources", json=resource_data)
+    resource_id = response.json()["resource_id"]
+
+    query_counter.reset()
+    response = await client.patch(
+        f"/api/resources/{resource_id}",
+        params={"partial": True},
+        json={"status": "Busy"},
+    )
+    assert response.status_code == 200
+    assert query_counter.count == 2
+
+    query_counter.reset()
+    response = await client.patch(
+        f"/api/resources/{resource_id}",
+        params={"partial": True},
+        json={"actual_longitude": 2.18},
+    )
+    assert response.status_code == 200
+    assert query_counter.count == 2
+
+    resource, actual_location, normal_location = await get_resource_graph(
+        db_session, resource_id
+    )
+    assert resource.status == "Busy"
+    assert resource.name == resource_data["name"]
+    assert resource.email == resource_data["email"]
+    assert actual_location.longitude == 2.18
+    assert actual_location.latitude == resource_data["actual_latitude"]
+    assert normal_location.latitude == resource_data["normal_latitude"]
+
+    # Without partial, the fields not sent are reset
+    response = await client.patch(
+        f"/api/resources/{resource_id}", json={"name": "renamed"}
+    )
+    assert response.status_code == 200
+    resource, actual_location, _ = await get_resource_graph(
+        db_session, resource_id
+    )
+    assert resource.email is None
+    assert actual_location.latitude is None
+
+    response = await client.patch(
+        "/api/resources/00000000-0000-0000-0000-000000000001",
+        params={"partial": True},
+        json={"status": "Busy"},
+    )
+    assert response.status_code == 404
+
+
+@pytest.mark.asyncio
+async def test_decommission_resources(client, resource_data):
+    """
+    Test that the bulk delete removes every resource, or none when one of
+    them is not found
+    """
+    resources_ids = []
+    for i in range(3):
+        response = await client.post(
+            "/api/resources", json={**resource_data, "name": f"unit-{i}"}
+        )
+        resources_ids.append(response.json()["resource_id"])
+    missing_id = "00000000-0000-0000-0000-000000000001"
+
+    response = await client.post(
+        "/api/resources/decommission",
+        json={"resources_ids": resources_ids[:2] + [missing_id]},
+    )
+    assert response.status_code == 404
+    assert missing_id in response.json()["detail"]
+    response = await client.get(f"/api/resources/{resources_ids[0]}")
+    assert response.status_code == 200
+
+    response = await client.post(
+        "/api/resources/decommission",
+        json={"resources_ids": resources_ids[:2]},
+    )
+    assert response.status_code == 200
+    assert response.json()["resources_ids"] == resources_ids[:2]
+    for resource_id in resources_ids[:2]:
+        response = await client.get(f"/api/resources/{resource_id}")
+        assert response.status_code == 404
+    response = await client.get(f"/api/resources/{resources_ids[2]}")
+    assert response.status_code == 200
+
+    response = await client.delete(f"/api/resources/{resources_ids[2]}")
+    assert response.status_code == 200
+    response = await client.delete(f"/api/resources/{resources_ids[2]}")
+    assert response.status_code == 404
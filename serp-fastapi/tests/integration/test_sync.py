@@ -0,0 +1,102 @@
+"""
+Tests for the delta sync endpoint
+"""
+
+import asyncio
+
+import pytest
+
+from src.configs.config import settings
+
+pytestmark = pytest.mark.asyncio
+
+EMERGENCY = {
+    "name": "Test Emergency",
+    "description": "Description for Test Emergency",
+    "latitude": 41.38,
+    "longitude": 2.17,
+    "emergency_type": "Medical",
+    "priority": "High",
+    "status": "Active",
+}
+
+
+async def create_resource(client, name):
+    """Creates a resource and returns its id"""
+    response = await client.post(
+        "/api/resources",
+        json={
+            "name": name,
+            "resource_type": "Ambulance",
+            "actual_latitude": 41.38,
+            "actual_longitude": 2.17,
+            "status": "Available",
+        },
+    )
+    return response.json()["resource_id"]
+
+
+@pytest.mark.asyncio
+async def test_sync_full_without_since(client):
+    """Test that without a watermark every row is sent"""
+    response = await client.post("/api/emergencies", json=EMERGENCY)
+    emergency_id = response.json()["emergency_id"]
+    resource_id = await create_resource(client, "ambulance-101")
+
+    response = await client.get("/api/sync")
+    assert response.status_code == 200
+    body = response.json()
+    assert body["full"] is True
+    assert [x["id"] for x in body["emergencies"]] == [emergency_id]
+    assert [x["id"] for x in body["resources"]] == [resource_id]
+    assert len(body["locations"]) == 3
+    assert body["deleted"] == []
+
+
+@pytest.mark.asyncio
+async def test_sync_delta_since_watermark(client, monkeypatch):
+    """
+    Test that a sync since a watermark only sends the rows changed after it
+    and the tombstones of the deleted ones
+    """
+    monkeypatch.setattr(settings, "SYNC_SAFETY_MARGIN_SECONDS", 0)
+    response = await client.post("/api/emergencies", json=EMERGENCY)
+    old_emergency_id = response.json()["emergency_id"]
+    old_resource_id = await create_resource(client, "ambulance-101")
+    unchanged_id = await create_resource(client, "ambulance-102")
+    # The watermark is taken from the database clock, to the second on SQLite
+    await asyncio.sleep(1)
+
+    watermark = (await client.get("/api/sync")).json()["watermark"]
+    # Tombstones are stamped by the same clock
+    await asyncio.sleep(1)
+
+    response = await client.post("/api/emergencies", json=EMERGENCY)
+    new_emergency_id = response.json()["emergency_id"]
+    await client.delete(f"/api/emergencies/{old_emergency_id}")
+    await client.delete(f"/api/resources/{old_resource_id}")
+
+    response = await client.get("/api/sync", params={"since": watermark})
+    assert response.status_code == 200
+    body = response.json()
+    assert body["full"] is False
+    assert [x["id"] for x in body["emergencies"]] == [new_emergency_id]
+    assert unchanged_id not in [x["id"] for x in body["resources"]]
+    deleted = {(x["entity"], x["entity_id"]) for x in body["deleted"]}
+    assert deleted == {
+        ("emergency", old_emergency_id),
+        ("resource", old_resource_id),
+    }
+
+
+@pytest.mark.asyncio
+async def test_sync_full_when_since_is_too_old(client):
+    """Test that a watermark older than the tombstone retention is full"""
+    await create_resource(client, "ambulance-101")
+
+    response = await client.get(
+        "/api/sync", params={"since": "2000-01-01T00:00:00Z"}
+    )
+    body = response.json()
+    assert body["full"] is True
+    assert len(body["resources"]) == 1
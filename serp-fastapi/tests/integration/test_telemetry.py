@@ -0,0 +1,189 @@
+"""
+Tests for the GPS telemetry ingestion
+"""
+
+import uuid
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from sqlalchemy import text
+
+from main import app
+from src.services.broadcaster import get_broadcaster
+from src.services.fleet import get_fleet_snapshot
+from src.services.telemetry import get_telemetry_ingestor
+
+pytestmark = pytest.mark.asyncio
+
+# Fixes of the tests are taken the last minute
+BASE_TIME = datetime.now(timezone.utc).replace(microsecond=0) - timedelta(
+    minutes=1
+)
+
+
+async def create_resource(client, name):
+    """Creates a resource and returns its id"""
+    response = await client.post(
+        "/api/resources",
+        json={
+            "name": name,
+            "resource_type": "Ambulance",
+            "actual_latitude": 41.38,
+            "actual_longitude": 2.17,
+            "status": "Available",
+        },
+    )
+    return response.json()["resource_id"]
+
+
+def fix(resource_id, second, latitude=41.39, longitude=2.18):
+    """Position fix taken at the given second"""
+    return {
+        "resource_id": resource_id,
+        "latitude": latitude,
+        "longitude": longitude,
+        "speed": 12.5,
+        "heading": 90,
+        "timestamp": (BASE_TIME + timedelta(seconds=second)).isoformat(),
+    }
+
+
+async def flush(db_session):
+    """Flushes the ingestor of the test app"""
+    ingestor = app.dependency_overrides[get_telemetry_ingestor]()
+    return await ingestor.flush(
+        db_session,
+        app.dependency_overrides[get_fleet_snapshot](),
+        app.dependency_overrides[get_broadcaster](),
+    )
+
+
+@pytest.mark.asyncio
+async def test_telemetry_coalesced_and_batched(
+    client, db_session, query_counter
+):
+    """
+    Test that the fixes are coalesced per resource and written with one
+    upsert, the out of order ones being dropped, and all of them recorded
+    in the history
+    """
+    first_id = await create_resource(client, "ambulance-101")
+    second_id = await create_resource(client, "ambulance-102")
+    await client.get("/api/fleet")
+
+    response = await client.post(
+        "/api/telemetry",
+        json=[
+            fix(first_id, 1, 41.40),
+            fix(first_id, 3, 41.42),
+            fix(second_id, 1, 41.50, 2.30),
+            fix(first_id, 2, 41.41),
+        ],
+    )
+    assert response.status_code == 202
+    assert response.json() == {"received": 4, "accepted": 3}
+    response = await client.post("/api/telemetry", json=fix(first_id, 4))
+    assert response.json() == {"received": 1, "accepted": 1}
+
+    stats = (await client.get("/api/telemetry/stats")).json()
+    assert stats["pending"] == 2
+    assert stats["coalesced"] == 2
+    assert stats["dropped_stale"] == 1
+
+    query_counter.reset()
+    assert await flush(db_session) == 2
+    # Resources lookup, one multi-row upsert and the history insert in its
+    # savepoint
+    assert query_counter.count == 5
+
+    response = await client.get(f"/api/devices/{first_id}/location")
+    location = response.json()
+    assert location["latitude"] == 41.39
+    assert location["speed"] == 12.5
+    assert location["heading"] == 90
+    response = await client.get(f"/api/fleet/{second_id}")
+    assert response.json()["latitude"] == 41.50
+
+    stats = (await client.get("/api/telemetry/stats")).json()
+    assert stats["pending"] == 0
+    assert stats["last_batch_size"] == 2
+    assert stats["written"] == 2
+    assert stats["history_written"] == 5
+    assert stats["flushes"] == 1
+
+    # Older than the fix already written
+    response = await client.post("/api/telemetry", json=fix(first_id, 3))
+    assert response.json()["accepted"] == 0
+
+
+@pytest.mark.asyncio
+async def test_telemetry_unknown_resource_and_validation(client, db_session):
+    """
+    Test that fixes of unknown resources are dropped on flush and invalid
+    positions rejected
+    """
+    response = await client.post(
+        "/api/telemetry", json=fix(str(uuid.uuid4()), 1)
+    )
+    assert response.status_code == 202
+    assert await flush(db_session) == 0
+    stats = (await client.get("/api/telemetry/stats")).json()
+    assert stats["dropped_unknown"] == 1
+
+    response = await client.post(
+        "/api/telemetry", json=fix(str(uuid.uuid4()), 1, latitude=91)
+    )
+    assert response.status_code == 422
+
+
+@pytest.mark.asyncio
+async def test_telemetry_history_failure(client, db_session):
+    """
+    Test that the actual locations are written when the history cannot be,
+    its batch being dropped instead of requeued
+    """
+    resource_id = await create_resource(client, "ambulance-301")
+    await db_session.execute(text("DROP TABLE location_history"))
+    await db_session.commit()
+
+    response = await client.post("/api/telemetry", json=fix(resource_id, 1))
+    assert response.json()["accepted"] == 1
+    assert await flush(db_session) == 1
+
+    response = await client.get(f"/api/devices/{resource_id}/location")
+    assert response.json()["latitude"] == 41.39
+    stats = (await client.get("/api/telemetry/stats")).json()
+    assert stats["pending"] == 0
+    assert stats["written"] == 1
+    assert stats["history_written"] == 0
+    assert stats["dropped_history"] == 1
+
+
+@pytest.mark.asyncio
+async def test_telemetry_first_location(client, db_session):
+    """
+    Test that the first fix of a resource without an actual location
+    creates it and links it to the resource
+    """
+    resource_id = await create_resource(client, "ambulance-401")
+    other_id = await create_resource(client, "ambulance-402")
+    await db_session.execute(
+        text("UPDATE resource SET actual_location = NULL WHERE id = :id"),
+        {"id": uuid.UUID(resource_id).hex},
+    )
+    await db_session.commit()
+
+    response = await client.post(
+        "/api/telemetry",
+        json=[fix(resource_id, 1, 41.45), fix(other_id, 1, 41.46)],
+    )
+    assert response.json()["accepted"] == 2
+    assert await flush(db_session) == 2
+
+    response = await client.get(f"/api/devices/{resource_id}/location")
+    assert response.json()["latitude"] == 41.45
+    response = await client.get(f"/api/devices/{other_id}/location")
+    assert response.json()["latitude"] == 41.46
+    stats = (await client.get("/api/telemetry/stats")).json()
+    assert stats["pending"] == 0
+    assert stats["written"] == 2
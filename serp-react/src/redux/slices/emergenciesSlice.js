@@ -6,20 +6,29 @@ const API_URL = process.env.REACT_APP_API_URL;
 async function fetchEmergenciesAPICall() {
   const endpoint = API_URL + "/api/emergencies";
   try {
-    const response = await fetch(endpoint, {
-      method: "GET", // or 'PUT'
-      headers: {
-        Accept: "application/json",
-      },
-    });
-    if (!response.ok) {
-      console.log(
-        "Looks like there was a problem. Status Code: " + response.status,
-      );
-      return [];
-    }
-    const data = await response.json();
-    return data;
+    // The list comes a page at a time, follow the cursor to the last one
+    const emergencies = [];
+    let cursor = null;
+    do {
+      const url = cursor
+        ? endpoint + "?cursor=" + encodeURIComponent(cursor)
+        : endpoint;
+      const response = await fetch(url, {
+        method: "GET", // or 'PUT'
+        headers: {
+          Accept: "application/json",
+        },
+      });
+      if (!response.ok) {
+        console.log(
+          "Looks like there was a problem. Status Code: " + response.status,
+        );
+        return [];
+      }
+      emergencies.push(...(await response.json()));
+      cursor = response.headers.get("X-Next-Cursor");
+    } while (cursor);
+    return emergencies;
   } catch (err) {
     console.log("Error in Dashboard while fetching emergencies", err);
     return [];